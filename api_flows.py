@@ -0,0 +1,79 @@
+"""
+FlowTodo 接口调用流程：每个函数返回一次请求的 (路由名, 方法, 路径, 请求数据)
+test_api.py（线上功能测试）和 benchmarks/load_test.py（本地压测）共用，两者请求的接口和数据保持一致
+"""
+from collections import namedtuple
+from urllib.parse import urlencode
+
+# 路由名与Flask路由规则相同（路径参数不展开），用于按接口汇总统计
+Call = namedtuple('Call', ['name', 'method', 'path', 'data'])
+
+
+# 用户认证
+def register(username, email, password):
+    return Call('/api/auth/register', 'POST', '/api/auth/register', {
+        "username": username,
+        "email": email,
+        "password": password
+    })
+
+def login(username, password):
+    return Call('/api/auth/login', 'POST', '/api/auth/login', {
+        "username": username,
+        "password": password
+    })
+
+def get_me():
+    return Call('/api/auth/me', 'GET', '/api/auth/me', None)
+
+def refresh_token():
+    # 使用刷新令牌作为 Authorization
+    return Call('/api/auth/refresh', 'POST', '/api/auth/refresh', None)
+
+def logout():
+    return Call('/api/auth/logout', 'POST', '/api/auth/logout', None)
+
+
+# 目标管理
+def create_goal():
+    return Call('/api/goals', 'POST', '/api/goals', {
+        "title": "测试目标",
+        "description": "这是一个测试目标",
+        "category": "工作",
+        "color": "#FF5733",
+        "goal_type": "active"
+    })
+
+def get_goals():
+    return Call('/api/goals', 'GET', '/api/goals', None)
+
+
+# 任务管理
+def create_task(goal_id=None):
+    data = {
+        "title": "测试任务",
+        "priority": "high",
+        "estimated_time": 60,
+        "tags": ["测试", "重要"],
+        "notes": "这是一个测试任务",
+        "enthusiasm": 4,
+        "difficulty": 3,
+        "importance": 5
+    }
+    if goal_id:
+        data["goal_id"] = goal_id
+    return Call('/api/tasks', 'POST', '/api/tasks', data)
+
+def get_tasks(filter_type=None, sort_by=None):
+    params = {key: value for key, value in (('filter', filter_type), ('sort', sort_by)) if value}
+    return Call('/api/tasks', 'GET', '/api/tasks' + ('?' + urlencode(params) if params else ''), None)
+
+def update_task(task_id):
+    return Call('/api/tasks/<task_id>', 'PUT', f'/api/tasks/{task_id}', {
+        "title": "已更新的测试任务",
+        "priority": "medium",
+        "notes": "这是一个已更新的测试任务"
+    })
+
+def toggle_task_complete(task_id):
+    return Call('/api/tasks/<task_id>/toggle-complete', 'PATCH', f'/api/tasks/{task_id}/toggle-complete', None)
@@ -0,0 +1,3 @@
+# 异步入口：python3 -m uvicorn asgi:app --host 0.0.0.0 --port 80
+# 依赖见 requirements-asgi.txt，默认的 Gunicorn 启动方式（run:app）不需要这些依赖
+from wxcloudrun.asgi import app
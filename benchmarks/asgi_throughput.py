@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+同步入口与异步入口的并发吞吐量对比：先后启动 Gunicorn（run:app）和 Uvicorn（asgi:app），
+连接同一个数据库，用 http_throughput 的长连接客户端并发请求同一组接口
+数据库缺省为临时 SQLite 文件（代替 MySQL），--db-latency-ms 为每条SQL模拟网络往返延迟（见 db_latency.py）
+用法：python benchmarks/asgi_throughput.py [-c 64] [-d 10] [--db-latency-ms 5] [--database-uri mysql://...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from http_throughput import worker
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ['/api/tasks', '/api/tasks?limit=20', '/api/goals', '/api/tags', '/api/auth/me']
+
+
+def request(base, method, path, data=None, headers=None):
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(base + path, body, method=method, headers={'Content-Type': 'application/json',
+                                                                           **(headers or {})})
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read() or 'null')
+
+
+def seed(base, tasks):
+    """
+    注册测试用户并创建带标签的任务和目标，返回认证头
+    """
+    user = {'username': 'bench', 'email': 'bench@example.com', 'password': 'secret123'}
+    try:
+        request(base, 'POST', '/api/auth/register', user)
+    except urllib.error.HTTPError:
+        pass
+    token = request(base, 'POST', '/api/auth/login', {'username': 'bench', 'password': 'secret123'})['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    if not request(base, 'GET', '/api/tasks?limit=1', headers=headers):
+        goal = request(base, 'POST', '/api/goals', {'title': '压测目标'}, headers)
+        for i in range(tasks):
+            request(base, 'POST', '/api/tasks', {
+                'title': f'任务{i}', 'tags': ['工作', f'标签{i % 10}'], 'goal_id': goal['id'] if i % 2 else None
+            }, headers)
+    return headers
+
+
+def start(command, port, env, timeout=30):
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f'{command[2]} exited with code {process.returncode}')
+            time.sleep(0.05)
+    process.terminate()
+    raise RuntimeError(f'{command[2]} did not start within {timeout}s')
+
+
+def measure(base, headers, concurrency, duration):
+    """
+    每个客户端轮流请求 PATHS 中的一个接口，返回 (每秒请求数, p50, p99, 错误数)
+    """
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=worker, args=(base + PATHS[i % len(PATHS)], deadline, headers, latencies, errors))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    quantiles = statistics.quantiles(sorted(latencies), n=100)
+    return len(latencies) / duration, quantiles[49] * 1000, quantiles[98] * 1000, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WSGI vs ASGI throughput benchmark')
+    parser.add_argument('-c', '--concurrency', type=int, default=64)
+    parser.add_argument('-d', '--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2, help='processes for both servers')
+    parser.add_argument('--tasks', type=int, default=50)
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='simulated round trip per SQL statement')
+    parser.add_argument('--database-uri', help='defaults to a temporary SQLite file')
+    parser.add_argument('--port', type=int, default=8091)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URI=args.database_uri or f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+               BENCH_DB_LATENCY_MS=str(args.db_latency_ms), GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_ACCESS_LOG='', GUNICORN_LOG_LEVEL='warning', FLASK_APP='run.py')
+    subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    bind = f'127.0.0.1:{args.port}'
+    servers = {
+        'wsgi (gunicorn gthread)': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', bind,
+                                    '--pythonpath', 'benchmarks', 'db_latency:wsgi_app'],
+        'asgi (uvicorn)': [sys.executable, '-m', 'uvicorn', '--app-dir', 'benchmarks', '--host', '127.0.0.1',
+                           '--port', str(args.port), '--workers', str(args.workers), '--no-access-log',
+                           '--log-level', 'warning', 'db_latency:asgi_app'],
+    }
+    base = f'http://{bind}'
+    print(f"concurrency {args.concurrency}, {args.duration:.0f}s, {args.workers} workers, "
+          f"db latency {args.db_latency_ms} ms/statement, paths: {', '.join(PATHS)}")
+    for name, command in servers.items():
+        process = start(command, args.port, env)
+        try:
+            headers = seed(base, args.tasks)
+            throughput, p50, p99, errors = measure(base, headers, args.concurrency, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"{name:<24} {throughput:8.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  errors {errors}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""
+模拟数据库网络往返延迟：每条SQL执行前等待 BENCH_DB_LATENCY_MS 毫秒
+本地 SQLite 没有网络往返，用它代替 MySQL 时通过该模块还原“请求大部分时间在等待数据库”的情况：
+同步连接在工作线程中 sleep（占用线程），异步连接在事件循环中 await（不占用线程），与真实的IO等待方式一致
+用法：gunicorn --pythonpath benchmarks db_latency:wsgi_app / uvicorn --app-dir benchmarks db_latency:asgi_app
+"""
+import asyncio
+import os
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.util import await_only
+
+LATENCY = float(os.environ.get('BENCH_DB_LATENCY_MS', 0)) / 1000
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _wait(conn, cursor, statement, parameters, context, executemany):
+    if LATENCY <= 0:
+        return
+    if conn.dialect.is_async:
+        await_only(asyncio.sleep(LATENCY))
+    else:
+        time.sleep(LATENCY)
+
+
+from run import app as wsgi_app  # noqa: E402
+from asgi import app as asgi_app  # noqa: E402
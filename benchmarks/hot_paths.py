@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+热点函数基准测试（离线，使用本地数据库）：
+- format_task / format_goal 的每行耗时
+- decode_token、token_required（认证缓存命中/未命中）的每次调用耗时
+- get_tasks_by_user_id 在不同任务数下的每种过滤条件和排序方式
+- calculate_goal_progress、带标签的 create_task
+结果写入JSON文件（含提交版本、Python和数据库信息），可用 --compare 与之前的结果对比
+用法：python benchmarks/hot_paths.py [--sizes 100,10000,100000] [-o results.json] [--compare old.json]
+默认使用SQLite内存库；--database-uri 指定MySQL时请使用独立的空库，测试会建表并写入数据
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# get_tasks_by_user_id 的过滤条件和排序方式（None 为默认）
+FILTERS = [None, 'today', 'week', 'completed', 'upcoming', 'unscheduled']
+SORTS = [None, 'dueDate', 'priority', 'alphabetical']
+PRIORITIES = ['high', 'medium', 'low']
+GOALS_PER_USER = 20
+TAGS_PER_USER = 20
+INSERT_CHUNK = 5000
+# 序列化测试的任务数
+FORMAT_ROWS = 1000
+
+
+def measure(func, repeat, max_seconds, min_sample=0.01):
+    """
+    类似 timeit：先确定每个样本的调用次数（样本耗时不少于 min_sample 秒），再取 repeat 个样本，
+    总耗时超过 max_seconds 时提前结束（至少一个样本）；返回每次调用的耗时统计（秒）
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_sample / elapsed) + 1))
+
+    samples = [elapsed / number]
+    spent = elapsed
+    while len(samples) < repeat and spent < max_seconds:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed / number)
+        spent += elapsed
+    return {
+        'number': number,
+        'samples': len(samples),
+        'min_s': min(samples),
+        'median_s': statistics.median(samples),
+        'ops_per_s': 1 / min(samples) if min(samples) else None,
+    }
+
+
+def seed_user(db, models, username, size):
+    """
+    批量写入 size 个任务（含目标和标签关联），计数列与逐条写入时一致
+    """
+    User, Task, Goal, Tag, TaskTag = models
+    user = User(username=username, email=f'{username}@example.com', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+
+    now = datetime.now()
+    goals = [{'id': f'{user.id:08d}-goal-{i:04d}'.ljust(36, '0'), 'user_id': user.id, 'title': f'目标{i}',
+              'color': '#000000', 'created_at': now, 'updated_at': now, 'goal_type': 'active',
+              'total_tasks': 0, 'completed_tasks': 0, 'progress': 0, 'completed': False}
+             for i in range(GOALS_PER_USER)]
+    db.session.execute(Goal.__table__.insert(), goals)
+    db.session.execute(Tag.__table__.insert(), [
+        {'user_id': user.id, 'name': f'标签{i}', 'task_count': 0, 'created_at': now} for i in range(TAGS_PER_USER)
+    ])
+    tag_ids = [tag_id for tag_id, in db.session.query(Tag.id).filter(Tag.user_id == user.id).order_by(Tag.id)]
+
+    for start in range(0, size, INSERT_CHUNK):
+        tasks, links = [], []
+        for i in range(start, min(size, start + INSERT_CHUNK)):
+            task_id = f'{user.id:08d}-task-{i:08d}'.ljust(36, '0')
+            tag_indexes = (i % TAGS_PER_USER, (i * 7 + 3) % TAGS_PER_USER)
+            goal = goals[i % GOALS_PER_USER]
+            completed = i % 3 == 0
+            goal['total_tasks'] += 1
+            goal['completed_tasks'] += completed
+            tasks.append({
+                'id': task_id, 'user_id': user.id, 'goal_id': goal['id'], 'title': f'任务{i:06d}',
+                'completed': completed, 'priority': PRIORITIES[i % 3],
+                # 每5个任务有一个没有截止日期，其余分布在前后60天内
+                'due_date': None if i % 5 == 0 else now + timedelta(hours=(i * 37) % 2880 - 1440),
+                'estimated_time': 30, 'actual_time': 0, 'notes': '备注' * 5, 'is_repeating': False,
+                'tags_text': ' '.join(f'标签{index}' for index in sorted(set(tag_indexes))),
+                'created_at': now - timedelta(seconds=size - i), 'updated_at': now,
+            })
+            links += [{'task_id': task_id, 'tag_id': tag_ids[index]} for index in sorted(set(tag_indexes))]
+        db.session.execute(Task.__table__.insert(), tasks)
+        db.session.execute(TaskTag.__table__.insert(), links)
+
+    for goal in goals:
+        db.session.query(Goal).filter(Goal.id == goal['id']).update({
+            'total_tasks': goal['total_tasks'], 'completed_tasks': goal['completed_tasks'],
+            'progress': goal['completed_tasks'] * 100 // goal['total_tasks'] if goal['total_tasks'] else 0,
+        })
+    for tag_id, count in db.session.query(TaskTag.tag_id, db.func.count()).filter(
+            TaskTag.tag_id.in_(tag_ids)).group_by(TaskTag.tag_id):
+        db.session.query(Tag).filter(Tag.id == tag_id).update({'task_count': count})
+    db.session.commit()
+    return user.id, goals[0]['id']
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def case_key(result):
+    return result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Hot path micro-benchmarks')
+    parser.add_argument('--sizes', default='100,10000,100000', help='任务数，逗号分隔')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='每项的样本数')
+    parser.add_argument('--max-seconds', type=float, default=10, help='每项最长耗时（秒）')
+    parser.add_argument('--database-uri', default='sqlite://')
+    parser.add_argument('-o', '--output', help='结果文件，默认 benchmarks/results/hot_paths-<时间>.json')
+    parser.add_argument('--compare', help='与之前的结果文件对比')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    # 导入应用之前设置数据库；关闭开发模式的SQL检查和限流，避免影响计时
+    os.environ['DATABASE_URI'] = args.database_uri
+    os.environ['SQL_DEBUG'] = 'false'
+    os.environ['RATE_LIMIT_ENABLED'] = 'false'
+    from wxcloudrun import app, db, serializers
+    from wxcloudrun.cache import auth_cache
+    from wxcloudrun.dao import (
+        calculate_goal_progress, create_goal, create_task, create_user, get_goals_by_user_id, get_tasks_by_user_id
+    )
+    from wxcloudrun.model import User, Task, Goal, Tag, TaskTag
+    from wxcloudrun.utils import generate_access_token, decode_token, format_goal, format_task, token_required
+
+    results = []
+
+    def record(name, params, func):
+        result = dict(name=name, params=params, **measure(func, args.repeat, args.max_seconds))
+        results.append(result)
+        label = ' '.join(f'{key}={value}' for key, value in params.items())
+        print(f"{name:<24} {label:<44} {result['min_s'] * 1e6:12.1f} us  (median {result['median_s'] * 1e6:.1f})",
+              flush=True)
+
+    with app.app_context():
+        db.create_all()
+
+        # 带标签的 create_task（每次调用写入一个任务和两个标签关联）
+        user = create_user('bench-writer', 'bench-writer@example.com', 'x')
+        goal = create_goal({'title': '写入目标'}, user.id)
+        counter = iter(range(10 ** 9))
+        record('create_task', {'tags': 2}, lambda: create_task({
+            'title': f'写入任务{next(counter)}', 'goal_id': goal.id, 'priority': 'high', 'due_date': datetime.now(),
+            'tags': ['工作', f'标签{next(counter) % 10}']
+        }, user.id))
+
+        # 序列化：批量写入的任务（每个任务两个标签）和目标
+        format_user_id, _ = seed_user(db, (User, Task, Goal, Tag, TaskTag), 'bench-format', FORMAT_ROWS)
+        tasks = get_tasks_by_user_id(format_user_id)
+        goals = get_goals_by_user_id(format_user_id)
+        record('format_task', {'rows': len(tasks)}, lambda: [format_task(task) for task in tasks])
+        results[-1]['per_row_s'] = results[-1]['min_s'] / len(tasks)
+        record('format_goal', {'rows': len(goals)}, lambda: [format_goal(goal) for goal in goals])
+        results[-1]['per_row_s'] = results[-1]['min_s'] / len(goals)
+
+        # 认证
+        token = generate_access_token(user.id)
+
+        @token_required
+        def view(current_user):
+            return current_user
+
+        record('decode_token', {}, lambda: decode_token(token))
+        with app.test_request_context(headers={'Authorization': f'Bearer {token}'}):
+            record('token_required', {'auth_cache': 'hit'}, view)
+
+            def cold_view():
+                auth_cache.clear()
+                return view()
+            record('token_required', {'auth_cache': 'miss'}, cold_view)
+
+        # 任务列表和目标进度
+        for size in sizes:
+            started = time.perf_counter()
+            user_id, goal_id = seed_user(db, (User, Task, Goal, Tag, TaskTag), f'bench-{size}', size)
+            print(f"seeded {size} tasks in {time.perf_counter() - started:.1f} s", flush=True)
+            for filter_type in FILTERS:
+                record('get_tasks_by_user_id', {'tasks': size, 'filter': filter_type or 'all', 'sort': 'createdAt'},
+                       lambda: get_tasks_by_user_id(user_id, filter_type=filter_type))
+            for sort_by in SORTS[1:]:
+                record('get_tasks_by_user_id', {'tasks': size, 'filter': 'all', 'sort': sort_by},
+                       lambda: get_tasks_by_user_id(user_id, sort_by=sort_by))
+            record('calculate_goal_progress', {'tasks': size, 'goal_tasks': -(-size // GOALS_PER_USER)},
+                   lambda: calculate_goal_progress(goal_id))
+            db.session.remove()
+
+        output = {
+            'benchmark': 'hot_paths',
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'environment': {
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'database': db.engine.dialect.name,
+                'json_backend': serializers.get_backend(),
+            },
+            'settings': {'sizes': sizes, 'repeat': args.repeat, 'max_seconds': args.max_seconds},
+            'results': results,
+        }
+
+    path = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"hot_paths-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = {case_key(result): result for result in json.load(f)['results']}
+        print(f"\ncompared with {args.compare} (ratio < 1 is faster):")
+        for result in results:
+            before = baseline.get(case_key(result))
+            if before:
+                label = ' '.join(f'{key}={value}' for key, value in result['params'].items())
+                print(f"{result['name']:<24} {label:<44} {result['min_s'] / before['min_s']:6.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+端到端压测：在本地启动真实应用（Gunicorn + run:app 的配置），模拟小程序用户的会话，逐级增加并发用户数，
+找出单个实例在出现错误（连接池等待超时、过载拒绝等）之前能支撑的用户数
+- 预先写入大量用户，每个用户有目标、带标签的任务
+- 每个虚拟用户反复执行会话：登录 -> 当前用户、目标列表 -> 若干次随机操作（各种过滤和排序的任务列表、
+  切换完成状态、创建和更新任务）-> 刷新令牌 -> 退出登录；请求之间有随机的思考时间
+- 请求的接口和数据来自 api_flows.py（与 test_api.py 的功能测试流程相同）
+- 每一级输出吞吐量、各接口的 p50/p95/p99 和错误率，结果写入JSON文件
+数据库缺省为临时 SQLite 文件（没有连接池等待超时）；评估连接池时用 --database-uri 指定独立的MySQL空库，
+或用 --db-latency-ms 模拟每条SQL的网络往返（见 db_latency.py）
+用法：python benchmarks/load_test.py [--stages 8,16,32,64] [--stage-seconds 20] [--users 200] [-o results.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import api_flows
+from asgi_throughput import start
+from hot_paths import git_revision
+
+PASSWORD = 'loadtest123'
+FILTERS = [None, 'today', 'week', 'completed', 'upcoming', 'unscheduled']
+SORTS = [None, 'dueDate', 'priority', 'alphabetical']
+
+# 会话中随机操作的权重：以浏览任务列表为主，其次是切换完成状态和编辑
+ACTIONS = {
+    'list_tasks': 50,
+    'toggle_task': 15,
+    'get_goals': 10,
+    'create_task': 10,
+    'update_task': 10,
+    'get_me': 5,
+}
+
+
+def seed(users, tasks_per_user, goals_per_user):
+    """
+    直接通过 dao 写入用户、目标和带标签的任务（所有用户使用同一个密码哈希，避免逐个哈希）
+    """
+    from wxcloudrun import app
+    from wxcloudrun.dao import apply_task_batch, create_goal, create_user
+    from wxcloudrun.utils import hash_password
+
+    password_hash = hash_password(PASSWORD)
+    now = datetime.now()
+    with app.app_context():
+        for i in range(users):
+            user = create_user(f'load{i:05d}', f'load{i:05d}@example.com', password_hash)
+            goal_ids = [create_goal({'title': f'目标{j}', 'category': '工作'}, user.id).id
+                        for j in range(goals_per_user)]
+            apply_task_batch([{'index': j, 'op': 'create', 'data': {
+                'title': f'任务{j}',
+                'priority': ('high', 'medium', 'low')[j % 3],
+                'completed': j % 4 == 0,
+                'due_date': None if j % 5 == 0 else now + timedelta(hours=(j * 37) % 720 - 360),
+                'goal_id': goal_ids[j % goals_per_user] if goal_ids and j % 2 else None,
+                'tags': ['工作', f'标签{j % 8}'],
+                'estimated_time': 30,
+            }} for j in range(tasks_per_user)], user.id)
+
+
+class Client:
+    """
+    一个虚拟用户的长连接客户端，每个请求记录 (级别, 接口, 状态码, 耗时)；连接出错时状态码为 None
+    """
+
+    def __init__(self, port, records, stage):
+        self.port = port
+        self.records = records
+        self.stage = stage
+        self.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+
+    def call(self, call, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(call.data).encode() if call.data is not None else None
+        start_time = time.perf_counter()
+        try:
+            self.conn.request(call.method, call.path, body, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+            status = response.status
+            if response.getheader('Connection', '').lower() == 'close':
+                self.conn.close()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+            data, status = b'', None
+        self.records.append((self.stage[0], f'{call.method} {call.name}', status, time.perf_counter() - start_time))
+        if status is not None and 200 <= status < 300 and data:
+            return json.loads(data)
+        return None
+
+    def close(self):
+        self.conn.close()
+
+
+def session(client, username, rng, actions, think):
+    """
+    一次小程序会话，流程与 test_api.py 相同：登录 -> 浏览和编辑 -> 刷新令牌 -> 退出登录
+    """
+    def pause():
+        time.sleep(rng.expovariate(1 / think) if think else 0)
+
+    tokens = client.call(api_flows.login(username, PASSWORD))
+    if not tokens:
+        # 登录失败（如密码哈希排队已满返回503）时同样等待，不立即重试
+        pause()
+        return
+    access = tokens['access_token']
+    pause()
+    client.call(api_flows.get_me(), access)
+    goals = client.call(api_flows.get_goals(), access) or []
+    goal_ids = [goal['id'] for goal in goals] if isinstance(goals, list) else []
+    tasks = client.call(api_flows.get_tasks(), access) or []
+    task_ids = [task['id'] for task in tasks] if isinstance(tasks, list) else []
+
+    names, weights = zip(*ACTIONS.items())
+    for action in rng.choices(names, weights, k=actions):
+        pause()
+        if action == 'list_tasks':
+            client.call(api_flows.get_tasks(rng.choice(FILTERS), rng.choice(SORTS)), access)
+        elif action == 'toggle_task' and task_ids:
+            client.call(api_flows.toggle_task_complete(rng.choice(task_ids)), access)
+        elif action == 'update_task' and task_ids:
+            client.call(api_flows.update_task(rng.choice(task_ids)), access)
+        elif action == 'create_task':
+            task = client.call(api_flows.create_task(rng.choice(goal_ids) if goal_ids else None), access)
+            if task:
+                task_ids.append(task['id'])
+        elif action == 'get_goals':
+            client.call(api_flows.get_goals(), access)
+        else:
+            client.call(api_flows.get_me(), access)
+
+    pause()
+    refreshed = client.call(api_flows.refresh_token(), tokens['refresh_token'])
+    if refreshed:
+        access = refreshed['access_token']
+    client.call(api_flows.logout(), access)
+
+
+def virtual_user(index, args, records, stage, stop):
+    rng = random.Random(index)
+    client = Client(args.port, records, stage)
+    try:
+        while not stop.is_set():
+            username = f'load{rng.randrange(args.users):05d}'
+            session(client, username, rng, rng.randint(*args.session_actions), args.think_ms / 1000)
+    finally:
+        client.close()
+
+
+def percentile(quantiles, q):
+    return quantiles[q - 1] * 1000 if quantiles else None
+
+
+def is_error(status):
+    return status is None or status >= 500 or status == 429
+
+
+def summarize(records, duration):
+    """
+    按接口汇总：请求数、每秒请求数、p50/p95/p99（毫秒）、错误率和各状态码计数
+    错误包括 5xx、429 和连接错误（状态码 null）
+    """
+    groups = defaultdict(list)
+    for _, endpoint, status, latency in records:
+        groups[endpoint].append((status, latency))
+        groups['ALL'].append((status, latency))
+
+    endpoints = {}
+    for endpoint, items in sorted(groups.items()):
+        latencies = sorted(latency for _, latency in items)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        statuses = Counter(status for status, _ in items)
+        errors = sum(count for status, count in statuses.items() if is_error(status))
+        endpoints[endpoint] = {
+            'requests': len(items),
+            'throughput': len(items) / duration,
+            'p50_ms': percentile(quantiles, 50),
+            'p95_ms': percentile(quantiles, 95),
+            'p99_ms': percentile(quantiles, 99),
+            'error_rate': errors / len(items),
+            'statuses': {str(status): count
+                         for status, count in sorted(statuses.items(), key=lambda item: item[0] or 0)},
+        }
+    return endpoints
+
+
+def print_stage(users, endpoints):
+    print(f"\n{users} concurrent users")
+    print(f"  {'endpoint':<48} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}  statuses")
+    for endpoint, stats in endpoints.items():
+        print(f"  {endpoint:<48} {stats['throughput']:8.1f} {stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f} "
+              f"{stats['p99_ms']:8.1f} {stats['error_rate']:7.2%}  "
+              f"{' '.join(f'{status}:{count}' for status, count in stats['statuses'].items())}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end load test with a mini-program session mix')
+    parser.add_argument('--stages', default='8,16,32,64', help='每一级的并发用户数，逗号分隔')
+    parser.add_argument('--stage-seconds', type=float, default=20)
+    parser.add_argument('--users', type=int, default=200, help='预先写入的用户数')
+    parser.add_argument('--tasks-per-user', type=int, default=50)
+    parser.add_argument('--goals-per-user', type=int, default=3)
+    parser.add_argument('--session-actions', default='5,15', help='每次会话的随机操作数范围')
+    parser.add_argument('--think-ms', type=float, default=200, help='请求之间的平均思考时间（毫秒，指数分布）')
+    parser.add_argument('--max-error-rate', type=float, default=0.01, help='某一级错误率超过该值时停止加压')
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn 工作进程数')
+    parser.add_argument('--rate-limits', action='store_true', help='保持限流开启（默认关闭，避免虚拟用户触发429）')
+    parser.add_argument('--db-latency-ms', type=float, default=0, help='为每条SQL模拟的网络往返延迟')
+    parser.add_argument('--database-uri', help='缺省为临时 SQLite 文件')
+    parser.add_argument('--port', type=int, default=8092)
+    parser.add_argument('-o', '--output', help='结果文件，默认 benchmarks/results/load_test-<时间>.json')
+    args = parser.parse_args()
+    stages = [int(users) for users in args.stages.split(',') if users]
+    args.session_actions = tuple(int(count) for count in args.session_actions.split(','))
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URI=args.database_uri or f"sqlite:///{os.path.join(workdir, 'load.db')}",
+               BENCH_DB_LATENCY_MS=str(args.db_latency_ms), GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_ACCESS_LOG='', GUNICORN_LOG_LEVEL='warning', FLASK_APP='run.py', SQL_DEBUG='false')
+    if not args.rate_limits:
+        env['RATE_LIMIT_ENABLED'] = 'false'
+    subprocess.run([sys.executable, '-m', 'flask', 'init-db'], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    started = time.perf_counter()
+    os.environ.update(DATABASE_URI=env['DATABASE_URI'], SQL_DEBUG='false')
+    seed(args.users, args.tasks_per_user, args.goals_per_user)
+    print(f"seeded {args.users} users x {args.tasks_per_user} tasks in {time.perf_counter() - started:.1f} s")
+
+    command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '-b', f'127.0.0.1:{args.port}',
+               '--pythonpath', 'benchmarks', 'db_latency:wsgi_app']
+    process = start(command, args.port, env)
+    records, stage, stop, threads, results = [], [0], threading.Event(), [], []
+    try:
+        for index, users in enumerate(stages):
+            stage[0] = index
+            first = len(records)
+            while len(threads) < users:
+                thread = threading.Thread(target=virtual_user, args=(len(threads), args, records, stage, stop),
+                                          daemon=True)
+                thread.start()
+                threads.append(thread)
+            time.sleep(args.stage_seconds)
+            # 只统计本级期间完成的请求
+            endpoints = summarize([record for record in records[first:] if record[0] == index], args.stage_seconds)
+            results.append({'users': users, 'endpoints': endpoints})
+            print_stage(users, endpoints)
+            if endpoints.get('ALL', {}).get('error_rate', 1) > args.max_error_rate:
+                print(f"\nerror rate above {args.max_error_rate:.0%} at {users} users, stopping")
+                break
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=30)
+        process.terminate()
+        process.wait()
+
+    healthy = [result['users'] for result in results
+               if result['endpoints'].get('ALL', {}).get('error_rate', 1) <= args.max_error_rate]
+    print(f"\nmax concurrent users with error rate <= {args.max_error_rate:.0%}: {max(healthy) if healthy else 'none'}")
+
+    output = {
+        'benchmark': 'load_test',
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': env['DATABASE_URI'].split(':', 1)[0],
+        },
+        'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'database_uri')},
+        'max_healthy_users': max(healthy) if healthy else None,
+        'stages': results,
+    }
+    path = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"load_test-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"results written to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+任务列表序列化开销测试：对比原有 format_task + 标准库 json（flask.jsonify 的路径）
+与字段计划序列化器 + 各编码后端的单行耗时，并校验两者输出一致
+用法：python benchmarks/serialization.py [-n 1000] [-r 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+
+from wxcloudrun import app, db
+from wxcloudrun import serializers
+from wxcloudrun.dao import create_task, create_user, get_tasks_by_user_id
+from wxcloudrun.serializers import task_serializer
+
+
+def legacy_format_task(task):
+    # 改造前 utils.format_task 的实现
+    tags = [tag.name for tag in task.tags] if task.tags else []
+    custom_week_days = None
+    if task.custom_week_days:
+        try:
+            custom_week_days = json.loads(task.custom_week_days)
+        except ValueError:
+            custom_week_days = []
+
+    return {
+        'id': task.id,
+        'title': task.title,
+        'goal_id': task.goal_id,
+        'completed': task.completed,
+        'due_date': task.due_date.isoformat() if task.due_date else None,
+        'priority': task.priority,
+        'estimated_time': task.estimated_time,
+        'actual_time': task.actual_time,
+        'created_at': task.created_at.isoformat(),
+        'tags': tags,
+        'notes': task.notes,
+        'expected_outcome': task.expected_outcome,
+        'enthusiasm': task.enthusiasm,
+        'difficulty': task.difficulty,
+        'importance': task.importance,
+        'is_repeating': task.is_repeating,
+        'repeat_frequency': task.repeat_frequency,
+        'repeat_interval': task.repeat_interval,
+        'repeat_end_date': task.repeat_end_date.isoformat() if task.repeat_end_date else None,
+        'repeat_count': task.repeat_count,
+        'parent_task_id': task.parent_task_id,
+        'custom_week_days': custom_week_days,
+        'updated_at': task.updated_at.isoformat() if task.updated_at else None
+    }
+
+
+def legacy_encode(tasks):
+    # flask.jsonify 的默认编码方式（JSON_AS_ASCII=False，按键排序）
+    return json.dumps([legacy_format_task(task) for task in tasks], ensure_ascii=False, sort_keys=True).encode('utf-8')
+
+
+def current_encode(tasks):
+    return serializers.dumps(task_serializer.many(tasks))
+
+
+def best_of(func, tasks, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(tasks)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Task serialization benchmark')
+    parser.add_argument('-n', '--rows', type=int, default=1000)
+    parser.add_argument('-r', '--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        user = create_user('bench', 'bench@example.com', 'x')
+        for i in range(args.rows):
+            create_task({
+                'title': f'任务{i}', 'priority': 'high', 'notes': '备注' * 5, 'tags': ['工作', f'标签{i % 10}'],
+                'due_date': datetime(2026, 1, 1, 9, 30) + timedelta(hours=i, microseconds=i % 2 * 1500), 'is_repeating': i % 3 == 0, 'repeat_frequency': 'custom',
+                'custom_week_days': [1, 3, 5] if i % 3 == 0 else None
+            }, user.id)
+        tasks = get_tasks_by_user_id(user.id)
+
+        assert json.loads(legacy_encode(tasks)) == json.loads(current_encode(tasks)), 'outputs differ'
+
+        legacy = best_of(legacy_encode, tasks, args.repeat)
+        print(f"rows: {len(tasks)}")
+        print(f"before  format_task + json     {legacy / len(tasks) * 1e6:6.2f} us/row")
+        for name in sorted(serializers.BACKENDS):
+            serializers.set_backend(name)
+            current = best_of(current_encode, tasks, args.repeat)
+            print(f"after   serializer + {name:<9} {current / len(tasks) * 1e6:6.2f} us/row  ({legacy / current:.1f}x)")
+        serializers.set_backend()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+冷启动时间测试：启动服务进程，轮询健康检查接口，统计从启动到首个200响应的时间
+同时单独统计导入应用模块的耗时，导入阶段不应访问网络
+用法：python benchmarks/startup_time.py [-n 5] [--port 8090] [--dev]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_import():
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'import run'], cwd=ROOT, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+
+def measure_first_response(command, port, timeout):
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/health', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                pass
+            if process.poll() is not None:
+                raise RuntimeError(f'server exited with code {process.returncode}')
+            time.sleep(0.01)
+        raise RuntimeError(f'no 200 response within {timeout}s')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold start benchmark')
+    parser.add_argument('-n', '--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--dev', action='store_true', help='measure python run.py instead of gunicorn')
+    args = parser.parse_args()
+
+    if args.dev:
+        command = [sys.executable, 'run.py', '127.0.0.1', str(args.port)]
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                   '-b', f'127.0.0.1:{args.port}', 'run:app']
+
+    imports = [measure_import() for _ in range(args.runs)]
+    responses = [measure_first_response(command, args.port, args.timeout) for _ in range(args.runs)]
+    print(f"import run:            median {statistics.median(imports) * 1000:.0f} ms  max {max(imports) * 1000:.0f} ms")
+    print(f"start to first 200 OK: median {statistics.median(responses) * 1000:.0f} ms  max {max(responses) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,69 @@
 import os
 
-# 是否开启debug模式
-DEBUG = True
+# 是否开启debug模式，生产环境默认关闭，本地开发可设置 DEBUG=true
+DEBUG = os.environ.get("DEBUG", 'false').lower() in ('1', 'true', 'yes')
 
 # 读取数据库环境变量
 username = os.environ.get("MYSQL_USERNAME", 'root')
 password = os.environ.get("MYSQL_PASSWORD", 'root')
 db_address = os.environ.get("MYSQL_ADDRESS", '127.0.0.1:3306')
+db_name = os.environ.get("MYSQL_DATABASE", 'todo_app')
+
+# 完整的数据库连接串，设置后覆盖上面的MySQL配置（例如本地测试使用 sqlite:///todo.db）
+DATABASE_URI = os.environ.get("DATABASE_URI")
+
+# 工作进程启动后在后台预先建立的数据库连接数，0 表示不预热
+DB_POOL_PREWARM = int(os.environ.get("DB_POOL_PREWARM", 0))
 
 # JWT密钥
 JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", 'dev-secret-key-change-in-production')
+
+# 令牌黑名单：进程内过滤器增量刷新间隔（秒），以及清理过期黑名单记录的间隔（秒）
+TOKEN_BLACKLIST_REFRESH_SECONDS = float(os.environ.get("TOKEN_BLACKLIST_REFRESH_SECONDS", 2))
+TOKEN_BLACKLIST_SWEEP_SECONDS = float(os.environ.get("TOKEN_BLACKLIST_SWEEP_SECONDS", 3600))
+
+# 认证上下文缓存：缓存已验证令牌的载荷和用户信息，最大条目数和有效期（秒）
+# 通过 set_user_active 启用/停用用户时，各进程在黑名单刷新间隔内清除缓存；直接修改数据库时最多在有效期内失效
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL_SECONDS = float(os.environ.get("AUTH_CACHE_TTL_SECONDS", 60))
+
+# JSON编码后端：orjson 或 json，缺省时优先使用 orjson（未安装时回退到标准库）
+JSON_BACKEND = os.environ.get("JSON_BACKEND")
+
+# 异步入口（asgi.py）：异步连接池大小，以及转交同步应用处理的请求所用的线程数
+ASYNC_DB_POOL_SIZE = int(os.environ.get("ASYNC_DB_POOL_SIZE", 10))
+ASGI_WSGI_THREADS = int(os.environ.get("ASGI_WSGI_THREADS", 4))
+
+# 密码哈希：PBKDF2 的摘要算法和迭代次数，修改后已有用户在下次登录成功时按新参数重新哈希
+PASSWORD_HASH_ALGORITHM = os.environ.get("PASSWORD_HASH_ALGORITHM", 'sha256')
+PASSWORD_HASH_ITERATIONS = int(os.environ.get("PASSWORD_HASH_ITERATIONS", 260000))
+# 每个进程执行密码哈希的线程数，以及等待哈希（含执行中）的请求数上限，超过上限的注册/登录请求返回503
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 1))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 16))
+
+# 请求速率限制（令牌桶，格式 "请求数/秒数"）：已登录用户按用户计数，其余按客户端IP计数；登录注册始终按IP计数
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", 'true').lower() in ('1', 'true', 'yes')
+# 计数存储：memory（进程内，每个进程各自计数）或 redis（多个进程、实例共享，需安装 redis 包）
+RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", 'memory')
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", 'redis://127.0.0.1:6379/0')
+RATE_LIMIT_LOGIN = os.environ.get("RATE_LIMIT_LOGIN", '10/60')
+RATE_LIMIT_REFRESH = os.environ.get("RATE_LIMIT_REFRESH", '10/60')
+RATE_LIMIT_SEARCH = os.environ.get("RATE_LIMIT_SEARCH", '30/60')
+RATE_LIMIT_LIST = os.environ.get("RATE_LIMIT_LIST", '120/60')
+RATE_LIMIT_DEFAULT = os.environ.get("RATE_LIMIT_DEFAULT", '300/60')
+RATE_LIMIT_IP = os.environ.get("RATE_LIMIT_IP", '1200/60')
+# 每个进程同时处理的请求数上限（0表示不限制），超过上限或数据库连接池耗尽时直接返回503
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get("ADMISSION_MAX_IN_FLIGHT", 64))
+
+# 监控指标接口 /metrics 的访问令牌（Authorization: Bearer <令牌>），为空时不校验
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", '')
+# 健康检查探测数据库（SELECT 1）的最短间隔（秒），间隔内的健康检查沿用上次结果
+HEALTH_DB_CHECK_SECONDS = float(os.environ.get("HEALTH_DB_CHECK_SECONDS", 2))
+
+# 开发模式的SQL检查：记录每个请求的SQL，发现重复执行的同形状语句（可能的 N+1 查询）和慢查询，汇总写入 X-SQL-* 响应头
+# 需要遍历调用栈查找执行位置，生产环境保持关闭
+SQL_DEBUG = os.environ.get("SQL_DEBUG", str(DEBUG)).lower() in ('1', 'true', 'yes')
+# 同一请求中同形状语句执行多少次视为可能的 N+1 查询
+SQL_DEBUG_REPEAT_THRESHOLD = int(os.environ.get("SQL_DEBUG_REPEAT_THRESHOLD", 5))
+# 慢查询阈值（毫秒）
+SQL_DEBUG_SLOW_MS = float(os.environ.get("SQL_DEBUG_SLOW_MS", 100))
@@ -0,0 +1,53 @@
+# Gunicorn 生产环境配置：gunicorn -c gunicorn.conf.py run:app
+# 所有参数都可以通过环境变量覆盖，默认值按 container.config.json 中的 1核 / 2GB 容器规格设置
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+# 监听地址，端口需与云托管「服务设置」中的端口一致
+bind = f"0.0.0.0:{os.environ.get('PORT', 80)}"
+
+# 多进程 + 多线程：请求大部分时间在等待MySQL，线程可以重叠这些等待；
+# 单核容器上进程数不宜过多，2个进程可以在一个进程重启或阻塞时继续服务
+worker_class = 'gthread'
+workers = _env_int('GUNICORN_WORKERS', 2)
+threads = _env_int('GUNICORN_THREADS', 4)
+
+# 长连接保持时间、请求超时时间（秒）
+keepalive = _env_int('GUNICORN_KEEPALIVE', 5)
+timeout = _env_int('GUNICORN_TIMEOUT', 30)
+
+# 收到 SIGTERM 后停止接收新连接，等待处理中的请求完成，超过该时间（秒）强制退出
+graceful_timeout = _env_int('GUNICORN_GRACEFUL_TIMEOUT', 20)
+
+# 处理一定数量的请求后重启进程，防止内存缓慢增长（0 表示不重启）
+max_requests = _env_int('GUNICORN_MAX_REQUESTS', 0)
+max_requests_jitter = _env_int('GUNICORN_MAX_REQUESTS_JITTER', 0)
+
+# 日志输出到标准输出，云托管按 stdout 收集日志
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # 数据库连接不能跨进程共享，fork 后丢弃从主进程继承的连接池
+    from wxcloudrun import db
+    db.engine.dispose()
+
+
+def post_worker_init(worker):
+    # 端口已由主进程监听，在后台预热连接池，不阻塞进程接收请求
+    import config
+    if config.DB_POOL_PREWARM > 0:
+        from wxcloudrun import prewarm_db_pool
+        prewarm_db_pool(config.DB_POOL_PREWARM)
+
+
+def worker_exit(server, worker):
+    # 进程退出时关闭数据库连接
+    from wxcloudrun import db
+    db.engine.dispose()
@@ -0,0 +1,119 @@
+"""baseline schema
+
+Revision ID: 3f1c2a7b9d01
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+已有部署的表由 db.create_all() 创建，这里只补建缺失的表，
+因此对新库和旧库都可以直接执行 flask db upgrade。
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7b9d01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade():
+    if not _has_table('users'):
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('username', sa.String(length=50), nullable=False),
+            sa.Column('email', sa.String(length=100), nullable=False),
+            sa.Column('password_hash', sa.String(length=255), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=False),
+            sa.Column('last_login', sa.DateTime(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('email'),
+            sa.UniqueConstraint('username')
+        )
+
+    if not _has_table('goals'):
+        op.create_table(
+            'goals',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('category', sa.String(length=50), nullable=True),
+            sa.Column('color', sa.String(length=20), nullable=False),
+            sa.Column('icon', sa.String(length=50), nullable=True),
+            sa.Column('start_date', sa.DateTime(), nullable=True),
+            sa.Column('end_date', sa.DateTime(), nullable=True),
+            sa.Column('completed', sa.Boolean(), nullable=True),
+            sa.Column('progress', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('goal_type', sa.Enum('long_term', 'active', name='goal_type_enum'), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not _has_table('tasks'):
+        op.create_table(
+            'tasks',
+            sa.Column('id', sa.String(length=36), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('goal_id', sa.String(length=36), nullable=True),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('completed', sa.Boolean(), nullable=True),
+            sa.Column('due_date', sa.DateTime(), nullable=True),
+            sa.Column('priority', sa.Enum('high', 'medium', 'low', name='priority_enum'), nullable=True),
+            sa.Column('estimated_time', sa.Integer(), nullable=True),
+            sa.Column('actual_time', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('expected_outcome', sa.Text(), nullable=True),
+            sa.Column('enthusiasm', sa.Integer(), nullable=True),
+            sa.Column('difficulty', sa.Integer(), nullable=True),
+            sa.Column('importance', sa.Integer(), nullable=True),
+            sa.Column('is_repeating', sa.Boolean(), nullable=True),
+            sa.Column('repeat_frequency', sa.Enum('daily', 'weekly', 'monthly', 'yearly', 'custom', name='repeat_freq_enum'), nullable=True),
+            sa.Column('repeat_interval', sa.Integer(), nullable=True),
+            sa.Column('repeat_end_date', sa.DateTime(), nullable=True),
+            sa.Column('repeat_count', sa.Integer(), nullable=True),
+            sa.Column('parent_task_id', sa.String(length=36), nullable=True),
+            sa.Column('custom_week_days', sa.String(length=20), nullable=True),
+            sa.ForeignKeyConstraint(['goal_id'], ['goals.id']),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not _has_table('task_tags'):
+        op.create_table(
+            'task_tags',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('task_id', sa.String(length=36), nullable=False),
+            sa.Column('tag_name', sa.String(length=50), nullable=False),
+            sa.ForeignKeyConstraint(['task_id'], ['tasks.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if not _has_table('blacklisted_tokens'):
+        op.create_table(
+            'blacklisted_tokens',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('token', sa.String(length=500), nullable=False),
+            sa.Column('blacklisted_on', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('token')
+        )
+
+
+def downgrade():
+    op.drop_table('blacklisted_tokens')
+    op.drop_table('task_tags')
+    op.drop_table('tasks')
+    op.drop_table('goals')
+    op.drop_table('users')
@@ -0,0 +1,44 @@
+"""add task/goal/tag query indexes
+
+Revision ID: 8a4e6d2c5b17
+Revises: 3f1c2a7b9d01
+Create Date: 2026-10-17 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6d2c5b17'
+down_revision = '3f1c2a7b9d01'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_tasks_user_due_date', 'tasks', ['user_id', 'due_date']),
+    ('ix_tasks_user_created_at', 'tasks', ['user_id', 'created_at']),
+    ('ix_tasks_user_completed', 'tasks', ['user_id', 'completed']),
+    ('ix_tasks_user_title', 'tasks', ['user_id', 'title']),
+    ('ix_tasks_goal_completed', 'tasks', ['goal_id', 'completed']),
+    ('ix_goals_user_created_at', 'goals', ['user_id', 'created_at']),
+    ('ix_task_tags_task_id', 'task_tags', ['task_id']),
+]
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade():
+    # 新库由 db.create_all() 建表时已带上索引，这里跳过已存在的
+    for name, table, columns in INDEXES:
+        if not _has_index(table, name):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if _has_index(table, name):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,42 @@
+"""add per-user daily task statistics rollup table
+
+Revision ID: a3c5e7b9d102
+Revises: e5a9c3d7f481
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c5e7b9d102'
+down_revision = 'e5a9c3d7f481'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 已有任务的汇总由 flask rebuild-task-stats 回填
+    if sa.inspect(op.get_bind()).has_table('task_daily_stats'):
+        return
+
+    op.create_table(
+        'task_daily_stats',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('dimension', sa.String(20), nullable=False),
+        sa.Column('value', sa.String(36), nullable=False, server_default=''),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completed', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('estimated_time', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('actual_time', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'dimension', 'day', 'value', name='uq_task_daily_stats_key')
+    )
+
+
+def downgrade():
+    op.drop_table('task_daily_stats')
@@ -0,0 +1,30 @@
+"""add per-user data version for conditional GETs
+
+Revision ID: a9d3b5f7c142
+Revises: f4a1c3e5b728
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9d3b5f7c142'
+down_revision = 'f4a1c3e5b728'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade():
+    if not _has_column('users', 'data_version'):
+        op.add_column('users', sa.Column('data_version', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('data_version')
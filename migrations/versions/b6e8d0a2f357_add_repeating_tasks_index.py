@@ -0,0 +1,29 @@
+"""add index for repeating task occurrence queries
+
+Revision ID: b6e8d0a2f357
+Revises: a9d3b5f7c142
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e8d0a2f357'
+down_revision = 'a9d3b5f7c142'
+branch_labels = None
+depends_on = None
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def upgrade():
+    if not _has_index('tasks', 'ix_tasks_user_repeating_due_date'):
+        op.create_index('ix_tasks_user_repeating_due_date', 'tasks', ['user_id', 'is_repeating', 'due_date'])
+
+
+def downgrade():
+    op.drop_index('ix_tasks_user_repeating_due_date', table_name='tasks')
@@ -0,0 +1,32 @@
+"""add users.status_changed_at so every worker can drop cached auth for (de)activated users
+
+Revision ID: c2e4a6b8d013
+Revises: a3c5e7b9d102
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2e4a6b8d013'
+down_revision = 'a3c5e7b9d102'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade():
+    if not _has_column('users', 'status_changed_at'):
+        op.add_column('users', sa.Column('status_changed_at', sa.DateTime(), nullable=True))
+        op.create_index('ix_users_status_changed_at', 'users', ['status_changed_at'])
+
+
+def downgrade():
+    op.drop_index('ix_users_status_changed_at', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('status_changed_at')
@@ -0,0 +1,67 @@
+"""add updated_at and deleted_records for delta sync
+
+Revision ID: c7d9e1f3a245
+Revises: 8a4e6d2c5b17
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d9e1f3a245'
+down_revision = '8a4e6d2c5b17'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(name):
+    return _inspector().has_table(name)
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in _inspector().get_columns(table))
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in _inspector().get_indexes(table))
+
+
+def upgrade():
+    for table in ('tasks', 'goals'):
+        if not _has_column(table, 'updated_at'):
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+            # 已有数据以创建时间作为最后更新时间
+            op.execute(f'UPDATE {table} SET updated_at = created_at')
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+        index_name = f'ix_{table}_user_updated_at'
+        if not _has_index(table, index_name):
+            op.create_index(index_name, table, ['user_id', 'updated_at'])
+
+    if not _has_table('deleted_records'):
+        op.create_table(
+            'deleted_records',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('entity_type', sa.Enum('task', 'goal', name='entity_type_enum'), nullable=False),
+            sa.Column('entity_id', sa.String(length=36), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_index('deleted_records', 'ix_deleted_records_user_deleted_at'):
+        op.create_index('ix_deleted_records_user_deleted_at', 'deleted_records', ['user_id', 'deleted_at'])
+
+
+def downgrade():
+    op.drop_table('deleted_records')
+    for table in ('goals', 'tasks'):
+        op.drop_index(f'ix_{table}_user_updated_at', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,55 @@
+"""add tags_text and full-text index for task search
+
+Revision ID: d1f5a7c9e364
+Revises: b6e8d0a2f357
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1f5a7c9e364'
+down_revision = 'b6e8d0a2f357'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in _inspector().get_columns(table))
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in _inspector().get_indexes(table))
+
+
+def upgrade():
+    if not _has_column('tasks', 'tags_text'):
+        bind = op.get_bind()
+        op.add_column('tasks', sa.Column('tags_text', sa.Text(), nullable=True))
+
+        # 用已有标签回填
+        tasks = sa.table('tasks', sa.column('id', sa.String), sa.column('tags_text', sa.Text))
+        tags = sa.table('task_tags', sa.column('id', sa.Integer), sa.column('task_id', sa.String),
+                        sa.column('tag_name', sa.String))
+        tags_by_task = {}
+        for task_id, tag_name in bind.execute(sa.select(tags.c.task_id, tags.c.tag_name).order_by(tags.c.id)):
+            tags_by_task.setdefault(task_id, []).append(tag_name)
+        for task_id, names in tags_by_task.items():
+            bind.execute(tasks.update().where(tasks.c.id == task_id).values(tags_text=' '.join(names)))
+
+    if not _has_index('tasks', 'ix_tasks_fulltext'):
+        # MySQL创建ngram全文索引，其他数据库忽略mysql_*参数
+        op.create_index('ix_tasks_fulltext', 'tasks', ['title', 'notes', 'expected_outcome', 'tags_text'],
+                        mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade():
+    op.drop_index('ix_tasks_fulltext', table_name='tasks')
+    with op.batch_alter_table('tasks') as batch_op:
+        batch_op.drop_column('tags_text')
@@ -0,0 +1,92 @@
+"""store blacklisted token digests with expiry
+
+Revision ID: e2b8f4a6c913
+Revises: c7d9e1f3a245
+Create Date: 2026-10-17 11:30:00.000000
+
+"""
+from datetime import datetime, timedelta
+import hashlib
+
+from alembic import op
+import jwt
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b8f4a6c913'
+down_revision = 'c7d9e1f3a245'
+branch_labels = None
+depends_on = None
+
+# 刷新令牌的最长有效期，早于此时间加入黑名单的令牌都已过期
+MAX_TOKEN_LIFETIME = timedelta(days=7)
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in _inspector().get_columns(table))
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in _inspector().get_indexes(table))
+
+
+def _token_expiry(token, blacklisted_on):
+    try:
+        payload = jwt.decode(token, options={'verify_signature': False})
+        return datetime.utcfromtimestamp(payload['exp'])
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError):
+        return blacklisted_on + MAX_TOKEN_LIFETIME
+
+
+def upgrade():
+    if _has_column('blacklisted_tokens', 'token'):
+        bind = op.get_bind()
+        op.add_column('blacklisted_tokens', sa.Column('token_digest', sa.String(length=64), nullable=True))
+        op.add_column('blacklisted_tokens', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+        # 已过期的记录没有保留价值，直接删除；其余记录计算摘要和过期时间
+        op.execute(
+            sa.text('DELETE FROM blacklisted_tokens WHERE blacklisted_on < :cutoff')
+            .bindparams(cutoff=datetime.now() - MAX_TOKEN_LIFETIME)
+        )
+        table = sa.table(
+            'blacklisted_tokens',
+            sa.column('id', sa.Integer),
+            sa.column('token', sa.String),
+            sa.column('blacklisted_on', sa.DateTime),
+            sa.column('token_digest', sa.String),
+            sa.column('expires_at', sa.DateTime)
+        )
+        rows = bind.execute(sa.select(table.c.id, table.c.token, table.c.blacklisted_on)).fetchall()
+        for row_id, token, blacklisted_on in rows:
+            bind.execute(
+                table.update().where(table.c.id == row_id).values(
+                    token_digest=hashlib.sha256(token.encode('utf-8')).hexdigest(),
+                    expires_at=_token_expiry(token, blacklisted_on)
+                )
+            )
+
+        with op.batch_alter_table('blacklisted_tokens') as batch_op:
+            batch_op.alter_column('token_digest', existing_type=sa.String(length=64), nullable=False)
+            batch_op.alter_column('expires_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.create_unique_constraint('uq_blacklisted_tokens_token_digest', ['token_digest'])
+            batch_op.drop_column('token')
+
+    if not _has_index('blacklisted_tokens', 'ix_blacklisted_tokens_expires_at'):
+        op.create_index('ix_blacklisted_tokens_expires_at', 'blacklisted_tokens', ['expires_at'])
+
+
+def downgrade():
+    # 摘要无法还原为原始令牌，降级时清空黑名单
+    op.execute('DELETE FROM blacklisted_tokens')
+    op.drop_index('ix_blacklisted_tokens_expires_at', table_name='blacklisted_tokens')
+    with op.batch_alter_table('blacklisted_tokens') as batch_op:
+        batch_op.add_column(sa.Column('token', sa.String(length=500), nullable=False))
+        batch_op.create_unique_constraint('uq_blacklisted_tokens_token', ['token'])
+        batch_op.drop_column('token_digest')
+        batch_op.drop_column('expires_at')
@@ -0,0 +1,133 @@
+"""normalize task tags into a per-user tag table with task counters
+
+Revision ID: e5a9c3d7f481
+Revises: d1f5a7c9e364
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f481'
+down_revision = 'd1f5a7c9e364'
+branch_labels = None
+depends_on = None
+
+TAG_NAME_MAX_LENGTH = 50
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _has_table(name):
+    return _inspector().has_table(name)
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in _inspector().get_columns(table))
+
+
+def _has_index(table, name):
+    return any(index['name'] == name for index in _inspector().get_indexes(table))
+
+
+def _tag_name_type():
+    return sa.String(TAG_NAME_MAX_LENGTH).with_variant(
+        sa.String(TAG_NAME_MAX_LENGTH, collation='utf8mb4_bin'), 'mysql'
+    )
+
+
+def upgrade():
+    if not _has_table('tags'):
+        op.create_table(
+            'tags',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('name', _tag_name_type(), nullable=False),
+            sa.Column('task_count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'name', name='uq_tags_user_name')
+        )
+
+    if _has_column('task_tags', 'tag_name'):
+        _migrate_tag_names()
+
+    # (task_id, tag_id) 唯一索引已覆盖按任务ID的查询
+    if _has_index('task_tags', 'ix_task_tags_task_id'):
+        op.drop_index('ix_task_tags_task_id', table_name='task_tags')
+
+
+def _migrate_tag_names():
+    bind = op.get_bind()
+    op.add_column('task_tags', sa.Column('tag_id', sa.Integer(), nullable=True))
+
+    # 用已有的标签名回填标签表和tag_id：名称去除首尾空白，同一任务的重复标签只保留最早的一行
+    tasks = sa.table('tasks', sa.column('id', sa.String), sa.column('user_id', sa.Integer))
+    tags = sa.table('tags', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                    sa.column('name', sa.String), sa.column('task_count', sa.Integer),
+                    sa.column('created_at', sa.DateTime))
+    task_tags = sa.table('task_tags', sa.column('id', sa.Integer), sa.column('task_id', sa.String),
+                         sa.column('tag_name', sa.String), sa.column('tag_id', sa.Integer))
+
+    rows = bind.execute(
+        sa.select(task_tags.c.id, task_tags.c.task_id, task_tags.c.tag_name, tasks.c.user_id)
+        .select_from(task_tags.join(tasks, tasks.c.id == task_tags.c.task_id))
+        .order_by(task_tags.c.id)
+    ).fetchall()
+    kept, seen = {}, set()  # {(user_id, 标签名): [task_tags行ID]}
+    for row_id, task_id, tag_name, user_id in rows:
+        name = (tag_name or '').strip()[:TAG_NAME_MAX_LENGTH]
+        if name and (task_id, name) not in seen:
+            seen.add((task_id, name))
+            kept.setdefault((user_id, name), []).append(row_id)
+
+    now = datetime.now()
+    if kept:
+        bind.execute(tags.insert(), [
+            {'user_id': user_id, 'name': name, 'task_count': len(row_ids), 'created_at': now}
+            for (user_id, name), row_ids in kept.items()
+        ])
+    for tag_id, user_id, name in bind.execute(sa.select(tags.c.id, tags.c.user_id, tags.c.name)).fetchall():
+        row_ids = kept.get((user_id, name))
+        if row_ids:
+            bind.execute(task_tags.update().where(task_tags.c.id.in_(row_ids)).values(tag_id=tag_id))
+    # 重复、空白或任务已不存在的标签行
+    bind.execute(task_tags.delete().where(task_tags.c.tag_id.is_(None)))
+
+    with op.batch_alter_table('task_tags') as batch_op:
+        batch_op.alter_column('tag_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_foreign_key('fk_task_tags_tag_id', 'tags', ['tag_id'], ['id'])
+        batch_op.create_unique_constraint('uq_task_tags_task_tag', ['task_id', 'tag_id'])
+        batch_op.create_index('ix_task_tags_tag_task', ['tag_id', 'task_id'])
+        batch_op.drop_column('tag_name')
+
+
+def downgrade():
+    bind = op.get_bind()
+    op.add_column('task_tags', sa.Column('tag_name', sa.String(50), nullable=True))
+
+    tags = sa.table('tags', sa.column('id', sa.Integer), sa.column('name', sa.String))
+    task_tags = sa.table('task_tags', sa.column('tag_id', sa.Integer), sa.column('tag_name', sa.String))
+    for tag_id, name in bind.execute(sa.select(tags.c.id, tags.c.name)).fetchall():
+        bind.execute(task_tags.update().where(task_tags.c.tag_id == tag_id).values(tag_name=name))
+
+    # 先建任务ID索引，MySQL删除唯一索引时task_id外键仍需要索引
+    op.create_index('ix_task_tags_task_id', 'task_tags', ['task_id'])
+    with op.batch_alter_table('task_tags') as batch_op:
+        batch_op.alter_column('tag_name', existing_type=sa.String(50), nullable=False)
+        batch_op.drop_index('ix_task_tags_tag_task')
+        batch_op.drop_constraint('uq_task_tags_task_tag', type_='unique')
+        # SQLite重建表时外键随列一起删除，反射得到的外键没有名称
+        for foreign_key in _inspector().get_foreign_keys('task_tags'):
+            if foreign_key['constrained_columns'] == ['tag_id'] and foreign_key['name']:
+                batch_op.drop_constraint(foreign_key['name'], type_='foreignkey')
+        batch_op.drop_column('tag_id')
+
+    op.drop_table('tags')
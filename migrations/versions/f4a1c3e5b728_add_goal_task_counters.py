@@ -0,0 +1,45 @@
+"""add denormalized task counters to goals
+
+Revision ID: f4a1c3e5b728
+Revises: e2b8f4a6c913
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a1c3e5b728'
+down_revision = 'e2b8f4a6c913'
+branch_labels = None
+depends_on = None
+
+
+def _has_column(table, name):
+    return any(column['name'] == name for column in sa.inspect(op.get_bind()).get_columns(table))
+
+
+def upgrade():
+    if _has_column('goals', 'total_tasks'):
+        return
+
+    op.add_column('goals', sa.Column('total_tasks', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('goals', sa.Column('completed_tasks', sa.Integer(), nullable=False, server_default='0'))
+
+    # 用已有任务回填计数
+    goals = sa.table('goals', sa.column('id', sa.String), sa.column('total_tasks', sa.Integer),
+                     sa.column('completed_tasks', sa.Integer))
+    tasks = sa.table('tasks', sa.column('goal_id', sa.String), sa.column('completed', sa.Boolean))
+    op.execute(goals.update().values(
+        total_tasks=sa.select(sa.func.count()).where(tasks.c.goal_id == goals.c.id).scalar_subquery(),
+        completed_tasks=sa.select(sa.func.count()).where(
+            tasks.c.goal_id == goals.c.id, tasks.c.completed == sa.true()
+        ).scalar_subquery()
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('goals') as batch_op:
+        batch_op.drop_column('completed_tasks')
+        batch_op.drop_column('total_tasks')
@@ -1,12 +1,15 @@
 #!/usr/bin/env python3
 import requests
 import json
+import os
 import time
 import random
 import string
 
-# API基础URL
-BASE_URL = "https://flowserver-163620-5-1360594735.sh.run.tcloudbase.com"
+import api_flows
+
+# API基础URL，可通过 API_BASE_URL 环境变量指向其他环境
+BASE_URL = os.environ.get("API_BASE_URL", "https://flowserver-163620-5-1360594735.sh.run.tcloudbase.com")
 
 # 用于存储访问令牌
 access_token = None
@@ -42,12 +45,8 @@ def print_request_response(method, url, data=None, response=None):
 def test_register():
     print_separator("测试用户注册")
     
-    url = f"{BASE_URL}/api/auth/register"
-    data = {
-        "username": test_username,
-        "email": test_email,
-        "password": test_password
-    }
+    _, _, path, data = api_flows.register(test_username, test_email, test_password)
+    url = f"{BASE_URL}{path}"
     
     response = requests.post(url, json=data)
     print_request_response("POST", url, data, response)
@@ -61,11 +60,8 @@ def test_login():
     
     print_separator("测试用户登录")
     
-    url = f"{BASE_URL}/api/auth/login"
-    data = {
-        "username": test_username,
-        "password": test_password
-    }
+    _, _, path, data = api_flows.login(test_username, test_password)
+    url = f"{BASE_URL}{path}"
     
     response = requests.post(url, json=data)
     print_request_response("POST", url, data, response)
@@ -85,7 +81,7 @@ def test_login():
 def test_get_me():
     print_separator("测试获取用户信息")
     
-    url = f"{BASE_URL}/api/auth/me"
+    url = f"{BASE_URL}{api_flows.get_me().path}"
     headers = {"Authorization": f"Bearer {access_token}"}
     
     response = requests.get(url, headers=headers)
@@ -98,15 +94,9 @@ def test_get_me():
 def test_create_goal():
     print_separator("测试创建目标")
     
-    url = f"{BASE_URL}/api/goals"
+    _, _, path, data = api_flows.create_goal()
+    url = f"{BASE_URL}{path}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    data = {
-        "title": "测试目标",
-        "description": "这是一个测试目标",
-        "category": "工作",
-        "color": "#FF5733",
-        "goal_type": "active"
-    }
     
     response = requests.post(url, json=data, headers=headers)
     print_request_response("POST", url, data, response)
@@ -118,7 +108,7 @@ def test_create_goal():
 def test_get_goals():
     print_separator("测试获取所有目标")
     
-    url = f"{BASE_URL}/api/goals"
+    url = f"{BASE_URL}{api_flows.get_goals().path}"
     headers = {"Authorization": f"Bearer {access_token}"}
     
     response = requests.get(url, headers=headers)
@@ -131,21 +121,9 @@ def test_get_goals():
 def test_create_task(goal_id=None):
     print_separator("测试创建任务")
     
-    url = f"{BASE_URL}/api/tasks"
+    _, _, path, data = api_flows.create_task(goal_id)
+    url = f"{BASE_URL}{path}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    data = {
-        "title": "测试任务",
-        "priority": "high",
-        "estimated_time": 60,
-        "tags": ["测试", "重要"],
-        "notes": "这是一个测试任务",
-        "enthusiasm": 4,
-        "difficulty": 3,
-        "importance": 5
-    }
-    
-    if goal_id:
-        data["goal_id"] = goal_id
     
     response = requests.post(url, json=data, headers=headers)
     print_request_response("POST", url, data, response)
@@ -157,7 +135,7 @@ def test_create_task(goal_id=None):
 def test_get_tasks():
     print_separator("测试获取所有任务")
     
-    url = f"{BASE_URL}/api/tasks"
+    url = f"{BASE_URL}{api_flows.get_tasks().path}"
     headers = {"Authorization": f"Bearer {access_token}"}
     
     response = requests.get(url, headers=headers)
@@ -170,13 +148,9 @@ def test_get_tasks():
 def test_update_task(task_id):
     print_separator("测试更新任务")
     
-    url = f"{BASE_URL}/api/tasks/{task_id}"
+    _, _, path, data = api_flows.update_task(task_id)
+    url = f"{BASE_URL}{path}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    data = {
-        "title": "已更新的测试任务",
-        "priority": "medium",
-        "notes": "这是一个已更新的测试任务"
-    }
     
     response = requests.put(url, json=data, headers=headers)
     print_request_response("PUT", url, data, response)
@@ -188,7 +162,7 @@ def test_update_task(task_id):
 def test_toggle_task_complete(task_id):
     print_separator("测试切换任务完成状态")
     
-    url = f"{BASE_URL}/api/tasks/{task_id}/toggle-complete"
+    url = f"{BASE_URL}{api_flows.toggle_task_complete(task_id).path}"
     headers = {"Authorization": f"Bearer {access_token}"}
     
     response = requests.patch(url, headers=headers)
@@ -203,7 +177,7 @@ def test_refresh_token():
     
     print_separator("测试刷新令牌")
     
-    url = f"{BASE_URL}/api/auth/refresh"
+    url = f"{BASE_URL}{api_flows.refresh_token().path}"
     headers = {"Authorization": f"Bearer {refresh_token}"}
     
     response = requests.post(url, headers=headers)
@@ -221,7 +195,7 @@ def test_refresh_token():
 def test_logout():
     print_separator("测试退出登录")
     
-    url = f"{BASE_URL}/api/auth/logout"
+    url = f"{BASE_URL}{api_flows.logout().path}"
     headers = {"Authorization": f"Bearer {access_token}"}
     
     response = requests.post(url, headers=headers)
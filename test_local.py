@@ -0,0 +1,979 @@
+#!/usr/bin/env python3
+# 本地测试：使用SQLite内存数据库运行真实的Flask应用，无需网络和MySQL
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import event
+
+from wxcloudrun import app, db
+from wxcloudrun.ratelimit import rate_limiter
+
+# SQLite内存库使用StaticPool，不支持连接池超时参数
+app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+app.config['SQLALCHEMY_POOL_TIMEOUT'] = None
+app.config['TESTING'] = True
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    # 限流计数是进程内的，每个测试从满额度开始
+    rate_limiter.reset()
+
+
+@pytest.fixture
+def client():
+    with app.app_context():
+        db.create_all()
+        yield app.test_client()
+        db.session.remove()
+        db.drop_all()
+
+
+# 统计执行的SQL语句数量
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, *args, **kwargs):
+        self.count += 1
+        self.statements.append(statement)
+
+    @property
+    def writes(self):
+        return [statement for statement in self.statements if statement.split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+
+    def __enter__(self):
+        self.count = 0
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self)
+
+
+def login(client, username='alice'):
+    client.post('/api/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'secret123'
+    })
+    response = client.post('/api/auth/login', json={'username': username, 'password': 'secret123'})
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+def create_tasks(client, headers, count, **extra):
+    tasks = []
+    for i in range(count):
+        data = {'title': f'任务{i}', 'tags': ['工作', f'标签{i}']}
+        data.update(extra)
+        tasks.append(client.post('/api/tasks', json=data, headers=headers).get_json())
+    return tasks
+
+
+# 1. 任务列表的查询次数不随任务数量增长
+def test_task_list_query_count_is_constant(client):
+    headers = login(client)
+
+    create_tasks(client, headers, 2)
+    with QueryCounter() as small:
+        response = client.get('/api/tasks', headers=headers)
+    assert response.status_code == 200
+    assert len(response.get_json()) == 2
+
+    create_tasks(client, headers, 20)
+    with QueryCounter() as large:
+        response = client.get('/api/tasks', headers=headers)
+    assert len(response.get_json()) == 22
+    assert all(len(task['tags']) == 2 for task in response.get_json())
+
+    assert small.count == large.count
+
+
+# 2. 目标下的任务列表同样批量加载标签
+def test_goal_task_list_query_count_is_constant(client):
+    headers = login(client)
+    goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+
+    create_tasks(client, headers, 2, goal_id=goal['id'])
+    with QueryCounter() as small:
+        client.get(f"/api/goals/{goal['id']}/tasks", headers=headers)
+
+    create_tasks(client, headers, 15, goal_id=goal['id'])
+    with QueryCounter() as large:
+        response = client.get(f"/api/goals/{goal['id']}/tasks", headers=headers)
+    assert len(response.get_json()) == 17
+
+    assert small.count == large.count
+
+
+# 3. 游标分页遍历所有排序方式，结果与不分页时一致且不重复
+@pytest.mark.parametrize('sort_by', [None, 'dueDate', 'createdAt', 'priority', 'alphabetical'])
+def test_task_cursor_pagination_covers_all_sorts(client, sort_by):
+    headers = login(client)
+    for i in range(13):
+        client.post('/api/tasks', json={
+            'title': f'任务{i % 4}',
+            'priority': ['high', 'medium', 'low'][i % 3],
+            'due_date': f'2030-01-0{i % 3 + 1}T09:00:00' if i % 4 else None
+        }, headers=headers)
+
+    params = {'sort': sort_by} if sort_by else {}
+    expected = [task['id'] for task in client.get('/api/tasks', query_string=dict(params, limit=100), headers=headers).get_json()]
+
+    seen, cursor = [], None
+    while True:
+        query = dict(params, limit=4)
+        if cursor:
+            query['cursor'] = cursor
+        response = client.get('/api/tasks', query_string=query, headers=headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert len(page) <= 4
+        seen.extend(task['id'] for task in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert seen == expected
+    assert len(set(seen)) == 13
+
+
+def test_invalid_cursor_is_rejected(client):
+    headers = login(client)
+    response = client.get('/api/tasks', query_string={'cursor': 'not-a-cursor'}, headers=headers)
+    assert response.status_code == 400
+    assert response.get_json()['error']['code'] == 'invalid_page'
+
+
+# 4. 增量同步只返回变更的数据和删除记录
+def test_sync_returns_only_changes_since_token(client):
+    from datetime import datetime, timedelta
+    from wxcloudrun.dao import encode_sync_token
+    from wxcloudrun.model import Task, Goal
+
+    headers = login(client)
+    goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+    tasks = create_tasks(client, headers, 3)
+
+    full = client.get('/api/sync', headers=headers).get_json()
+    assert full['full'] is True
+    assert len(full['tasks']) == 3 and len(full['goals']) == 1
+
+    # 把已有数据的更新时间调到一小时前，模拟上次同步之后没有变化
+    an_hour_ago = datetime.now() - timedelta(hours=1)
+    Task.query.update({'updated_at': an_hour_ago})
+    Goal.query.update({'updated_at': an_hour_ago})
+    db.session.commit()
+    since = encode_sync_token(datetime.now() - timedelta(minutes=1))
+
+    client.put(f"/api/tasks/{tasks[0]['id']}", json={'tags': ['新标签']}, headers=headers)
+    client.delete(f"/api/tasks/{tasks[1]['id']}", headers=headers)
+    client.delete(f"/api/goals/{goal['id']}", headers=headers)
+
+    changes = client.get('/api/sync', query_string={'since': since}, headers=headers).get_json()
+    assert changes['full'] is False
+    assert [task['id'] for task in changes['tasks']] == [tasks[0]['id']]
+    assert changes['tasks'][0]['tags'] == ['新标签']
+    assert changes['goals'] == []
+    assert changes['deleted'] == {'tasks': [tasks[1]['id']], 'goals': [goal['id']]}
+    assert changes['sync_token']
+
+    response = client.get('/api/sync', query_string={'since': '@@@'}, headers=headers)
+    assert response.status_code == 400
+
+
+# 5. 未吊销的令牌不访问数据库，注销后令牌立即失效，过期记录会被清理，清理后重新加载失败时不放行已注销的令牌
+def test_token_blacklist_filter_and_sweeper(client, monkeypatch):
+    from datetime import datetime, timedelta
+    from wxcloudrun.blacklist import token_blacklist
+    from wxcloudrun.dao import add_token_to_blacklist
+    from wxcloudrun.model import BlacklistedToken
+    from wxcloudrun.utils import decode_token
+
+    headers = login(client)
+    token = headers['Authorization'].split(' ')[1]
+    token_blacklist._reset()
+
+    assert decode_token(token)  # 首次调用加载过滤器
+    with QueryCounter() as counter:
+        assert decode_token(token)
+    assert counter.count == 0
+
+    assert client.post('/api/auth/logout', headers=headers).status_code == 204
+    assert decode_token(token) is None
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+
+    add_token_to_blacklist('0' * 64, datetime.utcnow() - timedelta(minutes=1))
+    token_blacklist._last_sweep = float('-inf')
+    token_blacklist._last_refresh = None
+    decode_token(login(client, 'bob')['Authorization'].split(' ')[1])
+    assert BlacklistedToken.query.filter_by(token_digest='0' * 64).first() is None
+    assert BlacklistedToken.query.count() == 1
+
+    # 清理成功但重新加载失败：保留旧过滤器，已注销的令牌仍然无效，下个刷新间隔再重试加载
+    from wxcloudrun import blacklist
+    add_token_to_blacklist('1' * 64, datetime.utcnow() - timedelta(minutes=1))
+    token_blacklist._last_sweep = float('-inf')
+    token_blacklist._last_refresh = None
+    monkeypatch.setattr(blacklist, 'get_blacklisted_digests_after', lambda last_id: None)
+    assert decode_token(token) is None
+    assert BlacklistedToken.query.filter_by(token_digest='1' * 64).first() is None
+    assert token_blacklist._rebuild_pending
+    with QueryCounter() as counter:
+        assert decode_token(token) is None  # 刷新间隔内不重试
+    assert counter.count == 0
+    monkeypatch.undo()
+    token_blacklist._last_refresh = None  # 模拟刷新间隔已过
+    assert decode_token(token) is None
+    assert token_blacklist._last_refresh is not None and not token_blacklist._rebuild_pending
+
+
+# 6. 认证缓存命中时不访问数据库，注销和停用用户后立即失效，其他进程停用的用户在黑名单刷新时失效
+def test_auth_cache_serves_warm_requests_without_queries(client, monkeypatch):
+    from wxcloudrun import dao
+    from wxcloudrun.blacklist import token_blacklist
+    from wxcloudrun.cache import TTLCache, auth_cache
+
+    headers = login(client)
+    client.get('/api/auth/me', headers=headers)
+
+    hits = auth_cache.hits
+    with QueryCounter() as counter:
+        response = client.get('/api/auth/me', headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['username'] == 'alice'
+    assert counter.count == 0
+    assert auth_cache.hits == hits + 1
+
+    user_id = response.get_json()['id']
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['set-user-active', str(user_id), '--inactive'])
+    assert result.exit_code == 0, result.output
+    response = client.get('/api/auth/me', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error']['code'] == 'user_inactive'
+
+    assert runner.invoke(args=['set-user-active', str(user_id), '--active']).exit_code == 0
+    assert runner.invoke(args=['set-user-active', '9999', '--inactive']).exit_code != 0
+
+    # 另一个进程停用用户：只清除了那个进程的缓存，本进程在下次黑名单刷新时清除
+    headers = login(client)
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+    with monkeypatch.context() as m:
+        m.setattr(dao, 'auth_cache', TTLCache(maxsize=10, ttl=60))
+        assert dao.set_user_active(user_id, False)
+    token_blacklist._last_refresh = None  # 模拟刷新间隔已过
+    response = client.get('/api/auth/me', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error']['code'] == 'user_inactive'
+    # 同一次变更只清除一次缓存
+    with monkeypatch.context() as m:
+        m.setattr(dao, 'auth_cache', TTLCache(maxsize=10, ttl=60))
+        assert dao.set_user_active(user_id, True)
+    token_blacklist._last_refresh = None
+    assert client.get('/api/auth/me', headers=headers).status_code == 200
+    token_blacklist._last_refresh = None
+    client.get('/api/auth/me', headers=headers)
+    with QueryCounter() as counter:
+        assert client.get('/api/auth/me', headers=headers).status_code == 200
+    assert counter.count == 0
+
+    headers = login(client)
+    client.get('/api/auth/me', headers=headers)
+    client.post('/api/auth/logout', headers=headers)
+    assert client.get('/api/auth/me', headers=headers).status_code == 401
+
+
+# 7. 批量操作在一个事务中执行，语句数量不随操作数量增长
+def test_task_batch_operations(client):
+    headers = login(client)
+    existing = create_tasks(client, headers, 3)
+
+    def run_batch(count):
+        # 每次使用新的标签名，两次批量都需要创建标签
+        operations = [{'op': 'create', 'data': {'title': f'批量{i}', 'tags': [f'批量{count}']}} for i in range(count)]
+        operations += [
+            {'op': 'update', 'id': existing[0]['id'], 'data': {'title': '已更新', 'tags': [f'新{count}']}},
+            {'op': 'toggle', 'id': existing[1]['id']},
+            {'op': 'toggle', 'id': existing[1]['id']},
+            {'op': 'toggle', 'id': existing[0]['id']},
+            {'op': 'delete', 'id': existing[2]['id']},
+            {'op': 'toggle', 'id': existing[2]['id']},
+            {'op': 'create', 'data': {}},
+            {'op': 'explode'}
+        ]
+        with QueryCounter() as counter:
+            response = client.post('/api/tasks/batch', json={'operations': operations}, headers=headers)
+        assert response.status_code == 200
+        return response.get_json()['results'], counter.count
+
+    results, small = run_batch(2)
+    assert [result['status'] for result in results] == ['ok'] * 7 + ['error'] * 3
+    assert results[0]['task']['tags'] == ['批量2']
+    assert results[2]['task']['title'] == '已更新'
+    assert results[2]['task']['completed'] is True
+    assert results[2]['task']['tags'] == ['新2']
+    assert results[4]['task']['completed'] is False
+    assert [result['code'] for result in results[7:]] == ['task_not_found', 'missing_title', 'invalid_operation']
+    assert client.get(f"/api/tasks/{existing[2]['id']}", headers=headers).status_code == 404
+
+    existing[2] = create_tasks(client, headers, 1)[0]
+    _, large = run_batch(20)
+    assert small == large
+    assert len(client.get('/api/tasks', headers=headers).get_json()) == 3 + 2 - 1 + 1 + 20 - 1
+
+    # 清空重复日期、非列表的标签只影响对应的操作
+    task_id = existing[0]['id']
+    client.put(f'/api/tasks/{task_id}', json={'custom_week_days': [1, 3]}, headers=headers)
+    response = client.put(f'/api/tasks/{task_id}', json={'custom_week_days': []}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['custom_week_days'] is None
+    results = client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': task_id, 'data': {'custom_week_days': []}},
+        {'op': 'update', 'id': task_id, 'data': {'tags': 'work'}},
+        {'op': 'create', 'data': {'title': '标签错误', 'tags': 'work'}},
+    ]}, headers=headers).get_json()['results']
+    assert [result['status'] for result in results] == ['ok', 'error', 'error']
+    assert results[0]['task']['custom_week_days'] is None
+    assert [result['code'] for result in results[1:]] == ['invalid_tags', 'invalid_tags']
+
+
+# 8. 每条任务写入路径都增量维护目标计数和进度，结果与聚合重算一致
+def test_goal_counters_follow_task_writes(client):
+    from wxcloudrun.dao import calculate_goal_progress
+
+    headers = login(client)
+    first = client.post('/api/goals', json={'title': '目标一'}, headers=headers).get_json()
+    second = client.post('/api/goals', json={'title': '目标二'}, headers=headers).get_json()
+
+    def counters(goal):
+        goal = client.get(f"/api/goals/{goal['id']}", headers=headers).get_json()
+        return goal['total_tasks'], goal['completed_tasks'], goal['progress'], goal['completed']
+
+    tasks = create_tasks(client, headers, 3, goal_id=first['id'])
+    assert counters(first) == (3, 0, 0, False)
+
+    client.patch(f"/api/tasks/{tasks[0]['id']}/toggle-complete", headers=headers)
+    assert counters(first) == (3, 1, 33, False)
+
+    client.put(f"/api/tasks/{tasks[1]['id']}", json={'goal_id': second['id'], 'completed': True}, headers=headers)
+    assert counters(first) == (2, 1, 50, False)
+    assert counters(second) == (1, 1, 100, True)
+
+    client.delete(f"/api/tasks/{tasks[2]['id']}", headers=headers)
+    assert counters(first) == (1, 1, 100, True)
+
+    client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': '批量', 'goal_id': first['id']}},
+        {'op': 'toggle', 'id': tasks[0]['id']},
+        {'op': 'update', 'id': tasks[1]['id'], 'data': {'goal_id': first['id']}},
+    ]}, headers=headers)
+    assert counters(first) == (3, 1, 33, True)
+    assert counters(second)[:2] == (0, 0)
+
+    # 客户端不能直接改写计数，聚合重算与增量结果一致
+    client.put(f"/api/goals/{first['id']}", json={'total_tasks': 99}, headers=headers)
+    assert counters(first) == (3, 1, 33, True)
+    assert calculate_goal_progress(first['id'])
+    assert counters(first) == (3, 1, 33, True)
+
+
+# 9. 导入应用时不访问网络（冷启动路径），健康检查无需数据库即可返回200
+def test_import_does_no_network_io():
+    code = (
+        "import socket\n"
+        "def deny(*args):\n"
+        "    raise AssertionError('network I/O during import')\n"
+        "socket.socket.connect = deny\n"
+        "from run import app\n"
+        "assert app.test_client().get('/api/health').status_code == 200\n"
+    )
+    env = {key: value for key, value in os.environ.items() if key != 'DATABASE_URI'}
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), env=env, check=True)
+
+
+# 10. 各JSON编码后端输出一致（日期时间均为ISO 8601格式）
+def test_json_backends_produce_identical_output(client):
+    from wxcloudrun import serializers
+
+    headers = login(client)
+    task = create_tasks(client, headers, 1, due_date='2026-03-01T08:30:00.250000',
+                        custom_week_days=[1, 3], is_repeating=True)[0]
+
+    outputs = []
+    for name in sorted(serializers.BACKENDS):
+        serializers.set_backend(name)
+        outputs.append(client.get(f"/api/tasks/{task['id']}", headers=headers).get_json())
+    serializers.set_backend()
+
+    assert all(output == outputs[0] for output in outputs)
+    assert outputs[0]['due_date'] == '2026-03-01T08:30:00.250000'
+    assert outputs[0]['custom_week_days'] == [1, 3]
+    assert outputs[0]['tags'] == ['工作', '标签0']
+
+
+# 11. 流式返回完整列表：分块读取，结果与逐页读取一致，支持过滤、排序和游标
+def test_stream_task_list_matches_pages(client, monkeypatch):
+    from wxcloudrun import dao
+
+    monkeypatch.setattr(dao, 'STREAM_CHUNK_SIZE', 4)
+    headers = login(client)
+    goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+    create_tasks(client, headers, 9, goal_id=goal['id'])
+    create_tasks(client, headers, 2)
+
+    def pages(query):
+        items, cursor = [], None
+        while True:
+            url = f'/api/tasks?limit=3&{query}' + (f'&cursor={cursor}' if cursor else '')
+            response = client.get(url, headers=headers)
+            items += response.get_json()
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                return items
+
+    for query in ('sort=priority', 'sort=alphabetical', f"goal_id={goal['id']}"):
+        with QueryCounter() as counter:
+            response = client.get(f'/api/tasks?stream=1&{query}', headers=headers)
+            streamed = response.get_json()
+        assert 'Content-Length' not in response.headers
+        assert streamed == pages(query)
+        assert counter.count >= len(streamed) // 4
+
+    response = client.get('/api/tasks?limit=5', headers=headers)
+    rest = client.get(f"/api/tasks?stream=1&cursor={response.headers['X-Next-Cursor']}", headers=headers).get_json()
+    assert response.get_json() + rest == client.get('/api/tasks', headers=headers).get_json()
+
+    assert client.get('/api/tasks?stream=1&cursor=bad', headers=headers).status_code == 400
+    assert client.get(f"/api/goals/{goal['id']}/tasks?stream=true", headers=headers).get_json() == \
+        client.get(f"/api/goals/{goal['id']}/tasks", headers=headers).get_json()
+    assert client.get('/api/goals?stream=1', headers=headers).get_json() == client.get('/api/goals', headers=headers).get_json()
+    assert client.get('/api/tasks?stream=1&filter=completed', headers=headers).get_json() == []
+
+
+# 12. 列表接口支持ETag条件请求：数据未变化时返回304且不查询任务表，任何写入都会使ETag失效
+def test_list_etag_follows_data_version(client):
+    headers = login(client)
+    goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+    task = create_tasks(client, headers, 2, goal_id=goal['id'])[0]
+
+    def get(url, etag=None):
+        extra = {'If-None-Match': etag} if etag else {}
+        return client.get(url, headers={**headers, **extra})
+
+    for url in ('/api/tasks', '/api/tasks?sort=priority', '/api/goals', f"/api/goals/{goal['id']}/tasks"):
+        response = get(url)
+        etag = response.headers['ETag']
+        assert response.status_code == 200
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        response = get(url, etag)
+        event.remove(db.engine, 'before_cursor_execute', record)
+        assert not [statement for statement in statements if 'FROM tasks' in statement or 'FROM goals' in statement]
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert not response.data
+
+    etags = {url: get(url).headers['ETag'] for url in ('/api/tasks', '/api/tasks?sort=priority', '/api/goals')}
+    assert len(set(etags.values())) == 3
+
+    writes = [
+        lambda: client.patch(f"/api/tasks/{task['id']}/toggle-complete", headers=headers),
+        lambda: client.put(f"/api/tasks/{task['id']}", json={'tags': ['新']}, headers=headers),
+        lambda: client.put(f"/api/goals/{goal['id']}", json={'title': '改名'}, headers=headers),
+        lambda: client.post('/api/tasks/batch', json={'operations': [{'op': 'toggle', 'id': task['id']}]}, headers=headers),
+        lambda: client.delete(f"/api/tasks/{task['id']}", headers=headers),
+    ]
+    for write in writes:
+        etag = get('/api/tasks').headers['ETag']
+        write()
+        assert get('/api/tasks', etag).status_code == 200
+
+    # 其他用户的写入不影响当前用户的ETag
+    etag = get('/api/tasks').headers['ETag']
+    create_tasks(client, login(client, 'bob'), 1)
+    assert get('/api/tasks', etag).status_code == 304
+
+
+# 13. 重复任务展开：按规则生成窗口内的发生，遵守次数、结束时间和自定义星期
+def test_task_occurrences_in_range(client):
+    headers = login(client)
+    monthly = create_tasks(client, headers, 1, due_date='2026-01-31T09:00:00', is_repeating=True,
+                           repeat_frequency='monthly', repeat_interval=1)[0]
+    custom = create_tasks(client, headers, 1, due_date='2026-01-31T20:00:00', is_repeating=True,
+                          repeat_frequency='custom', repeat_interval=2, custom_week_days=[1, 3], repeat_count=3)[0]
+    create_tasks(client, headers, 1, due_date='2026-01-01T08:00:00', is_repeating=True,
+                 repeat_frequency='daily', repeat_end_date='2026-01-20T00:00:00')
+    create_tasks(client, headers, 1, due_date='2026-02-10T08:00:00')
+
+    with QueryCounter() as counter:
+        response = client.get('/api/tasks/occurrences?from=2026-02-01T00:00:00&to=2026-04-01T00:00:00', headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert sorted(task['id'] for task in data['tasks']) == sorted([monthly['id'], custom['id']])
+    assert [(o['task_id'], o['index'], o['due_date']) for o in data['occurrences']] == [
+        (custom['id'], 0, '2026-02-09T20:00:00'),
+        (custom['id'], 1, '2026-02-11T20:00:00'),
+        (custom['id'], 2, '2026-02-23T20:00:00'),
+        (monthly['id'], 1, '2026-02-28T09:00:00'),
+        (monthly['id'], 2, '2026-03-31T09:00:00'),
+    ]
+    # 认证缓存命中时：数据版本号 + 候选任务 + 标签
+    assert counter.count <= 4
+
+    assert client.get('/api/tasks/occurrences?from=2026-01-01T00:00:00&to=2027-03-01T00:00:00',
+                      headers=headers).get_json()['error']['code'] == 'invalid_range'
+    assert client.get('/api/tasks/occurrences?from=bad&to=2026-03-01', headers=headers).status_code == 400
+
+
+# 14. 任务搜索：匹配标题、备注、期望成果和标签，按相关度排序分页，随任务写入保持正确
+def test_task_search(client):
+    headers = login(client)
+    create_tasks(client, headers, 3)
+    in_title = client.post('/api/tasks', json={'title': '周末买菜', 'tags': ['家务']}, headers=headers).get_json()
+    in_notes = client.post('/api/tasks', json={'title': '整理', 'notes': '记得买菜和水果'}, headers=headers).get_json()
+    in_tags = client.post('/api/tasks', json={'title': '购物', 'tags': ['买菜']}, headers=headers).get_json()
+    create_tasks(client, login(client, 'bob'), 1, title='买菜')
+
+    def search(q, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        return client.get(f'/api/tasks/search?q={q}&{query}', headers=headers)
+
+    assert [task['id'] for task in search('买菜').get_json()] == [in_title['id'], in_tags['id'], in_notes['id']]
+
+    first = search('买菜', limit=2)
+    second = search('买菜', limit=2, cursor=first.headers['X-Next-Cursor'])
+    assert [task['id'] for task in first.get_json() + second.get_json()] == \
+        [in_title['id'], in_tags['id'], in_notes['id']]
+    assert 'X-Next-Cursor' not in second.headers
+    assert search('整理', cursor=first.headers['X-Next-Cursor']).status_code == 400
+
+    client.put(f"/api/tasks/{in_tags['id']}", json={'tags': ['其他']}, headers=headers)
+    client.delete(f"/api/tasks/{in_notes['id']}", headers=headers)
+    client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'update', 'id': in_title['id'], 'data': {'title': '周末', 'tags': ['买菜']}}
+    ]}, headers=headers)
+    assert [task['id'] for task in search('买菜').get_json()] == [in_title['id']]
+    assert search('100%').get_json() == []
+    assert search('买').get_json()['error']['code'] == 'query_too_short'
+
+
+# 15. 标签字典：标签计数随各写入路径维护，按标签筛选支持包含全部（all）和任一（any）
+def test_tag_counts_and_tag_filter(client):
+    headers = login(client)
+    work = client.post('/api/tasks', json={'title': '写周报', 'tags': ['工作', ' 工作 ', '紧急']}, headers=headers).get_json()
+    both = client.post('/api/tasks', json={'title': '报销', 'tags': ['工作', '财务']}, headers=headers).get_json()
+    client.post('/api/tasks', json={'title': '跑步', 'tags': ['健康']}, headers=headers)
+    client.post('/api/tasks', json={'title': '别人的', 'tags': ['工作']}, headers=login(client, 'bob'))
+    assert work['tags'] == ['工作', '紧急']
+
+    def counts():
+        return {tag['name']: tag['task_count'] for tag in client.get('/api/tags', headers=headers).get_json()['tags']}
+
+    def titles(query):
+        return sorted(task['title'] for task in client.get(f'/api/tasks?{query}', headers=headers).get_json())
+
+    assert counts() == {'工作': 2, '紧急': 1, '财务': 1, '健康': 1}
+    assert titles('tag=工作') == ['写周报', '报销']
+    assert titles('tag=工作&tag=财务') == ['报销']
+    assert titles('tag=紧急&tag=财务&tag_mode=any') == ['写周报', '报销']
+    assert titles('tag=工作&tag=不存在') == []
+    assert titles('tag=工作&tag=财务&limit=1&stream=1') == ['报销']
+    assert client.get('/api/tasks?tag=工作&tag_mode=some', headers=headers).status_code == 400
+
+    client.put(f"/api/tasks/{work['id']}", json={'tags': ['财务']}, headers=headers)
+    client.delete(f"/api/tasks/{both['id']}", headers=headers)
+    client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': '开会', 'tags': ['工作', '工作']}},
+        {'op': 'update', 'id': work['id'], 'data': {'tags': []}}
+    ]}, headers=headers)
+    assert counts() == {'工作': 1, '健康': 1}
+    assert titles('tag=财务') == []
+
+
+# 16. PATCH按差异更新：只写入变化的字段和标签关联行，没有变化时不写数据库
+def test_patch_writes_only_differences(client):
+    headers = login(client)
+    task = client.post('/api/tasks', json={'title': '读书', 'tags': ['学习', '晚上']}, headers=headers).get_json()
+    goal = client.post('/api/goals', json={'title': '健身'}, headers=headers).get_json()
+
+    def patch(url, data):
+        with QueryCounter() as counter:
+            response = client.patch(url, json=data, headers=headers)
+        assert response.status_code == 200
+        return response.get_json(), counter.writes
+
+    same, writes = patch(f"/api/tasks/{task['id']}", {'title': '读书', 'tags': ['晚上', '学习'], 'priority': 'medium'})
+    assert writes == []
+    assert same['updated_at'] == task['updated_at']
+
+    changed, writes = patch(f"/api/tasks/{task['id']}", {'title': '读书', 'priority': 'high', 'tags': ['学习', '周末']})
+    assert changed['priority'] == 'high' and changed['tags'] == ['学习', '周末']
+    task_updates = [statement for statement in writes if statement.startswith('UPDATE tasks')]
+    assert len(task_updates) == 1 and 'priority' in task_updates[0] and 'title' not in task_updates[0]
+    assert len([statement for statement in writes if statement.startswith(('INSERT INTO task_tags', 'DELETE FROM task_tags'))]) == 2
+    counts = {tag['name']: tag['task_count'] for tag in client.get('/api/tags', headers=headers).get_json()['tags']}
+    assert counts == {'学习': 1, '周末': 1}
+
+    assert patch(f"/api/goals/{goal['id']}", {'title': '健身', 'color': goal['color']})[1] == []
+    renamed, writes = patch(f"/api/goals/{goal['id']}", {'title': '跑步'})
+    assert renamed['title'] == '跑步' and len([statement for statement in writes if statement.startswith('UPDATE goals')]) == 1
+
+    assert client.patch('/api/tasks/missing', json={'title': 'x'}, headers=headers).status_code == 404
+    assert client.patch(f"/api/tasks/{task['id']}", json={'tags': '学习'}, headers=headers).status_code == 400
+    assert client.patch(f"/api/goals/{goal['id']}", json={'title': ''}, headers=headers).status_code == 400
+
+
+# 17. 异步入口：只读接口经异步连接池查询，响应与同步接口逐字节一致；其他接口转交Flask应用处理
+def test_asgi_routes_match_wsgi(tmp_path):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('a2wsgi')
+    import asyncio
+    from urllib.parse import quote
+    from wxcloudrun import asgi, async_dao
+
+    # 同步和异步两个连接池需要访问同一个数据库文件
+    memory_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'asgi.db'}"
+    try:
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            headers = login(client)
+            tasks = create_tasks(client, headers, 3)
+            goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+            client.put(f"/api/tasks/{tasks[0]['id']}", json={'goal_id': goal['id']}, headers=headers)
+            urls = [
+                '/api/auth/me', '/api/tasks', '/api/tasks?limit=2&sort=alphabetical', '/api/tasks?tag=工作&tag=标签1',
+                f"/api/tasks/{tasks[1]['id']}", '/api/goals', f"/api/goals/{goal['id']}",
+                f"/api/goals/{goal['id']}/tasks", '/api/tags', '/api/tasks?limit=0', '/api/tasks?tag_mode=some',
+                '/api/tasks/00000000-0000-0000-0000-000000000000', '/api/tasks/search?q=任务', '/api/tasks?stream=1'
+            ]
+            expected = {url: client.get(url, headers=headers) for url in urls}
+            for response in expected.values():
+                response.get_data()  # 流式响应需要在应用上下文中读完
+
+        async def call(url, method='GET', extra_headers=()):
+            path, _, query = url.partition('?')
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await asgi.app({
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'scheme': 'http',
+                'method': method, 'path': path, 'raw_path': path.encode(), 'root_path': '',
+                'query_string': quote(query, safe='=&').encode(), 'server': ('127.0.0.1', 80), 'client': ('127.0.0.1', 1234),
+                'headers': [(b'authorization', headers['Authorization'].encode())] + list(extra_headers)
+            }, receive, send)
+            response_headers = {name.decode().lower(): value.decode() for name, value in messages[0]['headers']}
+            return messages[0]['status'], response_headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+        async def main():
+            try:
+                for url in urls:
+                    status, response_headers, body = await call(url)
+                    assert status == expected[url].status_code, url
+                    assert body == expected[url].data, url
+                    for name in ('etag', 'x-next-cursor', 'access-control-expose-headers'):
+                        assert response_headers.get(name) == expected[url].headers.get(name), (url, name)
+
+                etag = expected['/api/tasks'].headers['ETag']
+                assert (await call('/api/tasks', extra_headers=[(b'if-none-match', etag.encode())]))[0] == 304
+                assert (await call(f"/api/tasks/{tasks[2]['id']}", method='DELETE'))[0] == 204
+                assert (await call('/api/tasks', extra_headers=[(b'if-none-match', etag.encode())]))[0] == 200
+            finally:
+                await async_dao.dispose_engine()
+
+        asyncio.run(main())
+    finally:
+        with app.app_context():
+            db.session.remove()
+        app.config['SQLALCHEMY_DATABASE_URI'] = memory_uri
+
+
+# 18. 密码哈希参数调整后，登录成功时按新参数重新哈希；哈希排队已满时注册/登录返回503
+def test_password_rehash_on_login_and_busy_hasher(client):
+    from wxcloudrun.model import User
+    from wxcloudrun.passwords import password_hasher
+
+    method = password_hasher.method
+    try:
+        password_hasher.method = 'pbkdf2:sha256:1000'
+        login(client)
+        old_hash = User.query.filter_by(username='alice').first().password_hash
+        assert old_hash.startswith('pbkdf2:sha256:1000$')
+
+        password_hasher.method = 'pbkdf2:sha512:2000'
+        assert client.post('/api/auth/login', json={'username': 'alice', 'password': 'wrong'}).status_code == 401
+        assert User.query.filter_by(username='alice').first().password_hash == old_hash
+
+        login(client)
+        new_hash = User.query.filter_by(username='alice').first().password_hash
+        assert new_hash.startswith('pbkdf2:sha512:2000$')
+        login(client)
+        assert User.query.filter_by(username='alice').first().password_hash == new_hash
+    finally:
+        password_hasher.method = method
+
+    max_pending = password_hasher.max_pending
+    rejected = password_hasher.stats()['rejected']
+    try:
+        password_hasher.max_pending = 0
+        response = client.post('/api/auth/login', json={'username': 'alice', 'password': 'secret123'})
+        assert response.status_code == 503
+        assert response.get_json()['error']['code'] == 'server_busy'
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        password_hasher.max_pending = max_pending
+    stats = password_hasher.stats()
+    assert stats['rejected'] == rejected + 1
+    assert stats['queued'] == 0 and stats['running'] == 0
+
+
+# 19. 限流：超过额度返回429和Retry-After，按用户计数互不影响（含刷新令牌）；并发名额用完时直接返回503
+def test_rate_limit_and_load_shedding(client):
+    from wxcloudrun.ratelimit import admission, parse_budget
+
+    alice = login(client, 'alice')
+    bob = login(client, 'bob')
+    budgets = dict(rate_limiter.budgets)
+    try:
+        rate_limiter.budgets['list'] = parse_budget('3/60')
+        assert [client.get('/api/tasks', headers=alice).status_code for _ in range(3)] == [200] * 3
+        response = client.get('/api/tasks', headers=alice)
+        assert response.status_code == 429
+        assert response.get_json()['error']['code'] == 'rate_limited'
+        assert 1 <= int(response.headers['Retry-After']) <= 20
+        # 其他用户、其他额度的接口和健康检查不受影响
+        assert client.get('/api/tasks', headers=bob).status_code == 200
+        assert client.get('/api/auth/me', headers=alice).status_code == 200
+        assert client.get('/api/health').status_code == 200
+
+        # 登录按IP计数
+        rate_limiter.budgets['login'] = parse_budget('1/60')
+        rate_limiter.reset()
+        credentials = {'username': 'alice', 'password': 'wrong'}
+        assert client.post('/api/auth/login', json=credentials).status_code == 401
+        assert client.post('/api/auth/login', json=credentials).status_code == 429
+        assert client.post('/api/auth/login', json=credentials,
+                           environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 401
+
+        # 刷新令牌按用户计数，同一IP后的其他用户不受影响
+        from wxcloudrun.utils import generate_refresh_token
+        rate_limiter.budgets['refresh'] = parse_budget('1/60')
+        for user_id in (1, 2):
+            refresh = {'Authorization': f'Bearer {generate_refresh_token(user_id)}'}
+            assert client.post('/api/auth/refresh', headers=refresh).status_code == 200
+        assert client.post('/api/auth/refresh', headers=refresh).status_code == 429
+
+        # 签名无效的令牌按IP计数，不消耗令牌中声称的用户的额度
+        import jwt
+        forged = {'Authorization': 'Bearer ' + jwt.encode({'sub': 2, 'type': 'access'}, 'wrong-key', algorithm='HS256')}
+        rate_limiter.budgets['list'] = parse_budget('2/60')
+        rate_limiter.reset()
+        assert [client.get('/api/tasks', headers=forged).status_code for _ in range(3)] == [401, 401, 429]
+        assert [client.get('/api/tasks', headers=bob).status_code for _ in range(2)] == [200, 200]
+    finally:
+        rate_limiter.budgets.update(budgets)
+        rate_limiter.reset()
+
+    max_in_flight = admission.max_in_flight
+    try:
+        admission.max_in_flight = 1
+        admission.in_flight = 1  # 模拟另一个请求正在处理
+        response = client.get('/api/tasks', headers=bob)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert client.get('/api/health').status_code == 200
+        admission.in_flight = 0
+        assert client.get('/api/tasks', headers=bob).status_code == 200
+        assert admission.in_flight == 0
+    finally:
+        admission.max_in_flight = max_in_flight
+        admission.in_flight = 0
+
+
+# 20. 每日统计汇总随每条任务写入路径增量维护，与由任务表重建的结果一致；统计接口只读汇总表
+def test_task_stats_rollups(client):
+    from wxcloudrun.dao import rebuild_task_stats
+    from wxcloudrun.model import TaskDailyStat, User
+
+    headers = login(client)
+    user_id = User.query.filter_by(username='alice').first().id
+    goal = client.post('/api/goals', json={'title': '目标'}, headers=headers).get_json()
+    other_goal = client.post('/api/goals', json={'title': '另一个目标'}, headers=headers).get_json()
+
+    def create(**data):
+        return client.post('/api/tasks', json=dict({'title': '任务'}, **data), headers=headers).get_json()
+
+    a = create(due_date='2026-03-02T09:00:00', priority='high', estimated_time=30, actual_time=40, enthusiasm=4,
+               goal_id=goal['id'])
+    b = create(due_date='2026-03-02T18:00:00', priority='low', estimated_time=20, difficulty=2)
+    c = create(due_date='2026-03-04T10:00:00', importance=5, goal_id=other_goal['id'], estimated_time=15)
+    d = create(due_date='2026-03-10T10:00:00', priority='high', estimated_time=60, actual_time=50)
+    client.patch(f"/api/tasks/{a['id']}/toggle-complete", headers=headers)
+    client.patch(f"/api/tasks/{b['id']}", json={'completed': True, 'actual_time': 25}, headers=headers)
+    client.put(f"/api/tasks/{d['id']}", json={'due_date': '2026-03-03T10:00:00', 'completed': True}, headers=headers)
+    client.post('/api/tasks/batch', json={'operations': [
+        {'op': 'create', 'data': {'title': '批量', 'due_date': '2026-03-03T08:00:00', 'estimated_time': 10}},
+        {'op': 'update', 'id': c['id'], 'data': {'priority': 'high'}},
+        {'op': 'toggle', 'id': c['id']},
+    ]}, headers=headers)
+    e = create(due_date='2026-03-05T10:00:00')
+    client.delete(f"/api/tasks/{e['id']}", headers=headers)
+    client.delete(f"/api/goals/{other_goal['id']}", headers=headers)
+    create()  # 没有截止日期，按创建日期计入
+
+    def rollups():
+        return sorted(
+            (row.day, row.dimension, row.value, row.total, row.completed, row.estimated_time, row.actual_time)
+            for row in TaskDailyStat.query.filter_by(user_id=user_id) if row.total
+        )
+
+    incremental = rollups()
+    assert rebuild_task_stats(user_id) > 0
+    assert rollups() == incremental
+
+    with QueryCounter() as counter:
+        response = client.get('/api/stats?from=2026-03-02&to=2026-03-08', headers=headers)
+    # 认证缓存命中时：每日合计 + 分组合计
+    assert counter.count == 2
+    stats = response.get_json()
+    summary = ('total', 'completed', 'completion_rate', 'estimated_time', 'actual_time')
+    assert [tuple(item[key] for key in ('period',) + summary) for item in stats['series'][:4]] == [
+        ('2026-03-02', 2, 2, 1.0, 50, 65),
+        ('2026-03-03', 2, 1, 0.5, 70, 50),
+        ('2026-03-04', 1, 1, 1.0, 15, 0),
+        ('2026-03-05', 0, 0, None, 0, 0),
+    ]
+    assert len(stats['series']) == 7
+    assert tuple(stats['totals'][key] for key in summary) == (5, 4, 0.8, 135, 115)
+    assert [(item['key'], item['total'], item['completed']) for item in stats['by_priority']] == [
+        ('high', 3, 3), ('medium', 1, 0), ('low', 1, 1)
+    ]
+    assert [(item['key'], item['total']) for item in stats['by_goal']] == [(None, 4), (goal['id'], 1)]
+    assert [(item['key'], item['total']) for item in stats['by_enthusiasm']] == [(4, 1), (None, 4)]
+    assert [(item['key'], item['total']) for item in stats['by_importance']] == [(5, 1), (None, 4)]
+
+    weekly = client.get('/api/stats?from=2026-03-02&to=2026-03-15&group=week', headers=headers).get_json()
+    assert [(item['period'], item['total'], item['completed']) for item in weekly['series']] == [
+        ('2026-03-02', 5, 4), ('2026-03-09', 0, 0)
+    ]
+    for query, code in (('group=month', 'invalid_group'), ('from=2026-03-02&to=2027-03-03', 'invalid_range'),
+                        ('from=bad', 'invalid_date')):
+        assert client.get(f'/api/stats?{query}', headers=headers).get_json()['error']['code'] == code
+
+
+# 21. 监控指标：按路由规则统计请求数、耗时和每个请求的SQL语句数；健康检查报告数据库和连接池状态
+def test_metrics_and_health(client, monkeypatch, tmp_path):
+    import config
+    from sqlalchemy import create_engine
+    from wxcloudrun import metrics, views
+
+    def sample(name, **labels):
+        text = client.get('/metrics').get_data(as_text=True)
+        series = name + '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+        values = [float(line.rsplit(' ', 1)[1]) for line in text.splitlines() if line.startswith(series + ' ')]
+        return values[0] if values else 0.0
+
+    headers = login(client)
+    create_tasks(client, headers, 3)
+    route = dict(blueprint='tasks', route='/api/tasks', method='GET')
+    requests_before = sample('http_requests_total', **route, status='200')
+    statements_before = sample('http_request_sql_statements_sum', **route)
+    with QueryCounter() as counter:
+        for _ in range(2):
+            assert client.get('/api/tasks', headers=headers).status_code == 200
+    assert sample('http_requests_total', **route, status='200') == requests_before + 2
+    assert sample('http_request_sql_statements_sum', **route) == statements_before + counter.count
+    assert sample('http_request_duration_seconds_bucket', **route, le='+Inf') >= 2
+    # 不同ID的请求聚合到同一个路由规则
+    client.get('/api/tasks/00000000-0000-0000-0000-000000000000', headers=headers)
+    assert sample('http_requests_total', blueprint='tasks', route='/api/tasks/<task_id>', method='GET',
+                  status='404') >= 1
+    client.get('/no-such-page')
+    assert sample('http_requests_total', blueprint='app', route='unmatched', method='GET', status='404') >= 1
+    assert 'admission_in_flight 0' in client.get('/metrics').get_data(as_text=True)
+
+    monkeypatch.setattr(config, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+    monkeypatch.setattr(config, 'METRICS_TOKEN', '')
+
+    # 连接池：借出全部连接后为饱和状态，取连接的等待时间计入直方图
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=metrics.InstrumentedQueuePool,
+                           pool_size=1, max_overflow=0)
+    waits = sample('db_pool_checkout_wait_seconds_count', pool='sync')
+    with engine.connect():
+        status = metrics.pool_status(engine.pool)
+        assert (status['size'], status['checked_out'], status['saturated']) == (1, 1, True)
+    assert metrics.pool_status(engine.pool)['saturated'] is False
+    assert sample('db_pool_checkout_wait_seconds_count', pool='sync') == waits + 1
+    engine.dispose()
+
+    # 健康检查：数据库可达时为ok；连接池耗尽时不探测数据库，状态为degraded，仍返回200
+    monkeypatch.setitem(views._db_health, 'checked_at', None)
+    data = client.get('/api/health').get_json()['data']
+    assert data['status'] == 'ok' and data['database']['reachable'] is True
+    saturated = {'size': 1, 'max_overflow': 0, 'checked_out': 1, 'checked_in': 0, 'overflow': 0, 'saturated': True}
+    monkeypatch.setattr(metrics, 'pool_status', lambda pool: saturated)
+    monkeypatch.setitem(views._db_health, 'checked_at', None)
+    with QueryCounter() as counter:
+        response = client.get('/api/health')
+    assert response.status_code == 200 and counter.count == 0
+    assert response.get_json()['data']['status'] == 'degraded'
+    assert response.get_json()['data']['pool'] == saturated
+
+
+# 22. 开发模式SQL检查：响应头汇总请求的SQL，重复执行的同形状语句（N+1）和慢查询记录日志和调用位置
+def test_sql_debug_detects_n_plus_one(client, monkeypatch, caplog):
+    import config
+    from wxcloudrun import querydebug
+    from wxcloudrun.dao import get_task_by_id
+
+    headers = login(client)
+    tasks = create_tasks(client, headers, 6)
+    assert 'X-SQL-Queries' not in client.get('/api/tasks', headers=headers).headers
+
+    monkeypatch.setattr(config, 'SQL_DEBUG', True)
+    with QueryCounter() as counter:
+        response = client.get('/api/tasks', headers=headers)
+    assert response.headers['X-SQL-Queries'] == str(counter.count)
+    assert response.headers['X-SQL-Slow'] == '0'
+    assert 'X-SQL-Repeated' not in response.headers
+
+    # 同形状语句：参数、字面量和 IN 列表长度不同时形状相同
+    assert querydebug.normalize("SELECT * FROM t WHERE id = %s AND name = 'a' LIMIT 10") == \
+        querydebug.normalize("SELECT *\n  FROM t WHERE id = ? AND name = 'b''c' LIMIT 20")
+    assert querydebug.normalize('SELECT * FROM t WHERE id IN (?, ?, ?)') == \
+        querydebug.normalize('SELECT * FROM t WHERE id IN (?, ?)')
+
+    # 逐个加载任务（N+1）
+    with app.test_request_context('/api/loop'):
+        statements = querydebug.start_request()
+        for task in tasks:
+            get_task_by_id(task['id'])
+        debug_headers = dict(querydebug.finish_request(statements, 'GET', '/api/loop'))
+    assert debug_headers['X-SQL-Queries'] == '6'
+    assert debug_headers['X-SQL-Repeated'].startswith('6x dao.py:')
+    assert 'get_task_by_id' in debug_headers['X-SQL-Repeated']
+    assert any('possible N+1 in GET /api/loop: 6 x' in record.getMessage() for record in caplog.records)
+
+    monkeypatch.setattr(config, 'SQL_DEBUG_SLOW_MS', 0)
+    response = client.get(f"/api/tasks/{tasks[0]['id']}", headers=headers)
+    assert int(response.headers['X-SQL-Slow']) == int(response.headers['X-SQL-Queries']) >= 1
+    assert any(record.getMessage().startswith('slow query') and 'dao.py:' in record.getMessage()
+               for record in caplog.records)
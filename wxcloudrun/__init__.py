@@ -1,8 +1,11 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from sqlalchemy import text
 import pymysql
-import os
+import threading
 import config
+from wxcloudrun.metrics import InstrumentedQueuePool
 
 # 因MySQLDB不支持Python3，使用pymysql扩展库代替MySQLDB库
 pymysql.install_as_MySQLdb()
@@ -11,51 +14,67 @@ pymysql.install_as_MySQLdb()
 app = Flask(__name__, instance_relative_config=True)
 app.config['DEBUG'] = config.DEBUG
 
-# 尝试创建数据库
-def create_database_if_not_exists():
-    try:
-        # 不指定数据库名称，连接到MySQL服务器
-        conn = pymysql.connect(
-            host=config.db_address.split(':')[0],
-            port=int(config.db_address.split(':')[1]),
-            user=config.username,
-            password=config.password
-        )
-        cursor = conn.cursor()
-        
-        # 创建数据库
-        cursor.execute("CREATE DATABASE IF NOT EXISTS todo_app")
-        
-        # 关闭连接
-        cursor.close()
-        conn.close()
-        print("数据库检查/创建成功")
-    except Exception as e:
-        print(f"创建数据库时出错: {e}")
-
-# 创建数据库
-create_database_if_not_exists()
-
-# 设定数据库链接
-app.config['SQLALCHEMY_DATABASE_URI'] = 'mysql://{}:{}@{}/todo_app'.format(
-    config.username, config.password, config.db_address
+# 设定数据库链接，可通过 DATABASE_URI 环境变量整体覆盖
+# 导入时不访问数据库：建库、建表由一次性命令 flask init-db 完成，首个请求时才建立连接
+app.config['SQLALCHEMY_DATABASE_URI'] = config.DATABASE_URI or 'mysql://{}:{}@{}/{}'.format(
+    config.username, config.password, config.db_address, config.db_name
 )
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_POOL_RECYCLE'] = 280
-app.config['SQLALCHEMY_POOL_TIMEOUT'] = 20
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('mysql'):
+    # 连接池参数仅适用于MySQL（SQLite的连接池不支持超时参数）
+    app.config['SQLALCHEMY_POOL_RECYCLE'] = 280
+    app.config['SQLALCHEMY_POOL_TIMEOUT'] = 20
 app.config['JSON_AS_ASCII'] = False
 
+
+class InstrumentedSQLAlchemy(SQLAlchemy):
+    """
+    MySQL使用记录取连接等待时间的连接池（/metrics），按创建引擎时的数据库驱动选择，SQLite保持默认连接池
+    """
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        if sa_url.drivername.startswith('mysql'):
+            options.setdefault('poolclass', InstrumentedQueuePool)
+        return sa_url, options
+
+
 # 初始化DB操作对象
-db = SQLAlchemy(app)
+db = InstrumentedSQLAlchemy(app)
+
+# 数据库迁移（flask db upgrade）
+migrate = Migrate(app, db)
 
 # 加载配置
 app.config.from_object('config')
 
-# 确保数据库表存在
-from wxcloudrun.model import User, Task, Goal, TaskTag, BlacklistedToken
-@app.before_first_request
-def create_tables():
-    db.create_all()
+# 加载数据模型
+from wxcloudrun.model import User, Task, Goal, Tag, TaskTag, TaskDailyStat, DeletedRecord, BlacklistedToken
+
+
+def prewarm_db_pool(connections):
+    """
+    后台预先建立数据库连接，让冷启动后的首批请求不必等待建连
+    连接用完归还连接池，失败只记录日志，不影响服务启动
+    """
+    def prewarm():
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = db.engine.connect()
+                opened.append(conn)
+                conn.execute(text('SELECT 1'))
+            app.logger.info(f"prewarmed {connections} database connections")
+        except Exception as e:
+            app.logger.warning(f"prewarm_db_pool error: {e}")
+        finally:
+            # 中途失败时已建立的连接同样归还连接池
+            for conn in opened:
+                conn.close()
+
+    thread = threading.Thread(target=prewarm, name='db-pool-prewarm', daemon=True)
+    thread.start()
+    return thread
 
-# 加载控制器
-from wxcloudrun import views
+# 加载控制器和命令行命令
+from wxcloudrun import views, commands
@@ -0,0 +1,238 @@
+"""
+ASGI入口：uvicorn asgi:app
+- 高频的只读接口（当前用户、任务和目标的列表与详情、目标下的任务、标签）由异步处理函数处理，
+  经异步驱动和异步连接池查询数据库，等待MySQL时事件循环继续处理其他请求
+- 其余接口（写入、登录注册、搜索、流式列表等）转交原有的Flask应用在线程池中执行，行为与WSGI入口一致
+异步处理函数的参数校验、分页游标、ETag和响应格式与同步接口相同，两种入口可以互换
+"""
+import asyncio
+import logging
+import re
+from collections import namedtuple
+from urllib.parse import parse_qsl
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+
+import config
+from wxcloudrun import app as flask_app, async_dao, metrics, querydebug
+from wxcloudrun.serializers import dumps, task_serializer, goal_serializer, user_serializer, tag_serializer
+from wxcloudrun.ratelimit import admit, admission, client_ip
+from wxcloudrun.tasks import parse_tag_filter
+from wxcloudrun.utils import check_token, data_etag, get_page_args
+from wxcloudrun.views import CORS_HEADERS
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 转交Flask应用处理的请求（在线程池中执行）
+wsgi_app = WSGIMiddleware(flask_app, workers=config.ASGI_WSGI_THREADS)
+
+# 异步处理函数的返回值：状态码、响应数据（None表示没有响应体）、额外的响应头
+Reply = namedtuple('Reply', ['status', 'data', 'headers'])
+
+
+class AsyncRequest:
+    """
+    异步处理函数使用的请求信息，查询参数与Flask的 request.args 相同（MultiDict）
+    """
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.args = MultiDict(parse_qsl(scope['query_string'].decode('utf-8', 'replace'), keep_blank_values=True))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+
+    def is_stream(self):
+        return self.args.get('stream', '').lower() in ('1', 'true')
+
+
+def _error(status, message, code):
+    return Reply(status, {'error': {'message': message, 'code': code}}, ())
+
+
+def _check_token_in_app(auth_header):
+    # 令牌缓存未命中或需要刷新黑名单时会查询数据库，在线程池中执行，不阻塞事件循环
+    with flask_app.app_context():
+        return check_token(auth_header, 'access')
+
+
+async def get_me(request, user):
+    return Reply(200, user_serializer(user), ())
+
+
+async def get_tasks(request, user):
+    tags, match_all, error = parse_tag_filter(request.args)
+    if error:
+        return Reply(400, {'error': error}, ())
+    try:
+        limit, cursor = get_page_args(request.args)
+        tasks, next_cursor = await async_dao.get_tasks_page(
+            user.id, request.args.get('filter', 'all'), request.args.get('goal_id'), request.args.get('sort'),
+            limit, cursor, tags=tags, match_all=match_all
+        )
+    except ValueError:
+        return _error(400, 'Invalid limit or cursor', 'invalid_page')
+    return Reply(200, task_serializer.many(tasks), [('X-Next-Cursor', next_cursor)] if next_cursor else ())
+
+
+async def get_task(request, user, task_id):
+    task = await async_dao.get_task_by_id(task_id, user.id)
+    if not task:
+        return _error(404, 'Task not found', 'task_not_found')
+    return Reply(200, task_serializer(task), ())
+
+
+async def get_goals(request, user):
+    try:
+        limit, cursor = get_page_args(request.args)
+        goals, next_cursor = await async_dao.get_goals_page(user.id, request.args.get('type', 'all'), limit, cursor)
+    except ValueError:
+        return _error(400, 'Invalid limit or cursor', 'invalid_page')
+    return Reply(200, goal_serializer.many(goals), [('X-Next-Cursor', next_cursor)] if next_cursor else ())
+
+
+async def get_goal(request, user, goal_id):
+    goal = await async_dao.get_goal_by_id(goal_id, user.id)
+    if not goal:
+        return _error(404, 'Goal not found', 'goal_not_found')
+    return Reply(200, goal_serializer(goal), ())
+
+
+async def get_goal_tasks(request, user, goal_id):
+    goal = await async_dao.get_goal_by_id(goal_id, user.id)
+    if not goal:
+        return _error(404, 'Goal not found', 'goal_not_found')
+    return Reply(200, task_serializer.many(await async_dao.get_tasks_by_goal(user.id, goal_id)), ())
+
+
+async def get_tags(request, user):
+    return Reply(200, {'tags': tag_serializer.many(await async_dao.get_tags_by_user_id(user.id))}, ())
+
+
+# 异步处理的GET接口：路由规则（与Flask路由相同，用作监控指标的标签）, 路径, 处理函数,
+# 是否支持ETag条件请求, stream=1 时是否转交Flask应用
+# 任务和目标ID是UUID，其他路径（如 /api/tasks/search）不会被误匹配
+_ID = '[0-9a-fA-F-]{36}'
+Route = namedtuple('Route', ['rule', 'pattern', 'handler', 'conditional', 'streamable'])
+ROUTES = [
+    Route('/api/auth/me', re.compile(r'/api/auth/me'), get_me, False, False),
+    Route('/api/tasks', re.compile(r'/api/tasks'), get_tasks, True, True),
+    Route('/api/tasks/<task_id>', re.compile(rf'/api/tasks/(?P<task_id>{_ID})'), get_task, False, False),
+    Route('/api/goals', re.compile(r'/api/goals'), get_goals, True, True),
+    Route('/api/goals/<goal_id>', re.compile(rf'/api/goals/(?P<goal_id>{_ID})'), get_goal, False, False),
+    Route('/api/goals/<goal_id>/tasks', re.compile(rf'/api/goals/(?P<goal_id>{_ID})/tasks'), get_goal_tasks, True, True),
+    Route('/api/tags', re.compile(r'/api/tags'), get_tags, True, False),
+]
+
+
+def _match(request):
+    """
+    返回 (路由, 路径参数)，不由异步处理的请求返回 (None, None)
+    """
+    if request.method != 'GET':
+        return None, None
+    for route in ROUTES:
+        match = route.pattern.fullmatch(request.path)
+        if match:
+            if route.streamable and request.is_stream():
+                return None, None
+            return route, match.groupdict()
+    return None, None
+
+
+async def _handle(request, route, params):
+    """
+    认证、条件请求（与 utils.conditional_by_data_version 相同的ETag）后调用异步处理函数
+    """
+    loop = asyncio.get_running_loop()
+    user, error = await loop.run_in_executor(None, _check_token_in_app, request.headers.get('authorization'))
+    if error:
+        return Reply(401, {'error': error}, ())
+
+    if not route.conditional:
+        return await route.handler(request, user, **params)
+
+    data_version = await async_dao.get_data_version(user.id)
+    if data_version is None:
+        return await route.handler(request, user, **params)
+
+    etag = data_etag(user.id, data_version, request.path, request.args.items(multi=True))
+    cache_headers = [('ETag', f'"{etag}"'), ('Cache-Control', 'private, no-cache')]
+    if parse_etags(request.headers.get('if-none-match')).contains_weak(etag):
+        return Reply(304, None, cache_headers)
+
+    reply = await route.handler(request, user, **params)
+    if reply.status != 200:
+        return reply
+    return reply._replace(headers=list(reply.headers) + cache_headers)
+
+
+async def _send(send, reply):
+    headers = list(CORS_HEADERS.items()) + list(reply.headers)
+    body = b''
+    if reply.data is not None:
+        body = dumps(reply.data)
+        headers.append(('Content-Type', 'application/json'))
+    headers.append(('Content-Length', str(len(body))))
+    await send({
+        'type': 'http.response.start',
+        'status': reply.status,
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # 关闭异步连接池
+            await async_dao.dispose_engine()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def _handle_admitted(request, route, params, scope):
+    """
+    与同步入口相同的准入控制和限流（异步处理函数不使用同步连接池，不检查其是否耗尽）
+    """
+    admitted, rejection = admit(
+        request.method, request.path, request.headers.get('authorization'),
+        client_ip(request.headers.get('x-forwarded-for'), (scope.get('client') or (None,))[0]),
+        check_db_pool=False
+    )
+    if rejection:
+        return Reply(rejection.status, {'error': rejection.error}, [('Retry-After', str(rejection.retry_after))])
+    try:
+        return await _handle(request, route, params)
+    except Exception:
+        logger.exception(f"asgi {request.path} error")
+        return _error(500, 'Internal server error', 'server_error')
+    finally:
+        if admitted:
+            admission.leave()
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+
+    if scope['type'] == 'http':
+        request = AsyncRequest(scope)
+        route, params = _match(request)
+        if route:
+            # 与Flask路由相同的指标标签（蓝图名即路径的第二段），转交Flask应用的请求由其钩子记录
+            state = metrics.start_request()
+            sql_debug = querydebug.start_request()
+            reply = await _handle_admitted(request, route, params, scope)
+            metrics.finish_request(state, route.rule.split('/')[2], route.rule, request.method, reply.status)
+            debug_headers = querydebug.finish_request(sql_debug, request.method, request.path)
+            if debug_headers:
+                reply = reply._replace(headers=list(reply.headers) + debug_headers)
+            return await _send(send, reply)
+
+    await wsgi_app(scope, receive, send)
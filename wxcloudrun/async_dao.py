@@ -0,0 +1,188 @@
+"""
+异步数据访问：供ASGI入口（asgi.py）的只读热点接口使用
+通过异步驱动（MySQL: aiomysql）和异步连接池查询，等待数据库时不占用线程；
+过滤条件、排序键和游标分页与 dao 共用，返回的结果与同步接口一致
+"""
+import logging
+
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import config
+from wxcloudrun import app, db
+from wxcloudrun.metrics import InstrumentedAsyncQueuePool
+from wxcloudrun.model import User, Task, Goal, Tag
+from wxcloudrun.dao import (
+    _task_list_criteria, _task_sort_keys, _goal_list_criteria, _page_statement, _page_result, _order_by,
+    GOAL_SORT_KEYS, DEFAULT_PAGE_SIZE
+)
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'mysql+mysqldb': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'sqlite+pysqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(uri):
+    """
+    将同步应用的数据库连接串转换为异步驱动的连接串
+    """
+    url = make_url(uri)
+    return str(url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername)))
+
+
+def _create_engine():
+    uri = async_database_uri(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = {}
+    if uri.startswith('mysql'):
+        # 与同步连接池一致：回收空闲连接，避免被MySQL的wait_timeout断开
+        options.update(pool_size=config.ASYNC_DB_POOL_SIZE, max_overflow=0, pool_recycle=280, pool_timeout=20,
+                       poolclass=InstrumentedAsyncQueuePool)
+    return create_async_engine(uri, **options)
+
+
+_engine = None
+_session_factory = None
+
+
+def _session():
+    """
+    返回新的异步会话，首次调用时按应用的数据库配置创建异步引擎（导入时不连接数据库）
+    """
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = _create_engine()
+        _session_factory = sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _session_factory()
+
+
+async def dispose_engine():
+    """
+    关闭异步连接池（进程退出时调用），之后再次使用时重新创建
+    """
+    global _engine
+    if _engine is not None:
+        engine, _engine = _engine, None
+        await engine.dispose()
+
+
+def engine_pool():
+    """
+    异步连接池（/metrics 使用），尚未创建异步引擎时返回None
+    """
+    return _engine.pool if _engine is not None else None
+
+
+async def get_data_version(user_id):
+    """
+    获取用户当前的数据版本号，出错时返回None
+    """
+    try:
+        async with _session() as session:
+            return (await session.execute(db.select(User.data_version).where(User.id == user_id))).scalar()
+    except OperationalError as e:
+        logger.error(f"async get_data_version error: {e}")
+        return None
+
+
+async def get_tasks_page(user_id, filter_type=None, goal_id=None, sort_by=None, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                         tags=None, match_all=True):
+    """
+    分页获取用户的任务，返回 (任务列表, 下一页游标)，游标无效时抛出ValueError
+    """
+    sort_name, sort_keys = _task_sort_keys(sort_by)
+    statement = db.select(Task).options(db.selectinload(Task.tags)).where(
+        *_task_list_criteria(user_id, filter_type, goal_id, tags, match_all)
+    )
+    statement = _page_statement(statement, sort_name, sort_keys, limit, cursor)
+    try:
+        async with _session() as session:
+            tasks = (await session.execute(statement)).scalars().all()
+        return _page_result(tasks, sort_name, sort_keys, limit)
+    except OperationalError as e:
+        logger.error(f"async get_tasks_page error: {e}")
+        return [], None
+
+
+async def get_tasks_by_goal(user_id, goal_id):
+    """
+    获取目标下的全部任务（按创建时间倒序）
+    """
+    _, sort_keys = _task_sort_keys(None)
+    statement = _order_by(
+        db.select(Task).options(db.selectinload(Task.tags)).where(*_task_list_criteria(user_id, goal_id=goal_id)),
+        sort_keys
+    )
+    try:
+        async with _session() as session:
+            return (await session.execute(statement)).scalars().all()
+    except OperationalError as e:
+        logger.error(f"async get_tasks_by_goal error: {e}")
+        return []
+
+
+async def get_task_by_id(task_id, user_id):
+    """
+    获取用户的指定任务（含标签）
+    """
+    statement = db.select(Task).options(db.selectinload(Task.tags)).where(Task.id == task_id, Task.user_id == user_id)
+    try:
+        async with _session() as session:
+            return (await session.execute(statement)).scalars().first()
+    except OperationalError as e:
+        logger.error(f"async get_task_by_id error: {e}")
+        return None
+
+
+async def get_goals_page(user_id, goal_type=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    分页获取用户的目标（按创建时间倒序），返回 (目标列表, 下一页游标)，游标无效时抛出ValueError
+    """
+    statement = _page_statement(
+        db.select(Goal).where(*_goal_list_criteria(user_id, goal_type)), 'createdAt', GOAL_SORT_KEYS, limit, cursor
+    )
+    try:
+        async with _session() as session:
+            goals = (await session.execute(statement)).scalars().all()
+        return _page_result(goals, 'createdAt', GOAL_SORT_KEYS, limit)
+    except OperationalError as e:
+        logger.error(f"async get_goals_page error: {e}")
+        return [], None
+
+
+async def get_goal_by_id(goal_id, user_id):
+    """
+    获取用户的指定目标
+    """
+    try:
+        async with _session() as session:
+            return (await session.execute(
+                db.select(Goal).where(Goal.id == goal_id, Goal.user_id == user_id)
+            )).scalars().first()
+    except OperationalError as e:
+        logger.error(f"async get_goal_by_id error: {e}")
+        return None
+
+
+async def get_tags_by_user_id(user_id):
+    """
+    获取用户正在使用的标签及各自的任务数
+    """
+    statement = db.select(Tag).where(Tag.user_id == user_id, Tag.task_count > 0).order_by(
+        Tag.task_count.desc(), Tag.name
+    )
+    try:
+        async with _session() as session:
+            return (await session.execute(statement)).scalars().all()
+    except OperationalError as e:
+        logger.error(f"async get_tags_by_user_id error: {e}")
+        return []
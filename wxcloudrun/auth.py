@@ -1,12 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from datetime import datetime
 
-from wxcloudrun.dao import get_user_by_username, get_user_by_email, create_user, update_user_last_login, add_token_to_blacklist
-from wxcloudrun.utils import hash_password, check_password, generate_access_token, generate_refresh_token, format_user, token_required, refresh_token_required
+from wxcloudrun.dao import get_user_by_username, get_user_by_email, create_user, update_user_last_login
+from wxcloudrun.blacklist import revoke_token
+from wxcloudrun.passwords import PasswordHasherBusy
+from wxcloudrun.utils import hash_password, check_password, password_needs_rehash, generate_access_token, generate_refresh_token, format_user, token_required, refresh_token_required
+from wxcloudrun.serializers import jsonify
 
 # 创建蓝图
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    """
+    密码哈希排队已满（登录高峰），请客户端稍后重试
+    """
+    response = jsonify({'error': {'message': 'Server busy, please retry later', 'code': 'server_busy'}})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """
@@ -56,8 +68,11 @@ def login():
     if not check_password(user.password_hash, data.get('password')):
         return jsonify({'error': {'message': 'Invalid credentials', 'code': 'invalid_credentials'}}), 401
     
-    # 更新最后登录时间
-    update_user_last_login(user.id)
+    # 更新最后登录时间；哈希参数已调整时用本次登录的明文密码按新参数重新哈希
+    new_password_hash = None
+    if password_needs_rehash(user.password_hash):
+        new_password_hash = hash_password(data.get('password'))
+    update_user_last_login(user.id, new_password_hash)
     
     # 生成令牌
     access_token = generate_access_token(user.id)
@@ -94,7 +109,7 @@ def logout(current_user):
     token = auth_header.split(" ")[1]
     
     # 将令牌添加到黑名单
-    if not add_token_to_blacklist(token):
+    if not revoke_token(token):
         return jsonify({'error': {'message': 'Failed to logout', 'code': 'logout_failed'}}), 500
     
     return '', 204
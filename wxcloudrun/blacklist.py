@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import jwt
+
+import config
+from wxcloudrun.cache import auth_cache
+from wxcloudrun.dao import (
+    add_token_to_blacklist, is_token_blacklisted,
+    get_blacklisted_digests_after, purge_expired_blacklisted_tokens, get_user_status_changes_after
+)
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 增量刷新时回看的ID数量
+REFRESH_ID_OVERLAP = 100
+# 读取用户启用/停用记录时回看的时间（事务提交晚于写入的时间、进程之间的时钟误差）
+USER_STATUS_OVERLAP = timedelta(seconds=10)
+
+
+def token_digest(token):
+    """
+    计算令牌的SHA-256摘要（定长64位十六进制），黑名单中只保存摘要
+    """
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class BloomFilter:
+    """
+    布隆过滤器：判断为"不存在"时一定不存在，判断为"存在"时需要再精确确认
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = int(-capacity * math.log(error_rate) / (math.log(2) ** 2)) + 1
+        self.hash_count = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, digest):
+        # 摘要本身分布均匀，直接取两段作为双重哈希的种子
+        h1 = int(digest[:16], 16)
+        h2 = int(digest[16:32], 16) | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, digest):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, digest):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+
+class TokenBlacklist:
+    """
+    进程内令牌黑名单
+    - 布隆过滤器回答"肯定未被吊销"，常见情况下不访问数据库
+    - 过滤器命中时查询小型LRU缓存，缓存未命中再查数据库精确确认
+    - 按间隔增量加载其他进程新增的黑名单记录（只查询ID更大的行）
+    - 按间隔清理令牌已过期的黑名单记录并重建过滤器（重建成功前沿用旧过滤器）
+    - 刷新时同时读取其他进程启用/停用的用户，清除这些用户在本进程中的认证缓存
+    """
+
+    def __init__(self, refresh_interval, sweep_interval, capacity=100000, cache_size=10000):
+        self.refresh_interval = refresh_interval
+        self.sweep_interval = sweep_interval
+        self.capacity = capacity
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._reset()
+        self._last_sweep = time.monotonic()
+
+    def _reset(self):
+        self._filter = BloomFilter(self.capacity)
+        self._cache = OrderedDict()  # 摘要 -> 是否已吊销
+        self._last_id = 0
+        self._last_refresh = None
+        self._rebuild_pending = False
+        self._status_since = datetime.now() - USER_STATUS_OVERLAP
+        self._status_seen = {}  # 用户ID -> 已处理的 status_changed_at（回看窗口内）
+
+    def _remember(self, digest, revoked):
+        self._cache[digest] = revoked
+        self._cache.move_to_end(digest)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _load(self, rows):
+        for row_id, digest in rows:
+            self._filter.add(digest)
+            self._remember(digest, True)
+            self._last_id = max(self._last_id, row_id)
+
+    def maybe_refresh(self):
+        """
+        距上次刷新超过间隔时增量加载黑名单并处理用户启用/停用，否则直接返回
+        """
+        now = time.monotonic()
+        if self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+            return
+        with self._lock:
+            if self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep()
+            if self._rebuild_pending:
+                # 重建失败时保留旧过滤器（只会多查数据库，不会漏判），仍待重建，下个间隔再重试
+                self._rebuild()
+            else:
+                # 自增ID可能乱序提交，回看一小段已加载的ID避免漏掉记录（重复加载无副作用）
+                rows = get_blacklisted_digests_after(self._last_id - REFRESH_ID_OVERLAP)
+                if rows is not None:
+                    self._load(rows)
+            self._refresh_user_status()
+            # 刷新失败时沿用旧数据，下个间隔再重试，避免数据库故障时每个请求都去查询
+            self._last_refresh = now
+
+    def _rebuild(self):
+        """
+        全量加载黑名单：先加载到新的过滤器和缓存，查询成功后才替换，加载期间其他线程仍使用旧数据
+        """
+        rows = get_blacklisted_digests_after(0)
+        if rows is None:
+            return
+        bloom = BloomFilter(self.capacity)
+        cache = OrderedDict()
+        for _, digest in rows:
+            bloom.add(digest)
+        for _, digest in rows[-self.cache_size:]:
+            cache[digest] = True
+        self._filter, self._cache = bloom, cache
+        self._last_id = max((row_id for row_id, _ in rows), default=0)
+        self._rebuild_pending = False
+
+    def _refresh_user_status(self):
+        """
+        清除回看窗口内启用/停用过的用户的认证缓存（同一次变更只清除一次），查询失败时下次从原位置继续
+        """
+        started = datetime.now()
+        changes = get_user_status_changes_after(self._status_since)
+        if changes is None:
+            return
+        for user_id, changed_at in changes:
+            if self._status_seen.get(user_id) != changed_at:
+                auth_cache.invalidate_group(user_id)
+        self._status_seen = dict(changes)
+        self._status_since = started - USER_STATUS_OVERLAP
+
+    def _sweep(self):
+        count = purge_expired_blacklisted_tokens()
+        self._last_sweep = time.monotonic()
+        if count:
+            logger.info(f"purged {count} expired blacklisted tokens")
+            # 布隆过滤器无法删除元素，清理后重新全量加载
+            self._rebuild_pending = True
+
+    def add(self, digest):
+        with self._lock:
+            self._filter.add(digest)
+            self._remember(digest, True)
+
+    def is_revoked(self, digest):
+        self.maybe_refresh()
+        if digest not in self._filter:
+            return False
+
+        revoked = self._cache.get(digest)
+        if revoked is None:
+            revoked = is_token_blacklisted(digest)
+            if revoked is None:
+                return True  # 查询出错时当作黑名单处理，增加安全性
+            with self._lock:
+                self._remember(digest, revoked)
+        return revoked
+
+
+token_blacklist = TokenBlacklist(
+    refresh_interval=config.TOKEN_BLACKLIST_REFRESH_SECONDS,
+    sweep_interval=config.TOKEN_BLACKLIST_SWEEP_SECONDS
+)
+
+
+def revoke_token(token):
+    """
+    吊销令牌（注销时调用），黑名单记录保存到令牌过期为止
+    """
+    payload = jwt.decode(token, options={'verify_signature': False})
+    expires_at = datetime.utcfromtimestamp(payload['exp'])
+    digest = token_digest(token)
+    if not add_token_to_blacklist(digest, expires_at):
+        return False
+    token_blacklist.add(digest)
+    auth_cache.pop(digest)
+    return True
+
+
+def is_token_revoked(token):
+    """
+    检查令牌是否已被吊销
+    """
+    return token_blacklist.is_revoked(token_digest(token))
@@ -0,0 +1,86 @@
+import threading
+import time
+from collections import OrderedDict
+
+import config
+
+
+class TTLCache:
+    """
+    线程安全的进程内缓存：容量满时淘汰最久未使用的条目（LRU），条目到期后失效（TTL）
+    条目可以归属一个分组，便于按分组批量失效（例如某个用户的所有令牌）
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (过期时间, 分组, 值)
+        self._groups = {}  # 分组 -> {key}
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def peek(self, key, default=None):
+        """
+        读取未过期的条目，不计入命中统计，也不改变淘汰顺序
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                return default
+            return entry[2]
+
+    def set(self, key, value, ttl=None, group=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, group, value)
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._remove(next(iter(self._data)))
+
+    def pop(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def invalidate_group(self, group):
+        with self._lock:
+            for key in list(self._groups.get(group, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._groups.clear()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data)}
+
+    def _remove(self, key):
+        _, group, _ = self._data.pop(key)
+        if group is not None:
+            keys = self._groups.get(group)
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+
+# 已验证令牌的认证上下文缓存：令牌摘要 -> (令牌载荷, 精简用户信息)，按用户ID分组
+auth_cache = TTLCache(maxsize=config.AUTH_CACHE_SIZE, ttl=config.AUTH_CACHE_TTL_SECONDS)
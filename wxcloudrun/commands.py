@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import click
+import pymysql
+from flask_migrate import upgrade
+
+import config
+from wxcloudrun import app
+from wxcloudrun.dao import (
+    SYNC_TOMBSTONE_RETENTION, purge_deleted_records, get_user_ids, rebuild_task_stats, set_user_active
+)
+
+
+def create_database_if_not_exists():
+    """
+    连接到MySQL服务器（不指定数据库），创建应用数据库
+    """
+    host, _, port = config.db_address.partition(':')
+    conn = pymysql.connect(host=host, port=int(port or 3306), user=config.username, password=config.password)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{config.db_name}`")
+    finally:
+        conn.close()
+
+
+@app.cli.command('init-db')
+def init_db():
+    """
+    一次性初始化数据库：创建数据库并执行全部迁移，部署新版本前执行
+    """
+    if not config.DATABASE_URI:
+        create_database_if_not_exists()
+        click.echo("数据库检查/创建成功")
+    upgrade()
+    click.echo("数据库迁移完成")
+
+
+@app.cli.command('purge-deleted-records')
+def purge_deleted_records_command():
+    """
+    清理超过保留期的删除记录（增量同步用），可定期执行
+    """
+    count = purge_deleted_records(datetime.now() - SYNC_TOMBSTONE_RETENTION)
+    click.echo(f"已清理 {count} 条删除记录")
+
+
+@app.cli.command('rebuild-task-stats')
+@click.option('--user-id', type=int, help='只重建指定用户的统计汇总')
+def rebuild_task_stats_command(user_id):
+    """
+    由任务表重建每日统计汇总：上线统计功能后执行一次以回填已有任务，之后由任务写入增量维护
+    """
+    user_ids = [user_id] if user_id else get_user_ids()
+    failed = [uid for uid in user_ids if rebuild_task_stats(uid) is None]
+    click.echo(f"已重建 {len(user_ids) - len(failed)} 个用户的统计汇总")
+    if failed:
+        raise click.ClickException(f"重建失败的用户: {failed}")
+
+
+@app.cli.command('set-user-active')
+@click.argument('user_id', type=int)
+@click.option('--active/--inactive', default=False, help='启用（--active）或停用（--inactive，默认）用户')
+def set_user_active_command(user_id, active):
+    """
+    启用或停用用户：停用后该用户的令牌（包括已登录的）认证失败，返回 401 user_inactive
+    """
+    if not set_user_active(user_id, active):
+        raise click.ClickException(f"用户 {user_id} 不存在或更新失败")
+    click.echo(f"已{'启用' if active else '停用'}用户 {user_id}")
+    click.echo(f"运行中的服务进程在 {config.TOKEN_BLACKLIST_REFRESH_SECONDS:g} 秒（TOKEN_BLACKLIST_REFRESH_SECONDS）内生效")
@@ -1,11 +1,22 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import base64
+import binascii
+import hashlib
 import json
+import time
+from sqlalchemy.dialects.mysql import insert as mysql_insert, match as mysql_match
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
 import uuid
+from collections import Counter, namedtuple
 
 from wxcloudrun import db
-from wxcloudrun.model import User, Task, Goal, TaskTag, BlacklistedToken
+from wxcloudrun.cache import auth_cache
+from wxcloudrun.model import (
+    User, Task, Goal, Tag, TaskTag, TaskDailyStat, DeletedRecord, BlacklistedToken, generate_uuid
+)
 
 # 初始化日志
 logger = logging.getLogger('log')
@@ -21,6 +32,16 @@ def get_user_by_id(user_id):
         logger.error(f"get_user_by_id error: {e}")
         return None
 
+def get_user_ids():
+    """
+    获取全部用户ID（命令行任务逐个用户处理时使用）
+    """
+    try:
+        return [user_id for user_id, in db.session.query(User.id).order_by(User.id).all()]
+    except OperationalError as e:
+        logger.error(f"get_user_ids error: {e}")
+        return []
+
 def get_user_by_username(username):
     """
     根据用户名获取用户
@@ -61,14 +82,16 @@ def create_user(username, email, password_hash):
         db.session.rollback()
         return None
 
-def update_user_last_login(user_id):
+def update_user_last_login(user_id, password_hash=None):
     """
-    更新用户最后登录时间
+    更新用户最后登录时间，password_hash不为空时同时替换密码哈希（登录时按新参数重新哈希）
     """
     try:
         user = get_user_by_id(user_id)
         if user:
             user.last_login = datetime.now()
+            if password_hash:
+                user.password_hash = password_hash
             db.session.commit()
             return True
         return False
@@ -77,62 +100,328 @@ def update_user_last_login(user_id):
         db.session.rollback()
         return False
 
+def set_user_active(user_id, is_active):
+    """
+    启用或停用用户（flask set-user-active），立即清除该用户在本进程中的认证缓存，
+    其他进程在令牌黑名单刷新时读取 status_changed_at 的变化并清除各自的缓存
+    """
+    try:
+        user = get_user_by_id(user_id)
+        if not user:
+            return False
+        user.is_active = is_active
+        user.status_changed_at = datetime.now()
+        db.session.commit()
+        auth_cache.invalidate_group(user_id)
+        return True
+    except OperationalError as e:
+        logger.error(f"set_user_active error: {e}")
+        db.session.rollback()
+        return False
+
+def _bump_data_version(user_id):
+    """
+    递增用户的数据版本号（任务、目标每次写入时调用，与写入在同一事务中提交）
+    列表接口用版本号生成ETag，版本号不变说明数据没有变化
+    """
+    users = User.__table__
+    db.session.execute(
+        users.update().where(users.c.id == user_id).values(
+            data_version=users.c.data_version + 1,
+            updated_at=users.c.updated_at  # 不是用户资料的修改，保持更新时间不变
+        )
+    )
+
+def get_data_version(user_id):
+    """
+    获取用户当前的数据版本号（按主键查询用户表，不访问任务表），出错时返回None
+    """
+    try:
+        return db.session.query(User.data_version).filter(User.id == user_id).scalar()
+    except OperationalError as e:
+        logger.error(f"get_data_version error: {e}")
+        db.session.rollback()
+        return None
+
+# ========== 分页相关 ==========
+# 列表接口的默认和最大分页大小
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# 流式响应每次从数据库读取的记录数
+STREAM_CHUNK_SIZE = 500
+
+# 排序键：expr为SQL表达式，desc表示降序，value从记录中取出该键的值
+SortKey = namedtuple('SortKey', ['expr', 'desc', 'value'])
+
+def _encode_cursor(sort_name, values):
+    """
+    将排序键的值编码为不透明的分页游标
+    """
+    values = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps([sort_name, values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor, sort_name, sort_keys):
+    """
+    解码分页游标，游标无效或与当前排序方式不匹配时抛出ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, values = json.loads(raw.decode('utf-8'))
+        if cursor_sort != sort_name or len(values) != len(sort_keys):
+            raise ValueError('cursor does not match sort')
+        decoded = []
+        for value in values:
+            if isinstance(value, dict):
+                value = datetime.fromisoformat(value['dt'])
+            elif not isinstance(value, (str, int, float, type(None))):
+                raise ValueError('invalid cursor value')
+            decoded.append(value)
+        return decoded
+    except (ValueError, TypeError, KeyError, UnicodeDecodeError, binascii.Error):
+        raise ValueError('invalid cursor')
+
+def _keyset_condition(sort_keys, values):
+    """
+    生成"位于游标之后"的查询条件：按排序键逐级比较，NULL视为最小值
+    """
+    clauses = []
+    for i, (key, value) in enumerate(zip(sort_keys, values)):
+        # 之前的排序键都相等
+        prefix = [
+            prev.expr.is_(None) if prev_value is None else prev.expr == prev_value
+            for prev, prev_value in zip(sort_keys[:i], values[:i])
+        ]
+        if value is None:
+            if key.desc:
+                continue  # 降序时NULL排在最后，之后没有更多记录
+            after = key.expr.isnot(None)
+        else:
+            after = key.expr < value if key.desc else key.expr > value
+        clauses.append(db.and_(*prefix, after))
+    return db.or_(*clauses)
+
+def _order_by(query, sort_keys):
+    return query.order_by(*[key.expr.desc() if key.desc else key.expr for key in sort_keys])
+
+def _page_statement(query, sort_name, sort_keys, limit, cursor):
+    """
+    为查询（Query或select语句）加上游标条件、排序和LIMIT，多取一条用于判断是否还有下一页
+    同步查询和异步查询（asgi入口）共用
+    """
+    if cursor:
+        query = query.filter(_keyset_condition(sort_keys, _decode_cursor(cursor, sort_name, sort_keys)))
+    return _order_by(query, sort_keys).limit(limit + 1)
+
+def _page_result(items, sort_name, sort_keys, limit):
+    """
+    由多取一条的查询结果得到 (当前页记录, 下一页游标)
+    """
+    if len(items) <= limit:
+        return items, None
+    
+    items = items[:limit]
+    return items, _encode_cursor(sort_name, [key.value(items[-1]) for key in sort_keys])
+
+def _paginate(query, sort_name, sort_keys, limit, cursor):
+    """
+    基于排序键+ID的游标分页（keyset），每页开销不随页码增长
+    返回 (记录列表, 下一页游标)
+    """
+    items = _page_statement(query, sort_name, sort_keys, limit, cursor).all()
+    return _page_result(items, sort_name, sort_keys, limit)
+
+def _iter_chunks(query, sort_name, sort_keys, chunk_size, cursor=None):
+    """
+    按游标分页逐块读取全部记录，每块一次查询，用于流式响应
+    每块交给调用方处理后从会话中移除，内存占用只与块大小有关
+    读取中途出错时记录日志并重新抛出，由调用方中断响应
+    """
+    while True:
+        try:
+            items, cursor = _paginate(query, sort_name, sort_keys, chunk_size, cursor)
+        except OperationalError as e:
+            logger.error(f"_iter_chunks error: {e}")
+            db.session.rollback()
+            raise
+        if items:
+            yield items
+        if not cursor:
+            return
+        db.session.expunge_all()
+
 # ========== 任务相关 ==========
-def get_tasks_by_user_id(user_id, filter_type=None, goal_id=None, sort_by=None):
+# 自定义优先级排序: high > medium > low
+PRIORITY_RANK = {'high': 1, 'medium': 2}
+
+def _task_sort_keys(sort_by):
+    """
+    返回任务排序方式 (排序名称, 排序键列表)，最后一个键总是任务ID，保证顺序唯一
+    sort_by: dueDate, createdAt, priority, alphabetical
+    """
+    id_asc = SortKey(Task.id, False, lambda task: task.id)
+    if sort_by == 'dueDate':
+        return 'dueDate', [SortKey(Task.due_date, False, lambda task: task.due_date), id_asc]
+    if sort_by == 'priority':
+        rank = db.case(
+            [(Task.priority == priority, value) for priority, value in PRIORITY_RANK.items()],
+            else_=3
+        )
+        return 'priority', [SortKey(rank, False, lambda task: PRIORITY_RANK.get(task.priority, 3)), id_asc]
+    if sort_by == 'alphabetical':
+        return 'alphabetical', [SortKey(Task.title, False, lambda task: task.title), id_asc]
+    # 默认按创建时间排序
+    return 'createdAt', [
+        SortKey(Task.created_at, True, lambda task: task.created_at),
+        SortKey(Task.id, True, lambda task: task.id)
+    ]
+
+def _task_list_criteria(user_id, filter_type=None, goal_id=None, tags=None, match_all=True):
+    """
+    构造任务列表的过滤条件（同步查询和异步查询共用）
+    filter_type: all, today, week, completed, upcoming, unscheduled
+    tags: 标签名列表（已规范化），match_all为True时要求包含全部标签，否则包含任一标签即可
+    """
+    criteria = [Task.user_id == user_id]
+    
+    # 应用过滤条件
+    if filter_type:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        week_end = today + timedelta(days=7)
+        
+        if filter_type == 'today':
+            criteria += [Task.due_date >= today, Task.due_date < today + timedelta(days=1)]
+        elif filter_type == 'week':
+            criteria += [Task.due_date >= today, Task.due_date < week_end]
+        elif filter_type == 'completed':
+            criteria.append(Task.completed == db.true())
+        elif filter_type == 'upcoming':
+            criteria.append(Task.due_date >= today)
+        elif filter_type == 'unscheduled':
+            criteria.append(Task.due_date.is_(None))
+    
+    # 按目标ID筛选
+    if goal_id:
+        criteria.append(Task.goal_id == goal_id)
+    
+    # 按标签筛选：经 (user_id, name) 唯一索引找到标签，再由 (tag_id, task_id) 索引得到任务ID，不扫描任务表
+    if tags:
+        tagged = db.select(TaskTag.task_id).join(Tag, Tag.id == TaskTag.tag_id).where(
+            Tag.user_id == user_id, Tag.name.in_(tags)
+        )
+        if match_all:
+            # 同一任务的同一标签只有一行，命中的标签数等于筛选标签数即包含全部标签
+            tagged = tagged.group_by(TaskTag.task_id).having(db.func.count() == len(tags))
+        criteria.append(Task.id.in_(tagged))
+    
+    return criteria
+
+def _task_list_query(user_id, filter_type=None, goal_id=None, tags=None, match_all=True):
+    """
+    构造任务列表查询，标签通过selectin一次性批量加载，避免逐个任务查询标签（N+1）
+    """
+    return Task.query.options(db.selectinload(Task.tags)).filter(
+        *_task_list_criteria(user_id, filter_type, goal_id, tags, match_all)
+    )
+
+def get_tasks_by_user_id(user_id, filter_type=None, goal_id=None, sort_by=None, tags=None, match_all=True):
     """
     获取用户的所有任务
     filter_type: all, today, week, completed, upcoming, unscheduled
     sort_by: dueDate, createdAt, priority, alphabetical
     """
     try:
-        query = Task.query.filter_by(user_id=user_id)
-        
-        # 应用过滤条件
-        if filter_type:
-            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-            week_end = today + timedelta(days=7)
-            
-            if filter_type == 'today':
-                query = query.filter(Task.due_date >= today, Task.due_date < today + timedelta(days=1))
-            elif filter_type == 'week':
-                query = query.filter(Task.due_date >= today, Task.due_date < week_end)
-            elif filter_type == 'completed':
-                query = query.filter_by(completed=True)
-            elif filter_type == 'upcoming':
-                query = query.filter(Task.due_date >= today)
-            elif filter_type == 'unscheduled':
-                query = query.filter(Task.due_date == None)
-        
-        # 按目标ID筛选
-        if goal_id:
-            query = query.filter_by(goal_id=goal_id)
-        
-        # 应用排序
-        if sort_by:
-            if sort_by == 'dueDate':
-                query = query.order_by(Task.due_date)
-            elif sort_by == 'createdAt':
-                query = query.order_by(Task.created_at.desc())
-            elif sort_by == 'priority':
-                # 自定义排序: high > medium > low
-                query = query.order_by(
-                    db.case(
-                        [(Task.priority == 'high', 1)],
-                        [(Task.priority == 'medium', 2)],
-                        else_=3
-                    )
-                )
-            elif sort_by == 'alphabetical':
-                query = query.order_by(Task.title)
-        else:
-            # 默认按创建时间排序
-            query = query.order_by(Task.created_at.desc())
-        
-        return query.all()
+        _, sort_keys = _task_sort_keys(sort_by)
+        return _order_by(_task_list_query(user_id, filter_type, goal_id, tags, match_all), sort_keys).all()
     except OperationalError as e:
         logger.error(f"get_tasks_by_user_id error: {e}")
         return []
 
+def get_tasks_page(user_id, filter_type=None, goal_id=None, sort_by=None, limit=DEFAULT_PAGE_SIZE, cursor=None,
+                   tags=None, match_all=True):
+    """
+    分页获取用户的任务，返回 (任务列表, 下一页游标)
+    游标无效时抛出ValueError
+    """
+    sort_name, sort_keys = _task_sort_keys(sort_by)
+    try:
+        query = _task_list_query(user_id, filter_type, goal_id, tags, match_all)
+        return _paginate(query, sort_name, sort_keys, limit, cursor)
+    except OperationalError as e:
+        logger.error(f"get_tasks_page error: {e}")
+        return [], None
+
+def iter_task_chunks(user_id, filter_type=None, goal_id=None, sort_by=None, cursor=None, chunk_size=None,
+                     tags=None, match_all=True):
+    """
+    分块读取用户的全部任务（可从游标位置开始），返回每次产出一块任务的生成器
+    游标在调用时立即校验，无效时抛出ValueError
+    """
+    sort_name, sort_keys = _task_sort_keys(sort_by)
+    if cursor:
+        _decode_cursor(cursor, sort_name, sort_keys)
+    query = _task_list_query(user_id, filter_type, goal_id, tags, match_all)
+    return _iter_chunks(query, sort_name, sort_keys, chunk_size or STREAM_CHUNK_SIZE, cursor)
+
+def get_repeating_tasks_in_range(user_id, start, end):
+    """
+    获取可能在 [start, end) 内发生的重复任务（首次发生早于窗口结束，且重复未在窗口开始前结束）
+    走 user_id, is_repeating, due_date 索引，标签批量加载
+    """
+    try:
+        return Task.query.options(db.selectinload(Task.tags)).filter(
+            Task.user_id == user_id,
+            Task.is_repeating == db.true(),
+            Task.due_date < end,
+            db.or_(Task.repeat_end_date.is_(None), Task.repeat_end_date >= start)
+        ).all()
+    except OperationalError as e:
+        logger.error(f"get_repeating_tasks_in_range error: {e}")
+        return []
+
+# ========== 任务搜索 ==========
+# 搜索词的最短长度（MySQL ngram 分词默认按2个字切分）
+SEARCH_MIN_LENGTH = 2
+# 非MySQL数据库（本地开发、测试）回退到LIKE匹配时各字段的权重
+SEARCH_FIELD_WEIGHTS = (('title', 4), ('tags_text', 3), ('expected_outcome', 2), ('notes', 1))
+
+def _search_condition(q):
+    """
+    返回 (匹配条件, 相关度表达式)
+    MySQL使用全文索引 MATCH ... AGAINST（自然语言模式，按相关度排序）
+    其他数据库按字段权重累加LIKE匹配结果，仅用于开发和测试，开销随任务数量线性增长
+    """
+    if db.engine.dialect.name == 'mysql':
+        score = mysql_match(Task.title, Task.notes, Task.expected_outcome, Task.tags_text, against=q)
+        return score, score
+    pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    score = sum(
+        db.case([(getattr(Task, field).like(pattern, escape='\\'), weight)], else_=0)
+        for field, weight in SEARCH_FIELD_WEIGHTS
+    )
+    return score > 0, score
+
+def search_tasks(user_id, q, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    在任务标题、备注、期望成果和标签中搜索，按相关度排序并分页，返回 (任务列表, 下一页游标)
+    游标与搜索词绑定，换了搜索词的游标视为无效，抛出ValueError
+    """
+    condition, score = _search_condition(q)
+    sort_keys = [
+        SortKey(score, True, lambda row: row.score),
+        SortKey(Task.id, False, lambda row: row.Task.id)
+    ]
+    sort_name = 'search:' + hashlib.sha256(q.encode('utf-8')).hexdigest()[:8]
+    try:
+        query = db.session.query(Task, score.label('score')).options(db.selectinload(Task.tags)).filter(
+            Task.user_id == user_id, condition
+        )
+        rows, next_cursor = _paginate(query, sort_name, sort_keys, limit, cursor)
+        return [row.Task for row in rows], next_cursor
+    except OperationalError as e:
+        logger.error(f"search_tasks error: {e}")
+        return [], None
+
 def get_task_by_id(task_id, user_id=None):
     """
     获取指定ID的任务
@@ -147,42 +436,70 @@ def get_task_by_id(task_id, user_id=None):
         logger.error(f"get_task_by_id error: {e}")
         return None
 
+def _lock_task(task_id, user_id, *options):
+    """
+    以 SELECT ... FOR UPDATE 读取任务并锁定到事务结束
+    写入路径据此取得修改前的快照：并发修改同一任务时后到的请求等待前一个提交，
+    目标计数、标签计数和每日统计的增量不会基于同一个旧快照重复计算
+    """
+    return Task.query.options(*options).filter_by(id=task_id, user_id=user_id).with_for_update().populate_existing().first()
+
+# 允许通过更新接口修改的任务字段
+TASK_UPDATABLE_FIELDS = (
+    'goal_id', 'title', 'completed', 'due_date', 'priority', 'estimated_time', 'actual_time',
+    'notes', 'expected_outcome', 'enthusiasm', 'difficulty', 'importance', 'is_repeating',
+    'repeat_frequency', 'repeat_interval', 'repeat_end_date', 'repeat_count', 'parent_task_id',
+    'custom_week_days'
+)
+
+def _tags_text(tags):
+    """
+    标签名以空格连接，存入任务表供全文索引使用
+    """
+    return ' '.join(normalize_tag_names(tags)) or None
+
+def _task_columns(task_data, user_id):
+    """
+    根据请求数据生成新任务的列值（含默认值）
+    """
+    return {
+        'user_id': user_id,
+        'goal_id': task_data.get('goal_id'),
+        'title': task_data.get('title'),
+        'completed': task_data.get('completed', False),
+        'due_date': task_data.get('due_date'),
+        'priority': task_data.get('priority', 'medium'),
+        'estimated_time': task_data.get('estimated_time', 0),
+        'actual_time': task_data.get('actual_time', 0),
+        'notes': task_data.get('notes'),
+        'expected_outcome': task_data.get('expected_outcome'),
+        'enthusiasm': task_data.get('enthusiasm'),
+        'difficulty': task_data.get('difficulty'),
+        'importance': task_data.get('importance'),
+        'is_repeating': task_data.get('is_repeating', False),
+        'repeat_frequency': task_data.get('repeat_frequency'),
+        'repeat_interval': task_data.get('repeat_interval'),
+        'repeat_end_date': task_data.get('repeat_end_date'),
+        'repeat_count': task_data.get('repeat_count'),
+        'parent_task_id': task_data.get('parent_task_id'),
+        'custom_week_days': json.dumps(task_data.get('custom_week_days')) if task_data.get('custom_week_days') else None,
+        'tags_text': _tags_text(task_data.get('tags'))
+    }
+
 def create_task(task_data, user_id):
     """
     创建新任务
     """
     try:
-        task = Task(
-            user_id=user_id,
-            goal_id=task_data.get('goal_id'),
-            title=task_data.get('title'),
-            completed=task_data.get('completed', False),
-            due_date=task_data.get('due_date'),
-            priority=task_data.get('priority', 'medium'),
-            estimated_time=task_data.get('estimated_time', 0),
-            actual_time=task_data.get('actual_time', 0),
-            notes=task_data.get('notes'),
-            expected_outcome=task_data.get('expected_outcome'),
-            enthusiasm=task_data.get('enthusiasm'),
-            difficulty=task_data.get('difficulty'),
-            importance=task_data.get('importance'),
-            is_repeating=task_data.get('is_repeating', False),
-            repeat_frequency=task_data.get('repeat_frequency'),
-            repeat_interval=task_data.get('repeat_interval'),
-            repeat_end_date=task_data.get('repeat_end_date'),
-            repeat_count=task_data.get('repeat_count'),
-            parent_task_id=task_data.get('parent_task_id'),
-            custom_week_days=json.dumps(task_data.get('custom_week_days')) if task_data.get('custom_week_days') else None
-        )
+        task = Task(**_task_columns(task_data, user_id))
         
         db.session.add(task)
         db.session.flush()  # 获取生成的ID
+        _record_task_changes(user_id, [(None, _task_snapshot(task))])
         
         # 添加标签
         if task_data.get('tags'):
-            for tag_name in task_data.get('tags'):
-                tag = TaskTag(task_id=task.id, tag_name=tag_name)
-                db.session.add(tag)
+            _replace_task_tags(user_id, {task.id: task_data['tags']}, new_task_ids={task.id})
         
         db.session.commit()
         return task
@@ -196,28 +513,25 @@ def update_task(task_id, task_data, user_id):
     更新任务
     """
     try:
-        task = get_task_by_id(task_id, user_id)
+        task = _lock_task(task_id, user_id)
         if not task:
             return None
+        before = _task_snapshot(task)
         
         # 更新任务属性
         for key, value in task_data.items():
-            if key == 'tags':
-                continue  # 标签单独处理
-            if key == 'custom_week_days' and value:
-                value = json.dumps(value)
-            if hasattr(task, key):
-                setattr(task, key, value)
-        
-        # 更新标签
-        if 'tags' in task_data:
-            # 删除现有标签
-            TaskTag.query.filter_by(task_id=task_id).delete()
-            
-            # 添加新标签
-            for tag_name in task_data['tags']:
-                tag = TaskTag(task_id=task_id, tag_name=tag_name)
-                db.session.add(tag)
+            if key not in TASK_UPDATABLE_FIELDS:
+                continue  # 标签单独处理，其他字段不允许修改
+            if key == 'custom_week_days':
+                value = json.dumps(value) if value else None
+            setattr(task, key, value)
+        _record_task_changes(task.user_id, [(before, _task_snapshot(task))])
+        
+        # 更新标签（只写入有差异的关联行）
+        if 'tags' in task_data and _replace_task_tags(task.user_id, {task_id: task_data['tags'] or []}):
+            # 标签不在任务表中，显式刷新更新时间以便增量同步
+            task.updated_at = datetime.now()
+            task.tags_text = _tags_text(task_data['tags'])
         
         db.session.commit()
         return task
@@ -226,16 +540,72 @@ def update_task(task_id, task_data, user_id):
         db.session.rollback()
         return None
 
+def _changed_fields(obj, data, fields):
+    """
+    返回请求数据中值与当前值不同的字段 {字段: 新值}，用于按差异更新
+    custom_week_days 先序列化为JSON再比较；时间比较时忽略时区（数据库中保存的是不带时区的时间）
+    """
+    changed = {}
+    for key in fields:
+        if key not in data:
+            continue
+        value = data[key]
+        if key == 'custom_week_days':
+            value = json.dumps(value) if value else None
+        current = getattr(obj, key)
+        if isinstance(value, datetime) and isinstance(current, datetime):
+            same = value.replace(tzinfo=None) == current.replace(tzinfo=None)
+        else:
+            same = value == current
+        if not same:
+            changed[key] = value
+    return changed
+
+def patch_task(task_id, task_data, user_id):
+    """
+    按差异更新任务（PATCH）：一条UPDATE只写入值发生变化的字段，标签只插入新增、删除移除的关联行
+    没有任何变化时不写数据库，也不改变更新时间和数据版本号
+    """
+    try:
+        task = _lock_task(task_id, user_id, db.selectinload(Task.tags))
+        if not task:
+            return None
+        before = _task_snapshot(task)
+        
+        changed = _changed_fields(task, task_data, TASK_UPDATABLE_FIELDS)
+        tags_changed = 'tags' in task_data and _replace_task_tags(
+            user_id, {task_id: task_data['tags'] or []}, current={task_id: {tag.name: tag.id for tag in task.tags}}
+        )
+        if not changed and not tags_changed:
+            return task
+        
+        for key, value in changed.items():
+            setattr(task, key, value)
+        if tags_changed:
+            task.tags_text = _tags_text(task_data['tags'])
+            task.updated_at = datetime.now()
+        _record_task_changes(user_id, [(before, _task_snapshot(task))])
+        
+        db.session.commit()
+        return task
+    except OperationalError as e:
+        logger.error(f"patch_task error: {e}")
+        db.session.rollback()
+        return None
+
 def delete_task(task_id, user_id):
     """
     删除任务
     """
     try:
-        task = get_task_by_id(task_id, user_id)
+        task = _lock_task(task_id, user_id)
         if not task:
             return False
         
+        _record_task_changes(task.user_id, [(_task_snapshot(task), None)])
+        _replace_task_tags(task.user_id, {task_id: []})
         db.session.delete(task)
+        db.session.add(DeletedRecord(user_id=task.user_id, entity_type='task', entity_id=task_id))
         db.session.commit()
         return True
     except OperationalError as e:
@@ -248,11 +618,13 @@ def toggle_task_complete(task_id, user_id):
     切换任务完成状态
     """
     try:
-        task = get_task_by_id(task_id, user_id)
+        task = _lock_task(task_id, user_id)
         if not task:
             return None
         
+        before = _task_snapshot(task)
         task.completed = not task.completed
+        _record_task_changes(task.user_id, [(before, _task_snapshot(task))])
         db.session.commit()
         return task
     except OperationalError as e:
@@ -260,22 +632,491 @@ def toggle_task_complete(task_id, user_id):
         db.session.rollback()
         return None
 
+# ========== 标签相关 ==========
+# 标签名最大长度（与标签表name列一致）
+TAG_NAME_MAX_LENGTH = 50
+
+def normalize_tag_names(names):
+    """
+    规范化标签名列表：去除首尾空白，截断到最大长度，忽略空标签和重复标签，保持原有顺序
+    """
+    normalized = []
+    for name in names or []:
+        if not isinstance(name, str):
+            continue
+        name = name.strip()[:TAG_NAME_MAX_LENGTH]
+        if name and name not in normalized:
+            normalized.append(name)
+    return normalized
+
+def _get_or_create_tag_ids(user_id, names):
+    """
+    返回用户标签名到标签ID的映射，不存在的标签先创建
+    并发请求创建同名标签时由唯一索引去重（INSERT IGNORE），之后重新查询得到ID
+    """
+    if not names:
+        return {}
+    tags = Tag.__table__
+    
+    def select_ids():
+        rows = db.session.execute(
+            db.select(tags.c.id, tags.c.name).where(tags.c.user_id == user_id, tags.c.name.in_(names))
+        )
+        return {name: tag_id for tag_id, name in rows}
+    
+    tag_ids = select_ids()
+    missing = [name for name in names if name not in tag_ids]
+    if missing:
+        now = datetime.now()
+        db.session.execute(
+            tags.insert().prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite'),
+            [{'user_id': user_id, 'name': name, 'task_count': 0, 'created_at': now} for name in missing]
+        )
+        tag_ids = select_ids()
+    return tag_ids
+
+def _replace_task_tags(user_id, tag_updates, new_task_ids=(), current=None):
+    """
+    将任务的标签替换为给定列表，只删除和插入有差异的关联行，并增量维护标签的任务计数
+    与任务写入在同一事务中执行，返回是否有标签发生变化
+    tag_updates: {任务ID: 标签名列表}，空列表表示清空（删除任务前调用）
+    new_task_ids: 刚创建的任务，没有旧标签，不必查询
+    current: 调用方已加载的当前标签 {任务ID: {标签名: 标签ID}}，这些任务不必查询
+    """
+    if not tag_updates:
+        return False
+    task_tags, tags = TaskTag.__table__, Tag.__table__
+    current = current or {}
+    
+    old = {task_id: dict(current.get(task_id, {})) for task_id in tag_updates}
+    unknown = [task_id for task_id in tag_updates if task_id not in new_task_ids and task_id not in current]
+    if unknown:
+        rows = db.session.execute(
+            db.select(task_tags.c.task_id, task_tags.c.tag_id, tags.c.name)
+            .join(tags, tags.c.id == task_tags.c.tag_id)
+            .where(task_tags.c.task_id.in_(unknown))
+        )
+        for task_id, tag_id, name in rows:
+            old[task_id][name] = tag_id
+    
+    # 已关联的标签直接使用其ID，只为新出现的标签名查询或创建标签
+    names = {task_id: normalize_tag_names(tag_names) for task_id, tag_names in tag_updates.items()}
+    tag_ids = {name: tag_id for old_tags in old.values() for name, tag_id in old_tags.items()}
+    tag_ids.update(_get_or_create_tag_ids(
+        user_id, sorted({name for tag_names in names.values() for name in tag_names} - set(tag_ids))
+    ))
+    
+    cleared, removed, added = [], {}, []
+    for task_id, tag_names in names.items():
+        old_tags = old[task_id]
+        gone = [tag_id for name, tag_id in old_tags.items() if name not in tag_names]
+        if gone and not tag_names:
+            cleared.append(task_id)
+        elif gone:
+            removed[task_id] = gone
+        added.extend({'task_id': task_id, 'tag_id': tag_ids[name]} for name in tag_names if name not in old_tags)
+    
+    deltas = Counter()
+    if cleared or removed:
+        conditions = [db.and_(task_tags.c.task_id == task_id, task_tags.c.tag_id.in_(gone)) for task_id, gone in removed.items()]
+        if cleared:
+            conditions.append(task_tags.c.task_id.in_(cleared))
+        db.session.execute(task_tags.delete().where(db.or_(*conditions)))
+        deltas.subtract(old[task_id][name] for task_id in cleared for name in old[task_id])
+        deltas.subtract(tag_id for gone in removed.values() for tag_id in gone)
+    if added:
+        db.session.execute(task_tags.insert(), added)
+        deltas.update(row['tag_id'] for row in added)
+    
+    _adjust_tag_counts(deltas)
+    return bool(cleared or removed or added)
+
+def _adjust_tag_counts(deltas):
+    """
+    用一条 UPDATE ... SET task_count = task_count + CASE id WHEN ... END 调整多个标签的任务计数
+    """
+    deltas = {tag_id: delta for tag_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    tags = Tag.__table__
+    db.session.execute(
+        tags.update().where(tags.c.id.in_(deltas)).values(
+            task_count=tags.c.task_count + db.case(deltas, value=tags.c.id, else_=0)
+        )
+    )
+
+def get_tags_by_user_id(user_id):
+    """
+    获取用户正在使用的标签及各自的任务数（按任务数降序、名称升序），计数随任务写入维护，不做聚合查询
+    """
+    try:
+        return Tag.query.filter(Tag.user_id == user_id, Tag.task_count > 0).order_by(
+            Tag.task_count.desc(), Tag.name
+        ).all()
+    except OperationalError as e:
+        logger.error(f"get_tags_by_user_id error: {e}")
+        return []
+
+# ========== 任务派生数据 ==========
+# 影响派生数据（目标计数、每日统计汇总）的任务字段
+TASK_SNAPSHOT_FIELDS = (
+    'goal_id', 'completed', 'due_date', 'created_at', 'priority', 'estimated_time', 'actual_time',
+    'enthusiasm', 'difficulty', 'importance'
+)
+
+def _task_snapshot(task):
+    """
+    取出任务中影响派生数据的字段，task可以是ORM对象、查询行或列值字典
+    """
+    if isinstance(task, dict):
+        return {field: task.get(field) for field in TASK_SNAPSHOT_FIELDS}
+    return {field: getattr(task, field) for field in TASK_SNAPSHOT_FIELDS}
+
+def _record_task_changes(user_id, changes):
+    """
+    根据任务变化前后的快照增量维护派生数据（用户数据版本号、目标计数、每日统计汇总），与任务写入在同一事务中执行
+    changes: [(变化前快照或None, 变化后快照或None)]，None表示新建或删除
+    """
+    if changes:
+        _bump_data_version(user_id)
+    
+    goal_deltas, stats_deltas = {}, {}
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if not snapshot:
+                continue
+            _add_stats_deltas(stats_deltas, snapshot, sign)
+            if snapshot['goal_id']:
+                delta = goal_deltas.setdefault(snapshot['goal_id'], [0, 0])
+                delta[0] += sign
+                delta[1] += sign if snapshot['completed'] else 0
+    
+    for goal_id, (total_delta, completed_delta) in goal_deltas.items():
+        if total_delta or completed_delta:
+            _adjust_goal_counters(goal_id, total_delta, completed_delta)
+    _upsert_daily_stats(user_id, stats_deltas)
+
+def _adjust_goal_counters(goal_id, total_delta, completed_delta):
+    """
+    原子地调整目标的任务计数，并据此更新进度（所有任务完成时标记目标为已完成）
+    进度和完成状态的赋值排在计数之前，且只引用旧值加增量：
+    MySQL按顺序求值SET子句，其他数据库使用旧值，两者结果一致
+    """
+    goals = Goal.__table__
+    total = goals.c.total_tasks + total_delta
+    completed = goals.c.completed_tasks + completed_delta
+    db.session.execute(
+        goals.update().where(goals.c.id == goal_id).ordered_values(
+            # 整除：(completed * 100 - completed * 100 % total) / total
+            (goals.c.progress, db.case(
+                [(total > 0, (completed * 100 - (completed * 100) % total) / total)],
+                else_=goals.c.progress
+            )),
+            (goals.c.completed, db.case(
+                [(db.and_(total > 0, completed == total), db.true())],
+                else_=goals.c.completed
+            )),
+            (goals.c.total_tasks, total),
+            (goals.c.completed_tasks, completed)
+        )
+    )
+
+# ========== 每日统计汇总 ==========
+# 统计维度 -> 任务快照字段，另有维度 all 为当天全部任务的合计
+STATS_DIMENSIONS = {
+    'priority': 'priority',
+    'goal': 'goal_id',
+    'enthusiasm': 'enthusiasm',
+    'difficulty': 'difficulty',
+    'importance': 'importance',
+}
+STATS_COUNTERS = ('total', 'completed', 'estimated_time', 'actual_time')
+# 统计接口单次查询的最大天数
+STATS_MAX_DAYS = 366
+
+def _stats_day(snapshot):
+    """
+    任务计入的日期：截止日期所在的天，没有截止日期时为创建日期
+    """
+    moment = snapshot['due_date'] or snapshot['created_at']
+    return moment.date() if moment else date.today()
+
+def _add_stats_deltas(deltas, snapshot, sign):
+    """
+    将一个任务快照计入（sign=1）或移出（sign=-1）汇总增量 {(日期, 维度, 取值): [任务数, 已完成数, 预计时间, 实际时间]}
+    """
+    day = _stats_day(snapshot)
+    counts = (
+        sign, sign if snapshot['completed'] else 0,
+        sign * (snapshot['estimated_time'] or 0), sign * (snapshot['actual_time'] or 0)
+    )
+    keys = [(day, 'all', '')] + [
+        (day, dimension, '' if snapshot[field] is None else str(snapshot[field]))
+        for dimension, field in STATS_DIMENSIONS.items()
+    ]
+    for key in keys:
+        delta = deltas.setdefault(key, [0, 0, 0, 0])
+        for i, count in enumerate(counts):
+            delta[i] += count
+
+def _upsert_daily_stats(user_id, deltas, chunk_size=500):
+    """
+    将汇总增量累加到汇总表：多行 INSERT，已存在的行在原值上累加
+    （MySQL: ON DUPLICATE KEY UPDATE，SQLite: ON CONFLICT DO UPDATE），增量全为0的行不写入
+    """
+    rows = [
+        dict(zip(STATS_COUNTERS, counts), user_id=user_id, day=day, dimension=dimension, value=value)
+        for (day, dimension, value), counts in deltas.items() if any(counts)
+    ]
+    table = TaskDailyStat.__table__
+    for start in range(0, len(rows), chunk_size):
+        if db.engine.dialect.name == 'mysql':
+            statement = mysql_insert(table).values(rows[start:start + chunk_size])
+            statement = statement.on_duplicate_key_update({
+                counter: table.c[counter] + statement.inserted[counter] for counter in STATS_COUNTERS
+            })
+        else:
+            statement = sqlite_insert(table).values(rows[start:start + chunk_size])
+            statement = statement.on_conflict_do_update(
+                index_elements=['user_id', 'dimension', 'day', 'value'],
+                set_={counter: table.c[counter] + statement.excluded[counter] for counter in STATS_COUNTERS}
+            )
+        db.session.execute(statement)
+
+def _move_goal_stats(user_id, goal_id):
+    """
+    目标删除后其任务解除关联：将该目标的汇总行合并到“未关联目标”后删除
+    """
+    table = TaskDailyStat.__table__
+    condition = db.and_(table.c.user_id == user_id, table.c.dimension == 'goal', table.c.value == goal_id)
+    rows = db.session.execute(
+        db.select(table.c.day, *[table.c[counter] for counter in STATS_COUNTERS]).where(condition)
+    ).fetchall()
+    if rows:
+        _upsert_daily_stats(user_id, {(row.day, 'goal', ''): list(row[1:]) for row in rows})
+        db.session.execute(table.delete().where(condition))
+
+def get_task_stats(user_id, start, end):
+    """
+    读取 [start, end] 日期范围内的统计汇总，只查询汇总表，开销与天数有关、与任务数量无关
+    返回 (每日合计行 [(日期, 计数...)], 各维度合计行 [(维度, 取值, 计数...)])，出错时返回None
+    """
+    table = TaskDailyStat.__table__
+    in_range = [table.c.user_id == user_id, table.c.day >= start, table.c.day <= end]
+    try:
+        days = db.session.execute(
+            db.select(table.c.day, *[table.c[counter] for counter in STATS_COUNTERS])
+            .where(table.c.dimension == 'all', *in_range).order_by(table.c.day)
+        ).fetchall()
+        breakdown = db.session.execute(
+            db.select(table.c.dimension, table.c.value, *[db.func.sum(table.c[counter]) for counter in STATS_COUNTERS])
+            .where(table.c.dimension.in_(list(STATS_DIMENSIONS)), *in_range)
+            .group_by(table.c.dimension, table.c.value)
+        ).fetchall()
+        return days, breakdown
+    except OperationalError as e:
+        logger.error(f"get_task_stats error: {e}")
+        db.session.rollback()
+        return None
+
+def rebuild_task_stats(user_id, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    由任务表重建用户的每日统计汇总（上线时回填已有数据，或校正汇总），按任务ID分块读取
+    返回写入的汇总行数，出错时返回None
+    """
+    try:
+        table = TaskDailyStat.__table__
+        db.session.execute(table.delete().where(table.c.user_id == user_id))
+        
+        deltas, last_id = {}, None
+        columns = [Task.id] + [getattr(Task, field) for field in TASK_SNAPSHOT_FIELDS]
+        while True:
+            query = db.session.query(*columns).filter(Task.user_id == user_id)
+            if last_id:
+                query = query.filter(Task.id > last_id)
+            rows = query.order_by(Task.id).limit(chunk_size).all()
+            for row in rows:
+                _add_stats_deltas(deltas, _task_snapshot(row), 1)
+            if len(rows) < chunk_size:
+                break
+            last_id = rows[-1].id
+        
+        _upsert_daily_stats(user_id, deltas)
+        db.session.commit()
+        return len(deltas)
+    except OperationalError as e:
+        logger.error(f"rebuild_task_stats error: {e}")
+        db.session.rollback()
+        return None
+
+# ========== 批量任务操作 ==========
+# 单次批量请求允许的最大操作数
+MAX_BATCH_OPERATIONS = 500
+
+def apply_task_batch(operations, user_id):
+    """
+    在一个事务中批量执行任务操作
+    operations: [{'index': 序号, 'op': create/update/delete/toggle, 'id': 任务ID, 'data': 任务数据}]
+    同一任务的多个操作按顺序合并后再执行：
+    - 新建任务使用一条多行INSERT，标签同样一次插入
+    - 更新和切换完成状态合并为一条 UPDATE ... SET col = CASE id WHEN ... END
+    - 删除使用 DELETE ... WHERE id IN (...)
+    返回 (结果字典 {序号: 结果}, 新建或更新后的任务列表)，数据库出错时整体回滚并返回 (None, None)
+    """
+    try:
+        now = datetime.now()
+        results = {}
+        
+        # 一次查询确认涉及的任务都属于当前用户，并锁定这些任务（快照用于计算计数和统计的增量，见 _lock_task）
+        referenced = {op['id'] for op in operations if op['op'] != 'create'}
+        existing = {}
+        if referenced:
+            rows = db.session.query(*[getattr(Task, field) for field in ('id',) + TASK_SNAPSHOT_FIELDS]).filter(
+                Task.user_id == user_id, Task.id.in_(referenced)
+            ).order_by(Task.id).with_for_update().all()
+            existing = {row.id: _task_snapshot(row) for row in rows}
+        
+        # 按顺序合并操作
+        new_rows = []
+        changes, tag_updates, deleted = {}, {}, set()
+        for op in operations:
+            if op['op'] == 'create':
+                row = _task_columns(op['data'], user_id)
+                row.update(id=generate_uuid(), created_at=now, updated_at=now)
+                new_rows.append(row)
+                if op['data'].get('tags'):
+                    tag_updates[row['id']] = list(op['data']['tags'])
+                results[op['index']] = {'status': 'ok', 'id': row['id']}
+                continue
+            
+            task_id = op['id']
+            if task_id not in existing or task_id in deleted:
+                results[op['index']] = {'status': 'error', 'id': task_id, 'code': 'task_not_found', 'message': 'Task not found'}
+                continue
+            
+            if op['op'] == 'delete':
+                deleted.add(task_id)
+                changes.pop(task_id, None)
+                tag_updates[task_id] = []  # 删除任务前清空标签，同时减少标签计数
+            elif op['op'] == 'toggle':
+                task_changes = changes.setdefault(task_id, {})
+                task_changes['completed'] = not task_changes.get('completed', existing[task_id]['completed'])
+            else:
+                task_changes = changes.setdefault(task_id, {})
+                for key, value in op['data'].items():
+                    if key == 'tags':
+                        tag_updates[task_id] = list(value or [])
+                        task_changes['tags_text'] = _tags_text(value)
+                    elif key in TASK_UPDATABLE_FIELDS:
+                        if key == 'custom_week_days':
+                            value = json.dumps(value) if value else None
+                        task_changes[key] = value
+            results[op['index']] = {'status': 'ok', 'id': task_id}
+        
+        tasks_table = Task.__table__
+        new_ids = {row['id'] for row in new_rows}
+        
+        if new_rows:
+            db.session.execute(tasks_table.insert(), new_rows)
+        
+        # 标签变化的任务也需要刷新updated_at
+        updated_ids = (set(changes) | set(tag_updates)) - new_ids - deleted
+        if updated_ids:
+            columns = {}
+            for key in sorted({key for task_changes in changes.values() for key in task_changes}):
+                column = tasks_table.c[key]
+                values = {task_id: task_changes[key] for task_id, task_changes in changes.items() if key in task_changes}
+                columns[key] = db.case(values, value=tasks_table.c.id, else_=column)
+            columns['updated_at'] = now
+            db.session.execute(
+                tasks_table.update()
+                .where(tasks_table.c.user_id == user_id, tasks_table.c.id.in_(updated_ids))
+                .values(**columns)
+            )
+        
+        # 新建、更新、删除任务的标签一次替换，标签计数一次调整
+        _replace_task_tags(user_id, tag_updates, new_task_ids=new_ids)
+        
+        if deleted:
+            db.session.execute(
+                tasks_table.delete().where(tasks_table.c.user_id == user_id, tasks_table.c.id.in_(deleted))
+            )
+            db.session.execute(DeletedRecord.__table__.insert(), [
+                {'user_id': user_id, 'entity_type': 'task', 'entity_id': task_id, 'deleted_at': now}
+                for task_id in deleted
+            ])
+        
+        # 同步维护目标计数等派生数据
+        _record_task_changes(
+            user_id,
+            [(None, _task_snapshot(row)) for row in new_rows] +
+            [(existing[task_id], None) for task_id in deleted] +
+            [(existing[task_id], dict(existing[task_id], **{
+                field: task_changes[field] for field in TASK_SNAPSHOT_FIELDS if field in task_changes
+            })) for task_id, task_changes in changes.items()]
+        )
+        
+        db.session.commit()
+        
+        # 一次查询取回新建和更新后的任务（标签批量加载）
+        touched = new_ids | updated_ids
+        tasks = []
+        if touched:
+            tasks = Task.query.options(db.selectinload(Task.tags)).filter(Task.id.in_(touched)).all()
+        return results, tasks
+    except OperationalError as e:
+        logger.error(f"apply_task_batch error: {e}")
+        db.session.rollback()
+        return None, None
+
 # ========== 目标相关 ==========
+GOAL_SORT_KEYS = [
+    SortKey(Goal.created_at, True, lambda goal: goal.created_at),
+    SortKey(Goal.id, True, lambda goal: goal.id)
+]
+
+def _goal_list_criteria(user_id, goal_type=None):
+    criteria = [Goal.user_id == user_id]
+    
+    if goal_type and goal_type != 'all':
+        criteria.append(Goal.goal_type == goal_type)
+    
+    return criteria
+
+def _goal_list_query(user_id, goal_type=None):
+    return Goal.query.filter(*_goal_list_criteria(user_id, goal_type))
+
 def get_goals_by_user_id(user_id, goal_type=None):
     """
     获取用户的所有目标
     """
     try:
-        query = Goal.query.filter_by(user_id=user_id)
-        
-        if goal_type and goal_type != 'all':
-            query = query.filter_by(goal_type=goal_type)
-        
-        return query.order_by(Goal.created_at.desc()).all()
+        return _order_by(_goal_list_query(user_id, goal_type), GOAL_SORT_KEYS).all()
     except OperationalError as e:
         logger.error(f"get_goals_by_user_id error: {e}")
         return []
 
+def get_goals_page(user_id, goal_type=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    分页获取用户的目标（按创建时间倒序），返回 (目标列表, 下一页游标)
+    游标无效时抛出ValueError
+    """
+    try:
+        return _paginate(_goal_list_query(user_id, goal_type), 'createdAt', GOAL_SORT_KEYS, limit, cursor)
+    except OperationalError as e:
+        logger.error(f"get_goals_page error: {e}")
+        return [], None
+
+def iter_goal_chunks(user_id, goal_type=None, cursor=None, chunk_size=None):
+    """
+    分块读取用户的全部目标（可从游标位置开始），返回每次产出一块目标的生成器
+    游标在调用时立即校验，无效时抛出ValueError
+    """
+    if cursor:
+        _decode_cursor(cursor, 'createdAt', GOAL_SORT_KEYS)
+    query = _goal_list_query(user_id, goal_type)
+    return _iter_chunks(query, 'createdAt', GOAL_SORT_KEYS, chunk_size or STREAM_CHUNK_SIZE, cursor)
+
 def get_goal_by_id(goal_id, user_id=None):
     """
     获取指定ID的目标
@@ -309,6 +1150,7 @@ def create_goal(goal_data, user_id):
         )
         
         db.session.add(goal)
+        _bump_data_version(user_id)
         db.session.commit()
         return goal
     except OperationalError as e:
@@ -326,8 +1168,11 @@ def update_goal(goal_id, goal_data, user_id):
             return None
         
         for key, value in goal_data.items():
+            if key in ('total_tasks', 'completed_tasks'):
+                continue  # 任务计数由任务写入维护
             if hasattr(goal, key):
                 setattr(goal, key, value)
+        _bump_data_version(goal.user_id)
         
         db.session.commit()
         return goal
@@ -336,6 +1181,43 @@ def update_goal(goal_id, goal_data, user_id):
         db.session.rollback()
         return None
 
+# 允许通过更新接口修改的目标字段（任务计数由任务写入维护）
+GOAL_UPDATABLE_FIELDS = (
+    'title', 'description', 'category', 'color', 'icon', 'start_date', 'end_date',
+    'completed', 'progress', 'goal_type'
+)
+
+def patch_goal(goal_id, goal_data, user_id):
+    """
+    按差异更新目标（PATCH）：只写入值发生变化的字段，没有变化时不写数据库
+    修改完成状态或进度时，有任务的目标按任务计数确定进度（与更新接口重新计算的结果一致），不做聚合查询
+    """
+    try:
+        goal = get_goal_by_id(goal_id, user_id)
+        if not goal:
+            return None
+        
+        updates = {key: goal_data[key] for key in GOAL_UPDATABLE_FIELDS if key in goal_data}
+        if ('completed' in updates or 'progress' in updates) and goal.total_tasks > 0:
+            updates['progress'] = goal.completed_tasks * 100 // goal.total_tasks
+            if updates['progress'] == 100:
+                updates['completed'] = True
+        
+        changed = _changed_fields(goal, updates, GOAL_UPDATABLE_FIELDS)
+        if not changed:
+            return goal
+        
+        for key, value in changed.items():
+            setattr(goal, key, value)
+        _bump_data_version(user_id)
+        
+        db.session.commit()
+        return goal
+    except OperationalError as e:
+        logger.error(f"patch_goal error: {e}")
+        db.session.rollback()
+        return None
+
 def delete_goal(goal_id, user_id):
     """
     删除目标
@@ -345,7 +1227,11 @@ def delete_goal(goal_id, user_id):
         if not goal:
             return False
         
+        # 目标下的任务会被解除关联（goal_id置空），其updated_at随之刷新
         db.session.delete(goal)
+        _move_goal_stats(goal.user_id, goal_id)
+        db.session.add(DeletedRecord(user_id=goal.user_id, entity_type='goal', entity_id=goal_id))
+        _bump_data_version(goal.user_id)
         db.session.commit()
         return True
     except OperationalError as e:
@@ -355,31 +1241,34 @@ def delete_goal(goal_id, user_id):
 
 def calculate_goal_progress(goal_id):
     """
-    计算目标完成进度
+    重新计算目标完成进度
+    用一条聚合查询校正目标的任务计数，日常写入由计数增量维护，无需调用
     """
     try:
         goal = Goal.query.filter_by(id=goal_id).first()
         if not goal:
             return False
         
-        # 获取目标下的所有任务
-        tasks = Task.query.filter_by(goal_id=goal_id).all()
-        
-        if not tasks:
-            return True  # 没有任务时直接返回，保持当前进度
+        # 聚合统计目标下的任务数和已完成数（走 goal_id, completed 索引）
+        total_tasks, completed_tasks = db.session.query(
+            db.func.count(Task.id),
+            db.func.coalesce(db.func.sum(db.case([(Task.completed == db.true(), 1)], else_=0)), 0)
+        ).filter(Task.goal_id == goal_id).one()
         
-        # 计算已完成任务的比例
-        total_tasks = len(tasks)
-        completed_tasks = sum(1 for task in tasks if task.completed)
+        goal.total_tasks = total_tasks
+        goal.completed_tasks = completed_tasks
         
+        # 没有任务时保持当前进度
         if total_tasks > 0:
-            progress = int((completed_tasks / total_tasks) * 100)
+            progress = int(completed_tasks * 100 // total_tasks)
             goal.progress = progress
             
             # 如果所有任务都完成，标记目标为已完成
             if progress == 100:
                 goal.completed = True
         
+        if db.session.is_modified(goal):
+            _bump_data_version(goal.user_id)
         db.session.commit()
         return True
     except OperationalError as e:
@@ -387,13 +1276,81 @@ def calculate_goal_progress(goal_id):
         db.session.rollback()
         return False
 
+# ========== 增量同步 ==========
+# 删除记录（墓碑）保留天数，早于此时间的同步令牌需要全量同步
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+# 同步窗口重叠时间，覆盖同步期间尚未提交的写入和DATETIME精度截断
+SYNC_OVERLAP = timedelta(seconds=5)
+
+def encode_sync_token(moment):
+    """
+    将同步时间点编码为不透明的同步令牌
+    """
+    return base64.urlsafe_b64encode(moment.isoformat().encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_sync_token(token):
+    """
+    解码同步令牌，无效时抛出ValueError
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return datetime.fromisoformat(raw.decode('ascii'))
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError('invalid sync token')
+
+def get_changes_since(user_id, since=None):
+    """
+    获取用户自since以来变更的任务、目标和删除记录
+    since为空或早于墓碑保留期时返回全量数据（full=True）
+    返回 dict: tasks, goals, deleted_tasks, deleted_goals, full, sync_token；出错时返回None
+    """
+    try:
+        now = datetime.now()
+        full = since is None or since < now - SYNC_TOMBSTONE_RETENTION
+        
+        task_query = Task.query.options(db.selectinload(Task.tags)).filter_by(user_id=user_id)
+        goal_query = Goal.query.filter_by(user_id=user_id)
+        deleted = []
+        if not full:
+            task_query = task_query.filter(Task.updated_at >= since)
+            goal_query = goal_query.filter(Goal.updated_at >= since)
+            deleted = DeletedRecord.query.filter(
+                DeletedRecord.user_id == user_id,
+                DeletedRecord.deleted_at >= since
+            ).all()
+        
+        return {
+            'tasks': task_query.all(),
+            'goals': goal_query.all(),
+            'deleted_tasks': [record.entity_id for record in deleted if record.entity_type == 'task'],
+            'deleted_goals': [record.entity_id for record in deleted if record.entity_type == 'goal'],
+            'full': full,
+            'sync_token': encode_sync_token(now - SYNC_OVERLAP)
+        }
+    except OperationalError as e:
+        logger.error(f"get_changes_since error: {e}")
+        return None
+
+def purge_deleted_records(before):
+    """
+    清理早于指定时间的删除记录，返回删除的行数
+    """
+    try:
+        count = DeletedRecord.query.filter(DeletedRecord.deleted_at < before).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    except OperationalError as e:
+        logger.error(f"purge_deleted_records error: {e}")
+        db.session.rollback()
+        return 0
+
 # ========== 令牌黑名单 ==========
-def add_token_to_blacklist(token):
+def add_token_to_blacklist(token_digest, expires_at):
     """
-    将令牌添加到黑名单
+    将令牌（SHA-256摘要）添加到黑名单
     """
     try:
-        blacklisted_token = BlacklistedToken(token=token)
+        blacklisted_token = BlacklistedToken(token_digest=token_digest, expires_at=expires_at)
         db.session.add(blacklisted_token)
         db.session.commit()
         return True
@@ -402,12 +1359,70 @@ def add_token_to_blacklist(token):
         db.session.rollback()
         return False
 
-def is_token_blacklisted(token):
+def is_token_blacklisted(token_digest):
     """
-    检查令牌是否在黑名单中
+    检查令牌（SHA-256摘要）是否在黑名单中
+    出错时返回None，调用方应当作黑名单处理以保证安全
     """
     try:
-        return BlacklistedToken.query.filter_by(token=token).first() is not None
+        return BlacklistedToken.query.filter_by(token_digest=token_digest).first() is not None
     except OperationalError as e:
         logger.error(f"is_token_blacklisted error: {e}")
-        return True  # 出错时当作黑名单处理，增加安全性
+        return None
+
+def get_blacklisted_digests_after(last_id):
+    """
+    获取ID大于last_id的黑名单记录，用于增量刷新进程内过滤器
+    返回 [(id, token_digest)]，出错时返回None
+    """
+    try:
+        return db.session.query(BlacklistedToken.id, BlacklistedToken.token_digest).filter(
+            BlacklistedToken.id > last_id
+        ).order_by(BlacklistedToken.id).all()
+    except OperationalError as e:
+        logger.error(f"get_blacklisted_digests_after error: {e}")
+        return None
+
+def get_user_status_changes_after(since):
+    """
+    获取 status_changed_at 不早于 since 的用户，用于各进程清除被启用/停用用户的认证缓存
+    返回 [(id, status_changed_at)]，出错时返回None
+    """
+    try:
+        return db.session.query(User.id, User.status_changed_at).filter(
+            User.status_changed_at >= since
+        ).all()
+    except OperationalError as e:
+        logger.error(f"get_user_status_changes_after error: {e}")
+        return None
+
+def purge_expired_blacklisted_tokens(now=None):
+    """
+    删除令牌已过期的黑名单记录，返回删除的行数
+    """
+    try:
+        count = BlacklistedToken.query.filter(
+            BlacklistedToken.expires_at < (now or datetime.utcnow())
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+    except OperationalError as e:
+        logger.error(f"purge_expired_blacklisted_tokens error: {e}")
+        db.session.rollback()
+        return 0
+
+# ========== 健康检查 ==========
+def ping_database():
+    """
+    执行 SELECT 1 检查数据库是否可用，返回耗时（秒），不可用时返回None
+    """
+    try:
+        started = time.perf_counter()
+        db.session.execute(text('SELECT 1'))
+        elapsed = time.perf_counter() - started
+        db.session.rollback()
+        return elapsed
+    except Exception as e:  # 健康检查不应抛出异常：连接失败时驱动可能抛出非 OperationalError 的错误
+        logger.error(f"ping_database error: {e}")
+        db.session.rollback()
+        return None
@@ -1,30 +1,60 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request
 from datetime import datetime
 
 from wxcloudrun.dao import (
-    get_goals_by_user_id, get_goal_by_id, create_goal, 
-    update_goal, delete_goal, calculate_goal_progress,
-    get_tasks_by_user_id
+    get_goals_page, iter_goal_chunks, get_goal_by_id, create_goal, 
+    update_goal, patch_goal, delete_goal, calculate_goal_progress,
+    get_tasks_by_user_id, iter_task_chunks
 )
-from wxcloudrun.utils import token_required, format_goal, format_task
+from wxcloudrun.utils import (
+    token_required, conditional_by_data_version, format_goal, format_task,
+    get_page_args, make_page_response, is_stream_request, make_stream_response
+)
+from wxcloudrun.serializers import jsonify, goal_serializer, task_serializer
 
 # 创建蓝图
 goals_bp = Blueprint('goals', __name__, url_prefix='/api/goals')
 
+def parse_goal_dates(data):
+    """
+    将目标数据中的日期字段解析为datetime，格式错误时返回错误信息
+    """
+    for field in ('start_date', 'end_date'):
+        if field in data and data[field]:
+            try:
+                data[field] = datetime.fromisoformat(data[field].replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                return {'message': f'Invalid {field} format', 'code': 'invalid_date'}
+    return None
+
 @goals_bp.route('', methods=['GET'])
 @token_required
+@conditional_by_data_version
 def get_goals(current_user):
     """
     获取所有目标
+    支持按类型筛选和游标分页（limit, cursor）
+    stream=1 时分块读取并流式返回全部目标（从cursor位置开始）
     """
     # 获取查询参数
     goal_type = request.args.get('type', 'all')
     
+    if is_stream_request():
+        try:
+            chunks = iter_goal_chunks(current_user.id, goal_type, request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'error': {'message': 'Invalid cursor', 'code': 'invalid_page'}}), 400
+        return make_stream_response(chunks, goal_serializer), 200
+    
     # 获取目标列表
-    goals = get_goals_by_user_id(current_user.id, goal_type)
+    try:
+        limit, cursor = get_page_args()
+        goals, next_cursor = get_goals_page(current_user.id, goal_type, limit, cursor)
+    except ValueError:
+        return jsonify({'error': {'message': 'Invalid limit or cursor', 'code': 'invalid_page'}}), 400
     
     # 格式化响应
-    return jsonify([format_goal(goal) for goal in goals]), 200
+    return make_page_response([format_goal(goal) for goal in goals], next_cursor), 200
 
 @goals_bp.route('', methods=['POST'])
 @token_required
@@ -39,17 +69,9 @@ def add_goal(current_user):
         return jsonify({'error': {'message': 'Title is required', 'code': 'missing_title'}}), 400
     
     # 处理日期字段
-    if 'start_date' in data and data['start_date']:
-        try:
-            data['start_date'] = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid start_date format', 'code': 'invalid_date'}}), 400
-    
-    if 'end_date' in data and data['end_date']:
-        try:
-            data['end_date'] = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid end_date format', 'code': 'invalid_date'}}), 400
+    error = parse_goal_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # 创建目标
     goal = create_goal(data, current_user.id)
@@ -86,17 +108,9 @@ def update_goal_route(current_user, goal_id):
         return jsonify({'error': {'message': 'No data provided', 'code': 'missing_data'}}), 400
     
     # 处理日期字段
-    if 'start_date' in data and data['start_date']:
-        try:
-            data['start_date'] = datetime.fromisoformat(data['start_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid start_date format', 'code': 'invalid_date'}}), 400
-    
-    if 'end_date' in data and data['end_date']:
-        try:
-            data['end_date'] = datetime.fromisoformat(data['end_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid end_date format', 'code': 'invalid_date'}}), 400
+    error = parse_goal_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # 更新目标
     goal = update_goal(goal_id, data, current_user.id)
@@ -113,6 +127,32 @@ def update_goal_route(current_user, goal_id):
     
     return jsonify(format_goal(goal)), 200
 
+@goals_bp.route('/<goal_id>', methods=['PATCH'])
+@token_required
+def patch_goal_route(current_user, goal_id):
+    """
+    按差异更新目标：只修改请求中给出且值发生变化的字段，没有变化时不写数据库
+    """
+    data = request.get_json(silent=True)
+    
+    # 验证请求数据
+    if not isinstance(data, dict):
+        return jsonify({'error': {'message': 'No data provided', 'code': 'missing_data'}}), 400
+    if 'title' in data and not data['title']:
+        return jsonify({'error': {'message': 'Title is required', 'code': 'missing_title'}}), 400
+    
+    # 处理日期字段
+    error = parse_goal_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    goal = patch_goal(goal_id, data, current_user.id)
+    
+    if not goal:
+        return jsonify({'error': {'message': 'Goal not found', 'code': 'goal_not_found'}}), 404
+    
+    return jsonify(format_goal(goal)), 200
+
 @goals_bp.route('/<goal_id>', methods=['DELETE'])
 @token_required
 def delete_goal_route(current_user, goal_id):
@@ -128,9 +168,10 @@ def delete_goal_route(current_user, goal_id):
 
 @goals_bp.route('/<goal_id>/tasks', methods=['GET'])
 @token_required
+@conditional_by_data_version
 def get_goal_tasks(current_user, goal_id):
     """
-    获取目标下的所有任务
+    获取目标下的所有任务，stream=1 时流式返回
     """
     # 首先检查目标是否存在
     goal = get_goal_by_id(goal_id, current_user.id)
@@ -138,6 +179,9 @@ def get_goal_tasks(current_user, goal_id):
     if not goal:
         return jsonify({'error': {'message': 'Goal not found', 'code': 'goal_not_found'}}), 404
     
+    if is_stream_request():
+        return make_stream_response(iter_task_chunks(current_user.id, None, goal_id), task_serializer), 200
+    
     # 获取目标下的任务
     tasks = get_tasks_by_user_id(current_user.id, None, goal_id)
     
@@ -0,0 +1,227 @@
+"""
+进程内监控指标，以 Prometheus 文本格式输出（/metrics）
+- 每个接口的请求耗时直方图、状态码计数、每个请求的SQL语句数和SQL总耗时
+- 数据库连接池的大小、借出数、溢出数和取连接的等待时间
+指标按进程统计（Gunicorn 每个工作进程各自计数），本模块不依赖应用对象，可在创建数据库连接之前导入
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# 耗时直方图的分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 每个请求SQL语句数的分桶
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        lines += [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                  for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._values = {}  # labels -> [各分桶计数..., 总和, 次数]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = sorted((labels, list(counts)) for labels, counts in self._values.items())
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts[:len(self.buckets)] + [None]):
+                cumulative = counts[-1] if count is None else cumulative + count
+                le = (('le', _format_value(float(bound))),)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(counts[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {counts[-1]}')
+        return lines
+
+
+class Gauge:
+    """
+    抓取时由回调函数计算的指标，回调返回 [(标签值元组, 数值)]
+    其他模块已有的累计计数（如缓存命中数）以 kind='counter' 输出
+    """
+
+    def __init__(self, name, documentation, callback, labelnames=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = labelnames
+        self.kind = kind
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines += [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+                  for labels, value in self.callback()]
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+ROUTE_LABELS = ('blueprint', 'route', 'method')
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by route', LATENCY_BUCKETS, ROUTE_LABELS
+))
+requests_total = registry.register(Counter(
+    'http_requests_total', 'Requests by route and status code', ROUTE_LABELS + ('status',)
+))
+request_sql_statements = registry.register(Histogram(
+    'http_request_sql_statements', 'SQL statements executed per request', SQL_COUNT_BUCKETS, ROUTE_LABELS
+))
+request_sql_duration = registry.register(Histogram(
+    'http_request_sql_duration_seconds', 'Total SQL execution time per request', LATENCY_BUCKETS, ROUTE_LABELS
+))
+pool_wait = registry.register(Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection', LATENCY_BUCKETS, ('pool',)
+))
+
+
+# ---------- 请求与SQL ----------
+# 当前请求的SQL统计 [语句数, 耗时]：线程、协程各自独立，异步驱动的greenlet复制调用方的上下文，同样计入
+_request_sql = contextvars.ContextVar('request_sql', default=None)
+
+
+def start_request():
+    """
+    请求开始时调用，返回传给 finish_request 的状态
+    """
+    sql = [0, 0.0]
+    _request_sql.set(sql)
+    return time.perf_counter(), sql
+
+
+def finish_request(state, blueprint, route, method, status):
+    started, sql = state
+    labels = (blueprint, route, method)
+    request_duration.observe(time.perf_counter() - started, labels)
+    requests_total.inc(labels + (str(status),))
+    request_sql_statements.observe(sql[0], labels)
+    request_sql_duration.observe(sql[1], labels)
+    _request_sql.set(None)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_statement_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('metrics_statement_start', None)
+    sql = _request_sql.get()
+    if sql is not None and started is not None:
+        sql[0] += 1
+        sql[1] += time.perf_counter() - started
+
+
+# ---------- 连接池 ----------
+class _TimedCheckout:
+    """
+    记录从连接池取得连接的等待时间（连接全部借出时请求在此排队）
+    """
+    pool_label = 'sync'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, (self.pool_label,))
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pool_label = 'sync'
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_label = 'async'
+
+
+def pool_status(pool):
+    """
+    连接池的使用情况，不限制连接数的连接池（如SQLite）返回None
+    saturated 表示连接（含溢出连接）已全部借出，新请求只能等待
+    """
+    if not isinstance(pool, QueuePool):
+        return None
+    max_overflow = max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    return {
+        'size': pool.size(),
+        'max_overflow': max_overflow,
+        'checked_out': checked_out,
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'saturated': checked_out >= pool.size() + max_overflow,
+    }
@@ -21,11 +21,17 @@ class User(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     last_login = db.Column(db.DateTime, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
+    data_version = db.Column(db.BigInteger, nullable=False, default=0)  # 数据版本号，任务或目标每次写入时递增
+    status_changed_at = db.Column(db.DateTime, nullable=True)  # 最近一次启用/停用的时间，各进程据此清除认证缓存
     
     # 定义关系
     tasks = db.relationship('Task', backref='user', lazy=True, cascade="all, delete-orphan")
     goals = db.relationship('Goal', backref='user', lazy=True, cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index('ix_users_status_changed_at', 'status_changed_at'),
+    )
+
 
 # 任务表
 class Task(db.Model):
@@ -53,9 +59,25 @@ class Task(db.Model):
     repeat_count = db.Column(db.Integer, nullable=True)
     parent_task_id = db.Column(db.String(36), nullable=True)
     custom_week_days = db.Column(db.String(20), nullable=True)  # JSON格式
+    tags_text = db.Column(db.Text, nullable=True)  # 标签名以空格连接，仅用于全文搜索，随标签写入维护
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     
-    # 定义关系
-    tags = db.relationship('TaskTag', backref='task', lazy=True, cascade="all, delete-orphan")
+    # 定义关系（只读：任务与标签的关联及标签计数由dao统一写入维护）
+    tags = db.relationship('Tag', secondary='task_tags', lazy=True, viewonly=True, order_by='TaskTag.id')
+
+    # 索引：覆盖任务列表的过滤和排序条件
+    __table_args__ = (
+        db.Index('ix_tasks_user_due_date', 'user_id', 'due_date'),
+        db.Index('ix_tasks_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_tasks_user_completed', 'user_id', 'completed'),
+        db.Index('ix_tasks_user_title', 'user_id', 'title'),
+        db.Index('ix_tasks_goal_completed', 'goal_id', 'completed'),
+        db.Index('ix_tasks_user_updated_at', 'user_id', 'updated_at'),
+        db.Index('ix_tasks_user_repeating_due_date', 'user_id', 'is_repeating', 'due_date'),
+        # 全文索引（MySQL ngram分词，支持中文），写入时由MySQL自动维护
+        db.Index('ix_tasks_fulltext', 'title', 'notes', 'expected_outcome', 'tags_text',
+                 mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+    )
 
 
 # 目标表
@@ -73,20 +95,85 @@ class Goal(db.Model):
     end_date = db.Column(db.DateTime, nullable=True)
     completed = db.Column(db.Boolean, default=False)
     progress = db.Column(db.Integer, default=0)  # 进度(0-100)
+    total_tasks = db.Column(db.Integer, nullable=False, default=0)  # 任务总数（随任务写入增量维护）
+    completed_tasks = db.Column(db.Integer, nullable=False, default=0)  # 已完成任务数
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
     goal_type = db.Column(db.Enum('long_term', 'active', name='goal_type_enum'), default='active')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
     
     # 定义关系
     tasks = db.relationship('Task', backref='goal', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_goals_user_created_at', 'user_id', 'created_at'),
+        db.Index('ix_goals_user_updated_at', 'user_id', 'updated_at'),
+    )
 
-# 任务标签表
+
+# 标签表（每个用户的标签字典）
+class Tag(db.Model):
+    __tablename__ = 'tags'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # MySQL使用二进制排序规则，标签名区分大小写
+    name = db.Column(db.String(50).with_variant(db.String(50, collation='utf8mb4_bin'), 'mysql'), nullable=False)
+    task_count = db.Column(db.Integer, nullable=False, default=0)  # 使用该标签的任务数（随任务写入增量维护）
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_tags_user_name'),
+    )
+
+
+# 任务标签关联表
 class TaskTag(db.Model):
     __tablename__ = 'task_tags'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     task_id = db.Column(db.String(36), db.ForeignKey('tasks.id'), nullable=False)
-    tag_name = db.Column(db.String(50), nullable=False)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tags.id'), nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'tag_id', name='uq_task_tags_task_tag'),
+        # 按标签筛选任务：由标签ID直接得到任务ID，不扫描任务表
+        db.Index('ix_task_tags_tag_task', 'tag_id', 'task_id'),
+    )
+
+
+# 任务每日统计汇总表：按天和维度预聚合，随任务写入增量维护，统计接口只读该表
+class TaskDailyStat(db.Model):
+    __tablename__ = 'task_daily_stats'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # 任务的截止日期，没有截止日期时为创建日期
+    dimension = db.Column(db.String(20), nullable=False)  # all, priority, goal, enthusiasm, difficulty, importance
+    value = db.Column(db.String(36), nullable=False, default='')  # 维度取值（优先级、目标ID、评分），空字符串表示未设置
+    total = db.Column(db.Integer, nullable=False, default=0)  # 任务数
+    completed = db.Column(db.Integer, nullable=False, default=0)  # 已完成任务数
+    estimated_time = db.Column(db.Integer, nullable=False, default=0)  # 预计时间合计（分钟）
+    actual_time = db.Column(db.Integer, nullable=False, default=0)  # 实际时间合计（分钟）
+
+    __table_args__ = (
+        # 统计接口按 (用户, 维度, 日期范围) 读取
+        db.UniqueConstraint('user_id', 'dimension', 'day', 'value', name='uq_task_daily_stats_key'),
+    )
+
+
+# 删除记录表（墓碑，用于增量同步时通知客户端删除）
+class DeletedRecord(db.Model):
+    __tablename__ = 'deleted_records'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    entity_type = db.Column(db.Enum('task', 'goal', name='entity_type_enum'), nullable=False)
+    entity_id = db.Column(db.String(36), nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_deleted_records_user_deleted_at', 'user_id', 'deleted_at'),
+    )
 
 
 # 黑名单令牌表（用于注销和令牌管理）
@@ -94,5 +181,10 @@ class BlacklistedToken(db.Model):
     __tablename__ = 'blacklisted_tokens'
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    token = db.Column(db.String(500), unique=True, nullable=False)
+    token_digest = db.Column(db.String(64), unique=True, nullable=False)  # 令牌的SHA-256摘要
+    expires_at = db.Column(db.DateTime, nullable=False)  # 令牌过期时间(UTC)，过期后记录可清理
     blacklisted_on = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    __table_args__ = (
+        db.Index('ix_blacklisted_tokens_expires_at', 'expires_at'),
+    )
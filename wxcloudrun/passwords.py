@@ -0,0 +1,98 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import config
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+
+class PasswordHasherBusy(Exception):
+    """
+    等待哈希的请求数已达上限
+    """
+
+
+class PasswordHasher:
+    """
+    密码哈希（PBKDF2）在独立的有界线程池中执行：
+    同时进行的哈希数不超过线程数，登录高峰时其余接口仍能分到CPU；
+    排队（含执行中）的请求数超过上限时立即拒绝，不在请求线程中无限等待
+    """
+
+    def __init__(self, algorithm, iterations, workers, max_pending):
+        self.method = f'pbkdf2:{algorithm}:{iterations}'
+        self.workers = workers
+        self.max_pending = max_pending
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.hash_seconds = 0.0
+        self._pending = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+    def _run(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self.wait_seconds += started - submitted
+            try:
+                return func(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self.hash_seconds += time.perf_counter() - started
+
+        try:
+            return self._executor.submit(task).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        存储的哈希（method$salt$hash）与当前配置的算法或迭代次数不同
+        """
+        return password_hash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        with self._lock:
+            completed = self.completed
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'queued': self._pending - self._running,
+                'running': self._running,
+                'completed': completed,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(self.wait_seconds / completed * 1000, 2) if completed else 0.0,
+                'avg_hash_ms': round(self.hash_seconds / completed * 1000, 2) if completed else 0.0,
+            }
+
+
+# 进程内的密码哈希线程池
+password_hasher = PasswordHasher(
+    config.PASSWORD_HASH_ALGORITHM, config.PASSWORD_HASH_ITERATIONS,
+    config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_MAX_PENDING
+)
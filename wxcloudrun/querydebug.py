@@ -0,0 +1,140 @@
+"""
+开发模式的SQL检查（SQL_DEBUG=true，默认随 DEBUG 开启）：
+- 按请求记录执行的SQL，去掉参数值后按语句形状分组，同一形状执行次数达到 SQL_DEBUG_REPEAT_THRESHOLD 时
+  视为可能的 N+1 查询（如在循环中访问懒加载的 Task.tags），记录日志和调用位置
+- 耗时超过 SQL_DEBUG_SLOW_MS 的语句立即记录日志和调用位置
+- 请求的汇总写入响应头 X-SQL-Queries、X-SQL-Time-Ms、X-SQL-Slow、X-SQL-Repeated
+关闭时事件监听只做一次上下文变量读取；查找调用位置需要遍历调用栈，不适合在生产环境开启
+"""
+import contextvars
+import logging
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 一条执行过的SQL：语句形状、耗时（秒）、调用位置
+Statement = namedtuple('Statement', ['shape', 'seconds', 'site'])
+
+# 日志中SQL语句的最大长度
+MAX_LOGGED_SQL = 300
+# X-SQL-Repeated 响应头最多列出的形状数
+MAX_REPEATED_HEADERS = 3
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+_SPACE = re.compile(r'\s+')
+_FORMAT_PARAM = re.compile(r'%\(\w+\)s|%s')  # MySQL驱动的占位符，SQLite为 ?
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+# 当前请求执行过的SQL，未开启或不在请求中时为None
+_statements = contextvars.ContextVar('sql_debug_statements', default=None)
+
+
+def normalize(statement):
+    """
+    去掉参数和字面量后的语句形状：占位符统一为 ?，IN 列表折叠为 (?, ...)，空白合并
+    """
+    shape = _SPACE.sub(' ', statement).strip()
+    shape = _FORMAT_PARAM.sub('?', shape)
+    shape = _STRING.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    return _IN_LIST.sub('(?, ...)', shape)
+
+
+def _call_site(limit=2):
+    """
+    执行SQL的应用代码位置（本包内最近的 limit 层调用，如 "dao.py:120 get_tasks <- tasks.py:80 get_tasks"）
+    异步接口的SQL在greenlet中执行，调用栈中没有应用代码，返回 unknown
+    """
+    frame = sys._getframe(1)
+    sites = []
+    while frame is not None and len(sites) < limit:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_PACKAGE_DIR) and filename != _THIS_FILE:
+            sites.append(f'{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}')
+        frame = frame.f_back
+    return ' <- '.join(sites) or 'unknown'
+
+
+def _truncate(sql):
+    return sql if len(sql) <= MAX_LOGGED_SQL else sql[:MAX_LOGGED_SQL] + '...'
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _statements.get() is not None:
+        conn.info['sql_debug_start'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    started = conn.info.pop('sql_debug_start', None)
+    if statements is None or started is None:
+        return
+    seconds = time.perf_counter() - started
+    site = _call_site()
+    shape = normalize(statement)
+    statements.append(Statement(shape, seconds, site))
+    if seconds * 1000 >= config.SQL_DEBUG_SLOW_MS:
+        logger.warning(f"slow query {seconds * 1000:.1f} ms at {site}: {_truncate(shape)}")
+
+
+def start_request():
+    """
+    请求开始时调用，未开启时返回None
+    """
+    if not config.SQL_DEBUG:
+        return None
+    statements = []
+    _statements.set(statements)
+    return statements
+
+
+def summarize(statements):
+    """
+    返回 (语句数, 总耗时毫秒, 慢查询数, 重复的形状列表)，重复的形状为 (次数, 形状, 调用位置)，按次数从多到少
+    """
+    groups = {}
+    for statement in statements:
+        count, site = groups.get(statement.shape, (0, statement.site))
+        groups[statement.shape] = (count + 1, site)
+    repeated = sorted(
+        ((count, shape, site) for shape, (count, site) in groups.items()
+         if count >= config.SQL_DEBUG_REPEAT_THRESHOLD),
+        key=lambda item: -item[0]
+    )
+    slow = sum(1 for statement in statements if statement.seconds * 1000 >= config.SQL_DEBUG_SLOW_MS)
+    return len(statements), round(sum(statement.seconds for statement in statements) * 1000, 2), slow, repeated
+
+
+def finish_request(statements, method, path):
+    """
+    请求结束时调用，记录可能的 N+1 查询，返回要添加的响应头 [(名称, 值)]
+    """
+    if statements is None:
+        return []
+    _statements.set(None)
+    count, milliseconds, slow, repeated = summarize(statements)
+    for times, shape, site in repeated:
+        logger.warning(f"possible N+1 in {method} {path}: {times} x at {site}: {_truncate(shape)}")
+
+    headers = [('X-SQL-Queries', str(count)), ('X-SQL-Time-Ms', str(milliseconds)), ('X-SQL-Slow', str(slow))]
+    if repeated:
+        headers.append(('X-SQL-Repeated', '; '.join(
+            f'{times}x {site}' for times, _, site in repeated[:MAX_REPEATED_HEADERS]
+        )))
+    return headers
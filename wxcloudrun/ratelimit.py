@@ -0,0 +1,275 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+import jwt
+
+import config
+from wxcloudrun import db
+from wxcloudrun.blacklist import token_digest
+from wxcloudrun.cache import auth_cache
+from wxcloudrun.metrics import pool_status
+from wxcloudrun.utils import JWT_SECRET_KEY
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+# 令牌桶额度：容量（允许突发的请求数）和每秒补充的令牌数
+Budget = namedtuple('Budget', ['capacity', 'rate'])
+
+# 拒绝请求时的结果：状态码、错误信息、建议客户端等待的秒数
+Rejection = namedtuple('Rejection', ['status', 'error', 'retry_after'])
+
+
+def parse_budget(value):
+    """
+    解析 "请求数/秒数" 格式的额度，例如 "10/60" 表示每60秒10个请求，最多连续突发10个
+    """
+    count, _, seconds = value.partition('/')
+    count, seconds = int(count), float(seconds or 1)
+    return Budget(count, count / seconds)
+
+
+class MemoryBackend:
+    """
+    进程内的令牌桶存储（线程安全），每个进程各自计数；桶数超过上限时淘汰最久未使用的桶
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (剩余令牌数, 上次更新时间)
+
+    def take(self, key, budget, cost=1):
+        """
+        补充令牌后取出cost个，返回需要等待的秒数（0表示允许）
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (budget.capacity, now))
+            tokens = min(budget.capacity, tokens + (now - updated) * budget.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / budget.rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    """
+    多个进程、多个实例共享的令牌桶存储，补充和取出令牌在Redis中由Lua脚本原子执行（使用Redis服务器时间）
+    需要另外安装 redis 包
+    """
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    def take(self, key, budget, cost=1):
+        return float(self._script(keys=[self.prefix + key], args=[budget.capacity, budget.rate, cost]))
+
+    def reset(self):
+        for key in self._redis.scan_iter(match=self.prefix + '*'):
+            self._redis.delete(key)
+
+
+def create_backend(name):
+    if name == 'redis':
+        return RedisBackend(config.RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+
+class RateLimiter:
+    """
+    按额度名和调用方（用户或IP）计数的令牌桶限流器，存储后端可替换（需提供 take 和 reset）
+    存储后端出错时放行请求并记录日志，限流不应成为新的故障点
+    """
+
+    def __init__(self, backend, budgets, enabled=True):
+        self.backend = backend
+        self.budgets = budgets
+        self.enabled = enabled
+        self.rejected = Counter()
+
+    def hit(self, budget_name, key):
+        """
+        记录一次请求，返回需要等待的秒数（0表示允许）
+        """
+        try:
+            wait = self.backend.take(f'{budget_name}:{key}', self.budgets[budget_name])
+        except Exception as e:
+            logger.error(f"rate limiter backend error: {e}")
+            return 0.0
+        if wait > 0:
+            self.rejected[budget_name] += 1
+        return wait
+
+    def reset(self):
+        self.backend.reset()
+        self.rejected.clear()
+
+    def stats(self):
+        return {'enabled': self.enabled, 'rejected': dict(self.rejected)}
+
+
+class AdmissionController:
+    """
+    进程内同时处理的请求数上限（0表示不限制）；超过上限或数据库连接池已耗尽时立即拒绝，
+    不让请求排队等待数据库连接（最长 pool_timeout）
+    """
+
+    def __init__(self, max_in_flight, saturated=None):
+        self.max_in_flight = max_in_flight
+        self.saturated = saturated
+        self.in_flight = 0
+        self.shed = 0
+        self._lock = threading.Lock()
+
+    def enter(self, check_saturated=True):
+        saturated = check_saturated and self.saturated is not None and self.saturated()
+        with self._lock:
+            if saturated or (self.max_in_flight and self.in_flight >= self.max_in_flight):
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {'max_in_flight': self.max_in_flight, 'in_flight': self.in_flight, 'shed': self.shed}
+
+
+def db_pool_exhausted():
+    """
+    同步连接池的连接（含溢出连接）已全部借出，新请求只能排队等待
+    """
+    status = pool_status(db.engine.pool)
+    return status is not None and status['saturated']  # SQLite等不限制连接数的连接池返回None
+
+
+# 各额度：login 按IP计数（防止暴力破解），ip 是每个IP所有请求的总额度，其余带令牌时按用户计数
+rate_limiter = RateLimiter(create_backend(config.RATE_LIMIT_BACKEND), {
+    'login': parse_budget(config.RATE_LIMIT_LOGIN),
+    'refresh': parse_budget(config.RATE_LIMIT_REFRESH),
+    'search': parse_budget(config.RATE_LIMIT_SEARCH),
+    'list': parse_budget(config.RATE_LIMIT_LIST),
+    'default': parse_budget(config.RATE_LIMIT_DEFAULT),
+    'ip': parse_budget(config.RATE_LIMIT_IP),
+}, enabled=config.RATE_LIMIT_ENABLED)
+
+admission = AdmissionController(config.ADMISSION_MAX_IN_FLIGHT, saturated=db_pool_exhausted)
+
+# 接口对应的额度：(方法, 路径, 额度名)，按顺序匹配，其余 /api 接口使用 default
+ENDPOINT_BUDGETS = [
+    ('POST', re.compile(r'/api/auth/(login|register)'), 'login'),
+    ('POST', re.compile(r'/api/auth/refresh'), 'refresh'),
+    ('GET', re.compile(r'/api/tasks/search'), 'search'),
+    ('GET', re.compile(r'/api/(tasks|tasks/occurrences|goals|goals/[^/]+/tasks|tags|sync)'), 'list'),
+]
+
+
+def budget_for(method, path):
+    """
+    返回请求使用的额度名，不限流的请求（健康检查、非API路径、CORS预检）返回None
+    """
+    if method == 'OPTIONS' or not path.startswith('/api/') or path == '/api/health':
+        return None
+    for budget_method, pattern, name in ENDPOINT_BUDGETS:
+        if method == budget_method and pattern.fullmatch(path):
+            return name
+    return 'default'
+
+
+def client_ip(forwarded_for, remote_addr):
+    """
+    客户端IP：云托管经网关转发，取 X-Forwarded-For 的最后一项（由网关追加，客户端无法伪造）
+    """
+    if forwarded_for:
+        return forwarded_for.rsplit(',', 1)[-1].strip()
+    return remote_addr or 'unknown'
+
+
+def _token_subject(auth_header):
+    """
+    从签名有效的令牌中取出用户ID作为计数键，无效时返回None（按IP计数）
+    认证缓存中已有该令牌时直接使用缓存的载荷（已验证过签名），否则校验签名和有效期（不查询数据库）
+    """
+    if not auth_header or ' ' not in auth_header:
+        return None
+    token = auth_header.split(' ', 1)[1]
+    cached = auth_cache.peek(token_digest(token))
+    if cached:
+        return cached[0].get('sub')
+    try:
+        return jwt.decode(token, JWT_SECRET_KEY, algorithms=['HS256']).get('sub')
+    except jwt.InvalidTokenError:
+        return None
+
+
+def check_rate_limit(method, path, auth_header, ip):
+    """
+    按接口额度和调用方计数，超过额度时返回 Rejection(429)，否则返回None
+    """
+    budget = budget_for(method, path)
+    if budget is None or not rate_limiter.enabled:
+        return None
+
+    subject = None if budget == 'login' else _token_subject(auth_header)
+    waits = [rate_limiter.hit('ip', ip), rate_limiter.hit(budget, f'user:{subject}' if subject else f'ip:{ip}')]
+    wait = max(waits)
+    if wait > 0:
+        return Rejection(429, {'message': 'Too many requests', 'code': 'rate_limited'}, math.ceil(wait))
+    return None
+
+
+def admit(method, path, auth_header, ip, check_db_pool=True):
+    """
+    请求准入：过载时返回503，超过额度时返回429，返回 (是否占用了并发名额, 拒绝结果或None)
+    占用名额的请求处理完后需调用 admission.leave()
+    """
+    if budget_for(method, path) is None:
+        return False, None
+    if not admission.enter(check_db_pool):
+        return False, Rejection(503, {'message': 'Server busy, please retry later', 'code': 'server_busy'}, 1)
+    rejection = check_rate_limit(method, path, auth_header, ip)
+    if rejection:
+        admission.leave()
+        return False, rejection
+    return True, None
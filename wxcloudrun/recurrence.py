@@ -0,0 +1,128 @@
+import json
+from calendar import monthrange
+from collections import namedtuple
+from datetime import timedelta
+
+# 重复规则
+# start: 第一次发生的时间（任务的截止时间），frequency: daily/weekly/monthly/yearly/custom
+# interval: 间隔（天/周/月/年），until: 结束时间（含），count: 总次数（含第一次）
+# week_days: custom 规则每周发生的星期几，与客户端 JS Date.getDay() 一致（0=周日 … 6=周六）
+RecurrenceRule = namedtuple('RecurrenceRule', ['start', 'frequency', 'interval', 'until', 'count', 'week_days'])
+
+# 一次发生：index为第几次（从0开始），start为发生时间
+Occurrence = namedtuple('Occurrence', ['index', 'start'])
+
+FREQUENCIES = ('daily', 'weekly', 'monthly', 'yearly', 'custom')
+
+
+def rule_from_task(task):
+    """
+    由任务的重复字段构造重复规则，任务不重复或字段无效时返回None
+    """
+    if not task.is_repeating or not task.due_date or task.repeat_frequency not in FREQUENCIES:
+        return None
+
+    week_days = ()
+    if task.repeat_frequency == 'custom':
+        try:
+            week_days = tuple(sorted({int(day) for day in json.loads(task.custom_week_days or '[]') if 0 <= int(day) <= 6}))
+        except (TypeError, ValueError):
+            week_days = ()
+        if not week_days:
+            return None
+
+    return RecurrenceRule(
+        start=task.due_date,
+        frequency=task.repeat_frequency,
+        interval=max(task.repeat_interval or 1, 1),
+        until=task.repeat_end_date,
+        count=task.repeat_count if task.repeat_count and task.repeat_count > 0 else None,
+        week_days=week_days
+    )
+
+
+def _js_weekday(moment):
+    return (moment.weekday() + 1) % 7
+
+
+def _add_months(moment, months, day):
+    # 目标月份没有这一天时取该月最后一天（如1月31日每月重复，2月取28/29日）
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(day, monthrange(year, month)[1]))
+
+
+def _nth(rule, index):
+    """
+    固定周期规则的第index次发生时间（每次都从起始时间计算，月末截断不会累积）
+    """
+    step = index * rule.interval
+    if rule.frequency == 'daily':
+        return rule.start + timedelta(days=step)
+    if rule.frequency == 'weekly':
+        return rule.start + timedelta(weeks=step)
+    if rule.frequency == 'monthly':
+        return _add_months(rule.start, step, rule.start.day)
+    return _add_months(rule.start, 12 * step, rule.start.day)
+
+
+def _first_index_at_or_after(rule, moment):
+    # 按平均周期估算后再逐步修正，跳过窗口之前的发生，不逐个生成
+    if moment <= rule.start:
+        return 0
+    if rule.frequency in ('daily', 'weekly'):
+        period = timedelta(days=rule.interval * (1 if rule.frequency == 'daily' else 7))
+        index = -((rule.start - moment) // period)  # 向上取整
+    else:
+        months = (moment.year - rule.start.year) * 12 + moment.month - rule.start.month
+        months_per_step = rule.interval * (1 if rule.frequency == 'monthly' else 12)
+        index = max(months // months_per_step - 1, 0)
+    while index > 0 and _nth(rule, index - 1) >= moment:
+        index -= 1
+    while _nth(rule, index) < moment:
+        index += 1
+    return index
+
+
+def _iter_fixed(rule, window_start):
+    index = _first_index_at_or_after(rule, window_start)
+    while True:
+        yield Occurrence(index, _nth(rule, index))
+        index += 1
+
+
+def _iter_custom(rule, window_start):
+    # 以起始时间所在的周（周日开始）为第0周，每 interval 周在指定的星期几发生，早于起始时间的不算
+    week_zero = rule.start - timedelta(days=_js_weekday(rule.start))
+    first_week = [day for day in rule.week_days if day >= _js_weekday(rule.start)]
+    per_week = len(rule.week_days)
+
+    # 直接跳到窗口所在的周期
+    cycle = max((window_start - week_zero).days // (7 * rule.interval), 0)
+    while True:
+        if cycle == 0:
+            days, index = first_week, 0
+        else:
+            days, index = rule.week_days, len(first_week) + (cycle - 1) * per_week
+        week_start = week_zero + timedelta(weeks=cycle * rule.interval)
+        for day in days:
+            yield Occurrence(index, week_start + timedelta(days=day))
+            index += 1
+        cycle += 1
+
+
+def occurrences_between(rule, window_start, window_end):
+    """
+    惰性生成规则在 [window_start, window_end) 内的发生，遵守次数和结束时间限制
+    窗口之前的发生通过计算直接跳过，不会逐个生成
+    """
+    iterator = _iter_custom(rule, window_start) if rule.frequency == 'custom' else _iter_fixed(rule, window_start)
+    for occurrence in iterator:
+        if occurrence.start >= window_end:
+            return
+        if rule.count is not None and occurrence.index >= rule.count:
+            return
+        if rule.until is not None and occurrence.start > rule.until:
+            return
+        if occurrence.start >= window_start:
+            yield occurrence
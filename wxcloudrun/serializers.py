@@ -0,0 +1,144 @@
+import json
+import logging
+from datetime import date
+from functools import lru_cache
+from operator import attrgetter
+
+from flask import Response
+
+import config
+
+# 初始化日志
+logger = logging.getLogger('log')
+
+
+# ========== 编码后端 ==========
+def _default(value):
+    # 标准库编码器不支持的类型：日期时间输出为ISO 8601格式，与orjson一致
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _stdlib_dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _load_orjson():
+    try:
+        import orjson
+    except ImportError:
+        return None
+    # 非字符串的字典键（如整数）转换为字符串，与标准库行为一致
+    return lambda data: orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+# 可用的编码后端：名称 -> 函数(数据) -> UTF-8 编码的 JSON 字节串
+BACKENDS = {'json': _stdlib_dumps}
+_orjson_dumps = _load_orjson()
+if _orjson_dumps:
+    BACKENDS['orjson'] = _orjson_dumps
+
+_backend_name = None
+_dumps = None
+
+
+def set_backend(name=None):
+    """
+    选择JSON编码后端，缺省时优先使用orjson，未安装时回退到标准库json
+    """
+    global _backend_name, _dumps
+    if not name:
+        name = 'orjson' if 'orjson' in BACKENDS else 'json'
+    if name not in BACKENDS:
+        logger.warning(f"JSON backend {name} is not available, falling back to json")
+        name = 'json'
+    _backend_name, _dumps = name, BACKENDS[name]
+    return name
+
+
+def get_backend():
+    return _backend_name
+
+
+def dumps(data):
+    """
+    将数据编码为 UTF-8 JSON 字节串，日期时间输出为 ISO 8601 格式
+    """
+    return _dumps(data)
+
+
+def jsonify(data):
+    """
+    返回JSON响应，与 flask.jsonify(data) 用法相同，使用当前编码后端
+    """
+    return Response(dumps(data), mimetype='application/json')
+
+
+set_backend(config.JSON_BACKEND)
+
+
+# ========== 模型序列化 ==========
+class ModelSerializer:
+    """
+    按预先确定的字段计划把模型对象转换为可编码的字典
+    - fields: 直接输出的属性，用一次 attrgetter 批量取值
+    - computed: [(字段名, 函数(对象))]，需要转换的字段
+    日期时间保持原值，由编码后端输出为 ISO 8601 字符串
+    """
+
+    def __init__(self, fields, computed=()):
+        self.fields = tuple(fields)
+        self.computed = tuple(computed)
+        self._getter = attrgetter(*self.fields)
+
+    def __call__(self, obj):
+        data = dict(zip(self.fields, self._getter(obj)))
+        for name, func in self.computed:
+            data[name] = func(obj)
+        return data
+
+    def many(self, objs):
+        return [self(obj) for obj in objs]
+
+
+@lru_cache(maxsize=1024)
+def _parse_week_days(raw):
+    # 取值种类很少（星期组合），缓存解析结果；返回元组避免被调用方修改
+    try:
+        return tuple(json.loads(raw))
+    except (TypeError, ValueError):
+        return ()
+
+
+def _task_tags(task):
+    return [tag.name for tag in task.tags]
+
+
+def _task_week_days(task):
+    return _parse_week_days(task.custom_week_days) if task.custom_week_days else None
+
+
+task_serializer = ModelSerializer(
+    fields=(
+        'id', 'title', 'goal_id', 'completed', 'due_date', 'priority', 'estimated_time', 'actual_time',
+        'created_at', 'notes', 'expected_outcome', 'enthusiasm', 'difficulty', 'importance',
+        'is_repeating', 'repeat_frequency', 'repeat_interval', 'repeat_end_date', 'repeat_count',
+        'parent_task_id', 'updated_at'
+    ),
+    computed=(
+        ('tags', _task_tags),
+        ('custom_week_days', _task_week_days)
+    )
+)
+
+goal_serializer = ModelSerializer(
+    fields=(
+        'id', 'title', 'description', 'category', 'color', 'icon', 'start_date', 'end_date', 'completed',
+        'progress', 'total_tasks', 'completed_tasks', 'created_at', 'goal_type', 'updated_at'
+    )
+)
+
+user_serializer = ModelSerializer(fields=('id', 'username', 'email', 'created_at'))
+
+tag_serializer = ModelSerializer(fields=('id', 'name', 'task_count'))
@@ -0,0 +1,101 @@
+from flask import Blueprint, request
+from datetime import date, timedelta
+
+from wxcloudrun.dao import get_task_stats, STATS_COUNTERS, STATS_MAX_DAYS
+from wxcloudrun.utils import token_required
+from wxcloudrun.serializers import jsonify
+
+# 创建蓝图
+stats_bp = Blueprint('stats', __name__, url_prefix='/api/stats')
+
+# 未指定范围时统计最近30天
+DEFAULT_STATS_DAYS = 30
+
+# 各维度分组的排列顺序：优先级按高到低，评分按从低到高，目标按任务数从多到少
+PRIORITY_ORDER = {'high': 0, 'medium': 1, 'low': 2}
+
+def _summary(counts):
+    """
+    由 [任务数, 已完成数, 预计时间, 实际时间] 生成统计结果，没有任务时完成率为null
+    """
+    summary = dict(zip(STATS_COUNTERS, (int(count or 0) for count in counts)))
+    summary['completion_rate'] = round(summary['completed'] / summary['total'], 4) if summary['total'] else None
+    return summary
+
+def _period_start(day, group):
+    return day - timedelta(days=day.weekday()) if group == 'week' else day
+
+def _series(days, start, end, group):
+    """
+    按天或按周（周一开始）合计，范围内没有任务的时间段补零，便于客户端直接绘图
+    """
+    periods = {}
+    day = _period_start(start, group)
+    while day <= end:
+        periods[day] = [0] * len(STATS_COUNTERS)
+        day += timedelta(days=7 if group == 'week' else 1)
+    for row in days:
+        counts = periods[_period_start(row[0], group)]
+        for i, count in enumerate(row[1:]):
+            counts[i] += count
+    return [dict(period=period.isoformat(), **_summary(counts)) for period, counts in periods.items()]
+
+def _breakdown(rows, dimension):
+    """
+    某个维度各取值的合计，未设置的取值（如没有关联目标）key为null
+    """
+    items = []
+    for row_dimension, value, *counts in rows:
+        if row_dimension != dimension or not counts[0]:
+            continue
+        key = value or None
+        if key is not None and dimension in ('enthusiasm', 'difficulty', 'importance'):
+            key = int(key)
+        items.append(dict(key=key, **_summary(counts)))
+
+    if dimension == 'priority':
+        items.sort(key=lambda item: PRIORITY_ORDER.get(item['key'], len(PRIORITY_ORDER)))
+    elif dimension == 'goal':
+        items.sort(key=lambda item: (-item['total'], item['key'] or ''))
+    else:
+        items.sort(key=lambda item: (item['key'] is None, item['key'] or 0))
+    return items
+
+@stats_bp.route('', methods=['GET'])
+@token_required
+def get_stats(current_user):
+    """
+    任务统计：[from, to] 日期范围内（默认最近30天，最长366天）按天或按周的完成率、预计与实际用时，
+    以及按优先级、目标、热情度、困难度、重要性的分组合计
+    任务按截止日期计入（没有截止日期时按创建日期），数据来自随任务写入维护的每日汇总
+    """
+    group = request.args.get('group', 'day')
+    if group not in ('day', 'week'):
+        return jsonify({'error': {'message': 'group must be day or week', 'code': 'invalid_group'}}), 400
+    try:
+        end = date.fromisoformat(request.args['to']) if request.args.get('to') else date.today()
+        start = date.fromisoformat(request.args['from']) if request.args.get('from') \
+            else end - timedelta(days=DEFAULT_STATS_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': {'message': 'from and to must be dates (YYYY-MM-DD)', 'code': 'invalid_date'}}), 400
+    if end < start or (end - start).days >= STATS_MAX_DAYS:
+        return jsonify({'error': {'message': f'Invalid range, at most {STATS_MAX_DAYS} days', 'code': 'invalid_range'}}), 400
+
+    stats = get_task_stats(current_user.id, start, end)
+    if stats is None:
+        return jsonify({'error': {'message': 'Failed to load stats', 'code': 'stats_failed'}}), 500
+    days, breakdown = stats
+
+    totals = [sum(row[i + 1] for row in days) for i in range(len(STATS_COUNTERS))]
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'group': group,
+        'totals': _summary(totals),
+        'series': _series(days, start, end, group),
+        'by_priority': _breakdown(breakdown, 'priority'),
+        'by_goal': _breakdown(breakdown, 'goal'),
+        'by_enthusiasm': _breakdown(breakdown, 'enthusiasm'),
+        'by_difficulty': _breakdown(breakdown, 'difficulty'),
+        'by_importance': _breakdown(breakdown, 'importance'),
+    }), 200
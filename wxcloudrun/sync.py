@@ -0,0 +1,39 @@
+from flask import Blueprint, request
+
+from wxcloudrun.dao import get_changes_since, decode_sync_token
+from wxcloudrun.utils import token_required, format_task, format_goal
+from wxcloudrun.serializers import jsonify
+
+# 创建蓝图
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+@sync_bp.route('', methods=['GET'])
+@token_required
+def sync(current_user):
+    """
+    增量同步
+    返回自上次同步以来变更的任务（含标签）、目标以及被删除的任务和目标ID
+    首次同步（不带since）或同步令牌过期时返回全量数据，此时full为true，客户端应替换本地数据
+    """
+    since = None
+    token = request.args.get('since')
+    if token:
+        try:
+            since = decode_sync_token(token)
+        except ValueError:
+            return jsonify({'error': {'message': 'Invalid sync token', 'code': 'invalid_sync_token'}}), 400
+    
+    changes = get_changes_since(current_user.id, since)
+    if changes is None:
+        return jsonify({'error': {'message': 'Failed to sync', 'code': 'sync_failed'}}), 500
+    
+    return jsonify({
+        'tasks': [format_task(task) for task in changes['tasks']],
+        'goals': [format_goal(goal) for goal in changes['goals']],
+        'deleted': {
+            'tasks': changes['deleted_tasks'],
+            'goals': changes['deleted_goals']
+        },
+        'full': changes['full'],
+        'sync_token': changes['sync_token']
+    }), 200
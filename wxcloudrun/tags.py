@@ -0,0 +1,18 @@
+from flask import Blueprint
+
+from wxcloudrun.dao import get_tags_by_user_id
+from wxcloudrun.utils import token_required, conditional_by_data_version
+from wxcloudrun.serializers import jsonify, tag_serializer
+
+# 创建蓝图
+tags_bp = Blueprint('tags', __name__, url_prefix='/api/tags')
+
+@tags_bp.route('', methods=['GET'])
+@token_required
+@conditional_by_data_version
+def get_tags(current_user):
+    """
+    获取用户正在使用的标签及各自的任务数
+    任务数由任务写入时增量维护，读取时不统计任务表
+    """
+    return jsonify({'tags': tag_serializer.many(get_tags_by_user_id(current_user.id))}), 200
@@ -1,33 +1,95 @@
-from flask import Blueprint, request, jsonify
-from datetime import datetime
+from flask import Blueprint, request
+from datetime import datetime, timedelta
 import json
 
 from wxcloudrun.dao import (
-    get_tasks_by_user_id, get_task_by_id, create_task, 
-    update_task, delete_task, toggle_task_complete
+    get_tasks_page, iter_task_chunks, get_task_by_id, create_task, 
+    update_task, patch_task, delete_task, toggle_task_complete,
+    apply_task_batch, get_repeating_tasks_in_range, search_tasks, normalize_tag_names,
+    MAX_BATCH_OPERATIONS, SEARCH_MIN_LENGTH
 )
-from wxcloudrun.utils import token_required, format_task
+from wxcloudrun.utils import (
+    token_required, conditional_by_data_version, format_task,
+    get_page_args, make_page_response, is_stream_request, make_stream_response
+)
+from wxcloudrun.serializers import jsonify, task_serializer
+from wxcloudrun.recurrence import rule_from_task, occurrences_between
 
 # 创建蓝图
 tasks_bp = Blueprint('tasks', __name__, url_prefix='/api/tasks')
 
+# 批量接口支持的操作类型
+BATCH_OPERATIONS = ('create', 'update', 'delete', 'toggle')
+
+# 重复任务展开的最大时间窗口
+MAX_OCCURRENCE_RANGE = timedelta(days=366)
+
+# 按标签筛选时最多允许的标签数
+MAX_TAG_FILTERS = 20
+
+def parse_tag_filter(args):
+    """
+    读取按标签筛选的参数 tag（可重复）和 tag_mode，返回 (标签列表, 是否要求包含全部标签, 错误信息)
+    """
+    tags = normalize_tag_names(args.getlist('tag'))
+    tag_mode = args.get('tag_mode', 'all')
+    if tag_mode not in ('all', 'any'):
+        return None, None, {'message': 'tag_mode must be all or any', 'code': 'invalid_tag_mode'}
+    if len(tags) > MAX_TAG_FILTERS:
+        return None, None, {'message': f'At most {MAX_TAG_FILTERS} tags', 'code': 'too_many_tags'}
+    return tags, tag_mode == 'all', None
+
+def parse_task_dates(data):
+    """
+    将任务数据中的日期字段解析为datetime，格式错误时返回错误信息
+    """
+    for field in ('due_date', 'repeat_end_date'):
+        if field in data and data[field]:
+            try:
+                data[field] = datetime.fromisoformat(data[field].replace('Z', '+00:00'))
+            except (ValueError, AttributeError):
+                return {'message': f'Invalid {field} format', 'code': 'invalid_date'}
+    return None
+
 @tasks_bp.route('', methods=['GET'])
 @token_required
+@conditional_by_data_version
 def get_tasks(current_user):
     """
     获取所有任务
-    支持过滤、排序和按目标筛选
+    支持过滤、排序、按目标筛选、按标签筛选和游标分页（limit, cursor）
+    tag 可重复传入多个标签，tag_mode=all（默认）要求包含全部标签，tag_mode=any 包含任一标签即可
+    stream=1 时分块读取并流式返回全部任务（从cursor位置开始），内存占用不随任务数量增长
     """
     # 获取查询参数
     filter_type = request.args.get('filter', 'all')
     sort_by = request.args.get('sort')
     goal_id = request.args.get('goal_id')
+    tags, match_all, error = parse_tag_filter(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if is_stream_request():
+        try:
+            chunks = iter_task_chunks(
+                current_user.id, filter_type, goal_id, sort_by, request.args.get('cursor'),
+                tags=tags, match_all=match_all
+            )
+        except ValueError:
+            return jsonify({'error': {'message': 'Invalid cursor', 'code': 'invalid_page'}}), 400
+        return make_stream_response(chunks, task_serializer), 200
     
     # 获取任务列表
-    tasks = get_tasks_by_user_id(current_user.id, filter_type, goal_id, sort_by)
+    try:
+        limit, cursor = get_page_args()
+        tasks, next_cursor = get_tasks_page(
+            current_user.id, filter_type, goal_id, sort_by, limit, cursor, tags=tags, match_all=match_all
+        )
+    except ValueError:
+        return jsonify({'error': {'message': 'Invalid limit or cursor', 'code': 'invalid_page'}}), 400
     
     # 格式化响应
-    return jsonify([format_task(task) for task in tasks]), 200
+    return make_page_response([format_task(task) for task in tasks], next_cursor), 200
 
 @tasks_bp.route('', methods=['POST'])
 @token_required
@@ -42,17 +104,9 @@ def add_task(current_user):
         return jsonify({'error': {'message': 'Title is required', 'code': 'missing_title'}}), 400
     
     # 处理日期字段
-    if 'due_date' in data and data['due_date']:
-        try:
-            data['due_date'] = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid due_date format', 'code': 'invalid_date'}}), 400
-    
-    if 'repeat_end_date' in data and data['repeat_end_date']:
-        try:
-            data['repeat_end_date'] = datetime.fromisoformat(data['repeat_end_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid repeat_end_date format', 'code': 'invalid_date'}}), 400
+    error = parse_task_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # 创建任务
     task = create_task(data, current_user.id)
@@ -63,6 +117,57 @@ def add_task(current_user):
     # 返回创建的任务
     return jsonify(format_task(task)), 201
 
+@tasks_bp.route('/search', methods=['GET'])
+@token_required
+@conditional_by_data_version
+def search_tasks_route(current_user):
+    """
+    搜索任务标题、备注、期望成果和标签，按相关度排序，支持游标分页（limit, cursor）
+    """
+    q = request.args.get('q', '').strip()
+    if len(q) < SEARCH_MIN_LENGTH:
+        return jsonify({'error': {'message': f'Query must be at least {SEARCH_MIN_LENGTH} characters', 'code': 'query_too_short'}}), 400
+    
+    try:
+        limit, cursor = get_page_args()
+        tasks, next_cursor = search_tasks(current_user.id, q, limit, cursor)
+    except ValueError:
+        return jsonify({'error': {'message': 'Invalid limit or cursor', 'code': 'invalid_page'}}), 400
+    
+    return make_page_response([format_task(task) for task in tasks], next_cursor), 200
+
+@tasks_bp.route('/occurrences', methods=['GET'])
+@token_required
+@conditional_by_data_version
+def get_task_occurrences(current_user):
+    """
+    展开重复任务在 [from, to) 时间窗口内的每次发生，窗口最长366天
+    一次查询取出候选的重复任务，在内存中按重复规则生成窗口内的发生时间
+    """
+    try:
+        start = datetime.fromisoformat(request.args['from'].replace('Z', '+00:00')).replace(tzinfo=None)
+        end = datetime.fromisoformat(request.args['to'].replace('Z', '+00:00')).replace(tzinfo=None)
+    except (KeyError, ValueError):
+        return jsonify({'error': {'message': 'from and to must be ISO dates', 'code': 'invalid_date'}}), 400
+    if end <= start or end - start > MAX_OCCURRENCE_RANGE:
+        return jsonify({'error': {'message': 'Invalid range, at most 366 days', 'code': 'invalid_range'}}), 400
+    
+    tasks, occurrences = [], []
+    for task in get_repeating_tasks_in_range(current_user.id, start, end):
+        rule = rule_from_task(task)
+        if not rule:
+            continue
+        found = [
+            {'task_id': task.id, 'index': occurrence.index, 'due_date': occurrence.start}
+            for occurrence in occurrences_between(rule, start, end)
+        ]
+        if found:
+            tasks.append(format_task(task))
+            occurrences.extend(found)
+    
+    occurrences.sort(key=lambda occurrence: (occurrence['due_date'], occurrence['task_id']))
+    return jsonify({'tasks': tasks, 'occurrences': occurrences}), 200
+
 @tasks_bp.route('/<task_id>', methods=['GET'])
 @token_required
 def get_task(current_user, task_id):
@@ -89,17 +194,9 @@ def update_task_route(current_user, task_id):
         return jsonify({'error': {'message': 'No data provided', 'code': 'missing_data'}}), 400
     
     # 处理日期字段
-    if 'due_date' in data and data['due_date']:
-        try:
-            data['due_date'] = datetime.fromisoformat(data['due_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid due_date format', 'code': 'invalid_date'}}), 400
-    
-    if 'repeat_end_date' in data and data['repeat_end_date']:
-        try:
-            data['repeat_end_date'] = datetime.fromisoformat(data['repeat_end_date'].replace('Z', '+00:00'))
-        except ValueError:
-            return jsonify({'error': {'message': 'Invalid repeat_end_date format', 'code': 'invalid_date'}}), 400
+    error = parse_task_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     # 更新任务
     task = update_task(task_id, data, current_user.id)
@@ -109,6 +206,35 @@ def update_task_route(current_user, task_id):
     
     return jsonify(format_task(task)), 200
 
+@tasks_bp.route('/<task_id>', methods=['PATCH'])
+@token_required
+def patch_task_route(current_user, task_id):
+    """
+    按差异更新任务：只修改请求中给出且值发生变化的字段，tags 给出时替换为该列表
+    没有任何变化时不写数据库，更新时间保持不变
+    """
+    data = request.get_json(silent=True)
+    
+    # 验证请求数据
+    if not isinstance(data, dict):
+        return jsonify({'error': {'message': 'No data provided', 'code': 'missing_data'}}), 400
+    if 'title' in data and not data['title']:
+        return jsonify({'error': {'message': 'Title is required', 'code': 'missing_title'}}), 400
+    if 'tags' in data and not isinstance(data['tags'], (list, type(None))):
+        return jsonify({'error': {'message': 'Tags must be a list', 'code': 'invalid_tags'}}), 400
+    
+    # 处理日期字段
+    error = parse_task_dates(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    task = patch_task(task_id, data, current_user.id)
+    
+    if not task:
+        return jsonify({'error': {'message': 'Task not found', 'code': 'task_not_found'}}), 404
+    
+    return jsonify(format_task(task)), 200
+
 @tasks_bp.route('/<task_id>', methods=['DELETE'])
 @token_required
 def delete_task_route(current_user, task_id):
@@ -133,4 +259,71 @@ def toggle_complete(current_user, task_id):
     if not task:
         return jsonify({'error': {'message': 'Task not found', 'code': 'task_not_found'}}), 404
     
-    return jsonify(format_task(task)), 200 
\ No newline at end of file
+    return jsonify(format_task(task)), 200
+
+@tasks_bp.route('/batch', methods=['POST'])
+@token_required
+def batch_tasks(current_user):
+    """
+    批量创建、更新、删除、切换完成状态，所有操作在一个事务中执行
+    请求体: {"operations": [{"op": "create", "data": {...}}, {"op": "update", "id": "...", "data": {...}},
+                            {"op": "delete", "id": "..."}, {"op": "toggle", "id": "..."}]}
+    响应按请求顺序返回每个操作的结果，参数错误或任务不存在的操作不影响其他操作
+    """
+    data = request.get_json()
+    
+    # 验证请求数据
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': {'message': 'Operations are required', 'code': 'missing_operations'}}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': {'message': f'At most {MAX_BATCH_OPERATIONS} operations per batch', 'code': 'batch_too_large'}}), 400
+    
+    # 逐项校验，无效的操作直接返回错误
+    results = {}
+    valid = []
+    for index, item in enumerate(operations):
+        op = item.get('op') if isinstance(item, dict) else None
+        if op not in BATCH_OPERATIONS:
+            results[index] = {'status': 'error', 'code': 'invalid_operation', 'message': 'Invalid operation'}
+            continue
+        
+        task_data = item.get('data') or {}
+        if op in ('create', 'update') and not isinstance(task_data, dict):
+            results[index] = {'status': 'error', 'code': 'missing_data', 'message': 'No data provided'}
+            continue
+        if op == 'create' and not task_data.get('title'):
+            results[index] = {'status': 'error', 'code': 'missing_title', 'message': 'Title is required'}
+            continue
+        if op != 'create' and not item.get('id'):
+            results[index] = {'status': 'error', 'code': 'missing_id', 'message': 'Task id is required'}
+            continue
+        if 'tags' in task_data and not isinstance(task_data['tags'], (list, type(None))):
+            results[index] = {'status': 'error', 'code': 'invalid_tags', 'message': 'Tags must be a list'}
+            continue
+        
+        error = parse_task_dates(task_data)
+        if error:
+            results[index] = dict(error, status='error')
+            continue
+        
+        valid.append({'index': index, 'op': op, 'id': item.get('id'), 'data': task_data})
+    
+    # 执行有效的操作
+    tasks = []
+    if valid:
+        applied, tasks = apply_task_batch(valid, current_user.id)
+        if applied is None:
+            return jsonify({'error': {'message': 'Failed to apply batch', 'code': 'batch_failed'}}), 500
+        results.update(applied)
+    
+    # 返回结果，成功的新建、更新和切换操作附带任务最新数据
+    tasks_by_id = {task.id: format_task(task) for task in tasks}
+    response = []
+    for index, item in enumerate(operations):
+        result = dict(results[index], index=index, op=item.get('op') if isinstance(item, dict) else None)
+        if result['status'] == 'ok' and result['id'] in tasks_by_id:
+            result['task'] = tasks_by_id[result['id']]
+        response.append(result)
+    
+    return jsonify({'results': response}), 200
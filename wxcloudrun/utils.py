@@ -1,14 +1,19 @@
 import os
 import jwt
 import datetime
+import time
 import uuid
-import json
+import hashlib
+from collections import namedtuple
 from functools import wraps
-from flask import request, jsonify
+from flask import request, make_response, Response, stream_with_context
 import logging
-from werkzeug.security import generate_password_hash, check_password_hash
 
-from wxcloudrun.dao import get_user_by_id, is_token_blacklisted
+from wxcloudrun.dao import get_user_by_id, get_data_version, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from wxcloudrun.blacklist import is_token_revoked, token_blacklist, token_digest
+from wxcloudrun.cache import auth_cache
+from wxcloudrun.passwords import password_hasher
+from wxcloudrun.serializers import dumps, jsonify, task_serializer, goal_serializer, user_serializer
 
 # 初始化日志
 logger = logging.getLogger('log')
@@ -20,15 +25,21 @@ JWT_REFRESH_TOKEN_EXPIRES = datetime.timedelta(days=7)
 
 def hash_password(password):
     """
-    对密码进行哈希处理
+    对密码进行哈希处理（在密码哈希线程池中执行，排队已满时抛出PasswordHasherBusy）
     """
-    return generate_password_hash(password)
+    return password_hasher.hash(password)
 
 def check_password(password_hash, password):
     """
-    验证密码是否匹配
+    验证密码是否匹配（在密码哈希线程池中执行，排队已满时抛出PasswordHasherBusy）
     """
-    return check_password_hash(password_hash, password)
+    return password_hasher.check(password_hash, password)
+
+def password_needs_rehash(password_hash):
+    """
+    存储的密码哈希是否使用了旧的算法或迭代次数
+    """
+    return password_hasher.needs_rehash(password_hash)
 
 def generate_access_token(user_id):
     """
@@ -38,7 +49,8 @@ def generate_access_token(user_id):
         'exp': datetime.datetime.utcnow() + JWT_ACCESS_TOKEN_EXPIRES,
         'iat': datetime.datetime.utcnow(),
         'sub': user_id,
-        'type': 'access'
+        'type': 'access',
+        'jti': uuid.uuid4().hex  # 保证同一秒内签发的令牌也互不相同
     }
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm='HS256')
 
@@ -50,7 +62,8 @@ def generate_refresh_token(user_id):
         'exp': datetime.datetime.utcnow() + JWT_REFRESH_TOKEN_EXPIRES,
         'iat': datetime.datetime.utcnow(),
         'sub': user_id,
-        'type': 'refresh'
+        'type': 'refresh',
+        'jti': uuid.uuid4().hex  # 保证同一秒内签发的令牌也互不相同
     }
     return jwt.encode(payload, JWT_SECRET_KEY, algorithm='HS256')
 
@@ -60,7 +73,7 @@ def decode_token(token):
     """
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=['HS256'])
-        if is_token_blacklisted(token):
+        if is_token_revoked(token):
             return None
         return payload
     except jwt.ExpiredSignatureError:
@@ -68,40 +81,82 @@ def decode_token(token):
     except jwt.InvalidTokenError:
         return None
 
-def token_required(f):
+# 认证通过后传给视图函数的精简用户信息
+AuthUser = namedtuple('AuthUser', ['id', 'username', 'email', 'created_at', 'is_active'])
+
+def check_token(auth_header, token_type):
     """
-    用于验证访问令牌的装饰器
+    验证Authorization头中的令牌，返回 (用户, 错误信息)，错误信息为 {'message', 'code'}（HTTP 401）
+    已验证的令牌载荷和用户信息按令牌摘要缓存，缓存命中时不访问数据库；
+    命中时仍检查进程内黑名单过滤器，其他进程的注销在刷新间隔（TOKEN_BLACKLIST_REFRESH_SECONDS）内生效；
+    用户的启用/停用（set_user_active）同样在黑名单刷新时清除其他进程的缓存，在刷新间隔内生效；
+    不经过 set_user_active 直接修改数据库中的 is_active 时，最多在认证缓存有效期（AUTH_CACHE_TTL_SECONDS）内生效
     """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = None
-        
-        # 从Authorization头中获取令牌
-        auth_header = request.headers.get('Authorization')
-        if auth_header:
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'error': {'message': 'Token is missing', 'code': 'token_missing'}}), 401
-        
-        if not token:
-            return jsonify({'error': {'message': 'Token is missing', 'code': 'token_missing'}}), 401
-        
+    token = None
+    
+    # 从Authorization头中获取令牌
+    if auth_header:
+        try:
+            token = auth_header.split(" ")[1]
+        except IndexError:
+            return None, {'message': 'Token is missing', 'code': 'token_missing'}
+    
+    if not token:
+        return None, {'message': 'Token is missing', 'code': 'token_missing'}
+    
+    digest = token_digest(token)
+    # 先按间隔刷新黑名单，其他进程停用用户时清除的缓存在读取之前生效
+    token_blacklist.maybe_refresh()
+    cached = auth_cache.get(digest)
+    if cached:
+        payload, user = cached
+        if payload['exp'] <= time.time() or token_blacklist.is_revoked(digest):
+            auth_cache.pop(digest)
+            return None, {'message': 'Token is invalid or expired', 'code': 'token_invalid'}
+    else:
         # 解码令牌
         payload = decode_token(token)
         if not payload:
-            return jsonify({'error': {'message': 'Token is invalid or expired', 'code': 'token_invalid'}}), 401
-        
-        # 验证令牌类型
-        if payload.get('type') != 'access':
-            return jsonify({'error': {'message': 'Invalid token type', 'code': 'token_type_invalid'}}), 401
+            return None, {'message': 'Token is invalid or expired', 'code': 'token_invalid'}
         
         # 获取用户
-        current_user = get_user_by_id(payload['sub'])
-        if not current_user:
-            return jsonify({'error': {'message': 'User not found', 'code': 'user_not_found'}}), 401
+        db_user = get_user_by_id(payload['sub'])
+        if not db_user:
+            return None, {'message': 'User not found', 'code': 'user_not_found'}
         
-        # 将用户对象传递给被装饰的函数
+        user = AuthUser(db_user.id, db_user.username, db_user.email, db_user.created_at, db_user.is_active)
+        auth_cache.set(digest, (payload, user), ttl=payload['exp'] - time.time(), group=user.id)
+    
+    # 验证令牌类型
+    if payload.get('type') != token_type:
+        return None, {'message': 'Invalid token type', 'code': 'token_type_invalid'}
+    
+    # 已停用的用户
+    if user.is_active is False:
+        return None, {'message': 'User is inactive', 'code': 'user_inactive'}
+    
+    return user, None
+
+def _authenticate(token_type):
+    """
+    验证请求中的令牌，返回 (用户, 错误响应)
+    """
+    user, error = check_token(request.headers.get('Authorization'), token_type)
+    if error:
+        return None, (jsonify({'error': error}), 401)
+    return user, None
+
+def token_required(f):
+    """
+    用于验证访问令牌的装饰器
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        current_user, error = _authenticate('access')
+        if error:
+            return error
+        
+        # 将用户信息传递给被装饰的函数
         return f(current_user, *args, **kwargs)
     
     return decorated
@@ -112,101 +167,117 @@ def refresh_token_required(f):
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # 从Authorization头中获取令牌
-        auth_header = request.headers.get('Authorization')
-        if auth_header:
-            try:
-                token = auth_header.split(" ")[1]
-            except IndexError:
-                return jsonify({'error': {'message': 'Token is missing', 'code': 'token_missing'}}), 401
+        current_user, error = _authenticate('refresh')
+        if error:
+            return error
         
-        if not token:
-            return jsonify({'error': {'message': 'Token is missing', 'code': 'token_missing'}}), 401
-        
-        # 解码令牌
-        payload = decode_token(token)
-        if not payload:
-            return jsonify({'error': {'message': 'Token is invalid or expired', 'code': 'token_invalid'}}), 401
-        
-        # 验证令牌类型
-        if payload.get('type') != 'refresh':
-            return jsonify({'error': {'message': 'Invalid token type', 'code': 'token_type_invalid'}}), 401
+        # 将用户信息传递给被装饰的函数
+        return f(current_user, *args, **kwargs)
+    
+    return decorated
+
+# 响应格式标识：序列化字段变化（如新版本增加字段）时ETag随之变化，客户端不会沿用旧格式的缓存
+RESPONSE_FORMAT = hashlib.sha256(repr([
+    (serializer.fields, [name for name, _ in serializer.computed])
+    for serializer in (task_serializer, goal_serializer)
+]).encode('utf-8')).hexdigest()[:8]
+
+def data_etag(user_id, data_version, path, params):
+    """
+    由用户数据版本号、请求路径和查询参数 [(名称, 值)] 生成强ETag（同步和异步入口共用，结果一致）
+    """
+    raw = f'{RESPONSE_FORMAT}:{user_id}:{data_version}:{path}:{sorted(params)}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+def make_data_etag(user_id, data_version):
+    """
+    由用户数据版本号和当前请求生成强ETag
+    """
+    return data_etag(user_id, data_version, request.path, request.args.items(multi=True))
+
+def conditional_by_data_version(f):
+    """
+    基于用户数据版本号的条件GET，用在 token_required 之后
+    客户端 If-None-Match 与当前ETag一致时直接返回304，不查询任务、目标表
+    版本号在查询数据之前读取：期间发生的写入只会让客户端下次重新获取，不会漏掉变化
+    """
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        data_version = get_data_version(current_user.id)
+        if data_version is None:
+            return f(current_user, *args, **kwargs)
         
-        # 获取用户
-        current_user = get_user_by_id(payload['sub'])
-        if not current_user:
-            return jsonify({'error': {'message': 'User not found', 'code': 'user_not_found'}}), 401
+        etag = make_data_etag(current_user.id, data_version)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(f(current_user, *args, **kwargs))
+            if response.status_code != 200:
+                return response
         
-        # 将用户对象传递给被装饰的函数
-        return f(current_user, *args, **kwargs)
+        response.set_etag(etag)
+        # 允许客户端缓存，但每次使用前都要重新验证
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     
     return decorated
 
+def get_page_args(args=None):
+    """
+    读取分页参数 limit 和 cursor（args缺省时取当前请求的查询参数）
+    limit缺省时使用默认分页大小，超过上限时截断，无效时抛出ValueError
+    """
+    args = request.args if args is None else args
+    limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    if limit < 1:
+        raise ValueError('invalid limit')
+    return min(limit, MAX_PAGE_SIZE), args.get('cursor') or None
+
+def make_page_response(items, next_cursor):
+    """
+    返回分页列表响应，下一页游标放在 X-Next-Cursor 响应头中（最后一页不返回）
+    """
+    response = jsonify(items)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def is_stream_request():
+    """
+    是否请求流式返回完整列表（stream=1 或 stream=true）
+    """
+    return request.args.get('stream', '').lower() in ('1', 'true')
+
+def make_stream_response(chunks, serializer):
+    """
+    以分块传输（chunked）的方式返回JSON数组，每块记录序列化后立即发送
+    chunks: 每次产出一块记录的生成器；响应格式与非流式列表相同
+    """
+    def generate():
+        yield b'['
+        separator = b''
+        for items in chunks:
+            # 去掉数组的方括号，拼接到同一个数组中
+            yield separator + dumps(serializer.many(items))[1:-1]
+            separator = b','
+        yield b']'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
 def format_task(task):
     """
     格式化任务对象为JSON响应
     """
-    tags = [tag.tag_name for tag in task.tags] if task.tags else []
-    custom_week_days = None
-    if task.custom_week_days:
-        try:
-            custom_week_days = json.loads(task.custom_week_days)
-        except:
-            custom_week_days = []
-    
-    return {
-        'id': task.id,
-        'title': task.title,
-        'goal_id': task.goal_id,
-        'completed': task.completed,
-        'due_date': task.due_date.isoformat() if task.due_date else None,
-        'priority': task.priority,
-        'estimated_time': task.estimated_time,
-        'actual_time': task.actual_time,
-        'created_at': task.created_at.isoformat(),
-        'tags': tags,
-        'notes': task.notes,
-        'expected_outcome': task.expected_outcome,
-        'enthusiasm': task.enthusiasm,
-        'difficulty': task.difficulty,
-        'importance': task.importance,
-        'is_repeating': task.is_repeating,
-        'repeat_frequency': task.repeat_frequency,
-        'repeat_interval': task.repeat_interval,
-        'repeat_end_date': task.repeat_end_date.isoformat() if task.repeat_end_date else None,
-        'repeat_count': task.repeat_count,
-        'parent_task_id': task.parent_task_id,
-        'custom_week_days': custom_week_days
-    }
+    return task_serializer(task)
 
 def format_goal(goal):
     """
     格式化目标对象为JSON响应
     """
-    return {
-        'id': goal.id,
-        'title': goal.title,
-        'description': goal.description,
-        'category': goal.category,
-        'color': goal.color,
-        'icon': goal.icon,
-        'start_date': goal.start_date.isoformat() if goal.start_date else None,
-        'end_date': goal.end_date.isoformat() if goal.end_date else None,
-        'completed': goal.completed,
-        'progress': goal.progress,
-        'created_at': goal.created_at.isoformat(),
-        'goal_type': goal.goal_type
-    }
+    return goal_serializer(goal)
 
 def format_user(user):
     """
     格式化用户对象为JSON响应
     """
-    return {
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'created_at': user.created_at.isoformat()
-    } 
\ No newline at end of file
+    return user_serializer(user)
@@ -1,14 +1,31 @@
-from flask import render_template, jsonify
-from run import app
+import hmac
+import threading
+import time
+
+from flask import Response, render_template, request, g
+
+import config
+from wxcloudrun import app, db, async_dao, metrics, querydebug
 from wxcloudrun.auth import auth_bp
 from wxcloudrun.tasks import tasks_bp
 from wxcloudrun.goals import goals_bp
+from wxcloudrun.sync import sync_bp
+from wxcloudrun.tags import tags_bp
+from wxcloudrun.stats import stats_bp
+from wxcloudrun.cache import auth_cache
+from wxcloudrun.dao import ping_database
+from wxcloudrun.passwords import password_hasher
+from wxcloudrun.ratelimit import admit, admission, client_ip, rate_limiter
 from wxcloudrun.response import make_err_response, make_succ_empty_response, make_succ_response
+from wxcloudrun.serializers import jsonify
 
 # 注册蓝图
 app.register_blueprint(auth_bp)
 app.register_blueprint(tasks_bp)
 app.register_blueprint(goals_bp)
+app.register_blueprint(sync_bp)
+app.register_blueprint(tags_bp)
+app.register_blueprint(stats_bp)
 
 @app.route('/')
 def index():
@@ -26,15 +43,138 @@ def not_found(error):
 def internal_error(error):
     return jsonify({'error': {'code': 'server_error', 'message': 'Internal server error'}}), 500
 
+# 请求指标：先于准入控制开始计时，被拒绝的请求同样按状态码计数
+@app.before_request
+def start_request_metrics():
+    g.metrics = metrics.start_request()
+    g.sql_debug = querydebug.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    state = g.pop('metrics', None)
+    if state is not None:
+        # 按路由规则（而不是实际路径）聚合，避免ID等路径参数产生无限多的时间序列
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.finish_request(state, request.blueprint or 'app', route, request.method, response.status_code)
+    # 开发模式：本请求的SQL汇总（语句数、耗时、慢查询、可能的 N+1）
+    response.headers.extend(querydebug.finish_request(g.pop('sql_debug', None), request.method, request.path))
+    return response
+
+# 准入控制和限流：过载或超过额度时在查询数据库之前直接拒绝，不让请求排队等待连接池
+@app.before_request
+def admit_request():
+    admitted, rejection = admit(
+        request.method, request.path, request.headers.get('Authorization'),
+        client_ip(request.headers.get('X-Forwarded-For'), request.remote_addr)
+    )
+    g.admitted = admitted
+    if rejection:
+        response = jsonify({'error': rejection.error})
+        response.headers['Retry-After'] = str(rejection.retry_after)
+        return response, rejection.status
+
+@app.teardown_request
+def release_request(error=None):
+    if g.pop('admitted', False):
+        admission.leave()
+
+# 数据库探测结果，多个健康检查请求共享，HEALTH_DB_CHECK_SECONDS 秒内不重复探测
+_db_health = {'reachable': None, 'latency_ms': None, 'checked_at': None}
+_db_health_lock = threading.Lock()
+
+def _database_health(pool):
+    """
+    数据库是否可达及 SELECT 1 耗时；连接池已耗尽时不探测（不排队等待连接），沿用上次结果
+    """
+    checked_at = _db_health['checked_at']
+    due = checked_at is None or time.monotonic() - checked_at >= config.HEALTH_DB_CHECK_SECONDS
+    if due and not (pool and pool['saturated']) and _db_health_lock.acquire(blocking=False):
+        try:
+            latency = ping_database()
+            _db_health.update(
+                reachable=latency is not None,
+                latency_ms=round(latency * 1000, 2) if latency is not None else None,
+                checked_at=time.monotonic()
+            )
+        finally:
+            _db_health_lock.release()
+    return {'reachable': _db_health['reachable'], 'latency_ms': _db_health['latency_ms']}
+
 # 健康检查接口（云托管需要）
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return make_succ_response('ok')
+    """
+    进程存活即返回200（存活探针）；数据库不可达或连接池耗尽时 status 为 degraded
+    """
+    pool = metrics.pool_status(db.engine.pool)
+    database = _database_health(pool)
+    healthy = database['reachable'] and not (pool and pool['saturated'])
+    return make_succ_response({'status': 'ok' if healthy else 'degraded', 'database': database, 'pool': pool})
+
+# ---------- 监控指标 ----------
+def _pools():
+    pools = [('sync', db.engine.pool), ('async', async_dao.engine_pool())]
+    return [(name, metrics.pool_status(pool)) for name, pool in pools if pool is not None]
+
+def _pool_gauge(field):
+    return lambda: [((name, ), int(status[field])) for name, status in _pools() if status is not None]
+
+for _field, _documentation in (
+    ('size', 'Configured pool size'),
+    ('checked_out', 'Connections currently checked out'),
+    ('checked_in', 'Idle connections in the pool'),
+    ('overflow', 'Overflow connections currently open'),
+    ('saturated', 'Whether all connections including overflow are checked out'),
+):
+    metrics.registry.register(metrics.Gauge(f'db_pool_{_field}', _documentation, _pool_gauge(_field), ('pool',)))
+
+metrics.registry.register(metrics.Gauge(
+    'auth_cache_requests_total', 'Auth cache lookups by result',
+    lambda: [(('hit',), auth_cache.hits), (('miss',), auth_cache.misses)], ('result',), kind='counter'
+))
+metrics.registry.register(metrics.Gauge(
+    'auth_cache_entries', 'Auth cache entries', lambda: [((), auth_cache.stats()['size'])]
+))
+metrics.registry.register(metrics.Gauge(
+    'password_hash_jobs', 'Password hashing jobs by state',
+    lambda: [((state,), password_hasher.stats()[state]) for state in ('queued', 'running')], ('state',)
+))
+metrics.registry.register(metrics.Gauge(
+    'password_hash_rejected_total', 'Password hashing requests rejected because the queue was full',
+    lambda: [((), password_hasher.stats()['rejected'])], kind='counter'
+))
+metrics.registry.register(metrics.Gauge(
+    'rate_limit_rejected_total', 'Requests rejected by rate limit budget',
+    lambda: [((name,), count) for name, count in sorted(rate_limiter.rejected.items())], ('budget',), kind='counter'
+))
+metrics.registry.register(metrics.Gauge(
+    'admission_in_flight', 'Requests currently being handled', lambda: [((), admission.in_flight)]
+))
+metrics.registry.register(metrics.Gauge(
+    'admission_shed_total', 'Requests shed with 503 by admission control',
+    lambda: [((), admission.shed)], kind='counter'
+))
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Prometheus 抓取接口（不在 /api 下，不限流）；设置 METRICS_TOKEN 后需携带 Authorization: Bearer <token>
+    指标按进程统计，多个工作进程时每次抓取只得到处理该请求的进程的数据
+    """
+    if config.METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get('Authorization', ''), f'Bearer {config.METRICS_TOKEN}'):
+        return jsonify({'error': {'message': 'Invalid metrics token', 'code': 'token_invalid'}}), 401
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# CORS处理（异步入口 asgi.py 的响应使用同样的响应头）
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Headers': 'Content-Type,Authorization,X-Requested-With,If-None-Match',
+    'Access-Control-Allow-Methods': 'GET,PUT,POST,DELETE,PATCH,OPTIONS',
+    'Access-Control-Expose-Headers': 'X-Next-Cursor,ETag'
+}
 
-# CORS处理
 @app.after_request
 def add_cors_headers(response):
-    response.headers['Access-Control-Allow-Origin'] = '*'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type,Authorization,X-Requested-With'
-    response.headers['Access-Control-Allow-Methods'] = 'GET,PUT,POST,DELETE,PATCH,OPTIONS'
+    response.headers.update(CORS_HEADERS)
     return response